@@ -0,0 +1,238 @@
+from __future__ import annotations
+import heapq
+import itertools
+import time
+from types import SimpleNamespace
+from kafka.admin.acl_resource import ACL, ACLOperation, ACLPermissionType, ResourcePattern, ResourceType, ACLResourcePatternType
+from kafka.admin.client import KafkaAdminClient
+from kafka.future import Future
+from kafka.protocol.admin import DescribeGroupsResponse
+from kafka.structs import OffsetAndMetadata, TopicPartition
+import kafka
+
+
+class FakeCluster():
+    # Deterministic cluster contents, generated once and shared by every
+    # FakeAdminClient. Sizes are totals, e.g. num_partitions is spread over
+    # num_topics.
+    def __init__(self, num_topics=1000, num_partitions=10000, num_brokers=6, replication_factor=3,
+                 num_acls=5000, num_groups=500, offsets_per_group=20) -> None:
+        self.num_brokers = num_brokers
+        self.replication_factor = min(replication_factor, num_brokers)
+        self.topics = {}
+        partitions_per_topic = max(1, num_partitions // max(1, num_topics))
+        for index in range(num_topics):
+            self.topics[self.topic_name(index)] = partitions_per_topic
+
+        self.acls = []
+        principals = max(1, num_acls // 20)
+        operations = [ACLOperation.READ, ACLOperation.WRITE, ACLOperation.DESCRIBE]
+        for index in range(num_acls):
+            self.acls.append((
+                f"User:app{index % principals}",
+                "*",
+                int(operations[index % len(operations)]),
+                int(ACLPermissionType.ALLOW),
+                int(ResourceType.TOPIC),
+                self.topic_name(index % max(1, num_topics)) if index % 10 else f"app{index % principals}.",
+                int(ACLResourcePatternType.PREFIXED if index % 10 == 0 else ACLResourcePatternType.LITERAL),
+            ))
+
+        topic_names = list(self.topics)
+        self.groups = {}
+        for index in range(num_groups):
+            offsets = {}
+            for offset_index in range(offsets_per_group if topic_names else 0):
+                topic = topic_names[(index * offsets_per_group + offset_index) % len(topic_names)]
+                offsets[TopicPartition(topic, offset_index % self.topics[topic])] = OffsetAndMetadata(1000, '')
+            self.groups[f"group{index:06d}"] = offsets
+
+    @staticmethod
+    def topic_name(index) -> str:
+        return f"team{index % 50:02d}.topic{index:07d}"
+
+    def partition_metadata(self, topic, partition) -> dict:
+        replicas = [(partition + offset) % self.num_brokers for offset in range(self.replication_factor)]
+        return dict(error_code=0, partition=partition, leader=replicas[0], replicas=replicas, isr=list(replicas),
+                    offline_replicas=[])
+
+    def topic_metadata(self, topic) -> dict:
+        if topic not in self.topics:
+            return dict(error_code=3, topic=topic, is_internal=False, partitions=[])
+        return dict(error_code=0, topic=topic, is_internal=False,
+                    partitions=[self.partition_metadata(topic, partition) for partition in range(self.topics[topic])])
+
+
+class FakeNetworkClient():
+    # Stands in for KafkaAdminClient._client. Requests complete
+    # latency_ms after they are sent; poll() sleeps until the next one is
+    # due, so pipelined requests overlap like they would on the wire.
+    def __init__(self, admin_client, latency_ms) -> None:
+        self.admin_client = admin_client
+        self.latency = latency_ms / 1000
+        self._due = []
+        self._counter = itertools.count()
+
+    def send_later(self, future, respond) -> None:
+        heapq.heappush(self._due, (time.monotonic() + self.latency, next(self._counter), future, respond))
+
+    def ready(self, node_id) -> bool:
+        return True
+
+    def least_loaded_node(self):
+        return next(self._counter) % self.admin_client.cluster.num_brokers
+
+    def poll(self, timeout_ms=None, future=None):
+        deadline = time.monotonic() + (timeout_ms if timeout_ms is not None else 30000) / 1000
+        while self._due:
+            due_at = self._due[0][0]
+            now = time.monotonic()
+            if due_at > now:
+                if due_at > deadline:
+                    time.sleep(max(0.0, deadline - now))
+                    return []
+                time.sleep(due_at - now)
+            _, _, due_future, respond = heapq.heappop(self._due)
+            due_future.success(respond())
+            if future is None or future.is_done:
+                return []
+        return []
+
+
+class FakeAdminClient(KafkaAdminClient):
+    # A KafkaAdminClient without sockets. Only the calls the *StoreAdapters
+    # make are answered; the kafka-python helpers they rely on (request
+    # conversion, response parsing, _wait_for_futures) are inherited.
+    def __init__(self, cluster, latency_ms=0, api_versions=None) -> None:
+        self.cluster = cluster
+        self.config = dict(request_timeout_ms=30000)
+        self.latency = latency_ms / 1000
+        self._client = FakeNetworkClient(self, latency_ms)
+        self._controller_id = 0
+        self._closed = False
+        self.request_counts = {}
+        # the max versions a Kafka 2.8 broker reports, by request name, e.g.
+        # {'MetadataRequest': 11}; _matching_api_version caps them at what
+        # kafka-python supports, like the real client
+        self.api_versions = dict({
+            'MetadataRequest': 11,
+            'CreateTopicsRequest': 7,
+            'DeleteTopicsRequest': 6,
+            'CreatePartitionsRequest': 3,
+            'DescribeGroupsRequest': 5,
+            'OffsetRequest': 6,
+        }, **(api_versions or {}))
+
+    def _count(self, name) -> None:
+        self.request_counts[name] = self.request_counts.get(name, 0) + 1
+
+    def _rpc(self, name) -> None:
+        # a blocking call: one round trip
+        self._count(name)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def close(self) -> None:
+        self._closed = True
+
+    def _matching_api_version(self, operation):
+        return min(len(operation) - 1, self.api_versions[operation[0].__name__.split('_v')[0]])
+
+    def _refresh_controller_id(self):
+        self._rpc('Metadata')
+
+    # blocking calls
+
+    def describe_topics(self, topics=None):
+        self._rpc('Metadata')
+        names = list(self.cluster.topics) if topics is None else topics
+        return [self.cluster.topic_metadata(name) for name in names]
+
+    def _get_cluster_metadata(self, topics=None, auto_topic_creation=False):
+        self._rpc('Metadata')
+        names = list(self.cluster.topics) if topics is None else topics
+        # (error_code, topic, is_internal, partitions) as in Metadata v1+
+        return SimpleNamespace(topics=[(0, name, False, []) for name in names if name in self.cluster.topics])
+
+    def describe_acls(self, acl_filter):
+        self._rpc('DescribeAcls')
+        acls = []
+        for principal, host, operation, permission_type, resource_type, resource_name, pattern_type in self.cluster.acls:
+            if acl_filter.principal is not None and acl_filter.principal != principal:
+                continue
+            acls.append(ACL(
+                principal=principal,
+                host=host,
+                operation=ACLOperation(operation),
+                permission_type=ACLPermissionType(permission_type),
+                resource_pattern=ResourcePattern(
+                    resource_type=ResourceType(resource_type),
+                    resource_name=resource_name,
+                    pattern_type=ACLResourcePatternType(pattern_type),
+                )
+            ))
+        return acls, kafka.errors.NoError
+
+    def create_acls(self, acls):
+        self._rpc('CreateAcls')
+        return dict(succeeded=list(acls), failed=[])
+
+    def delete_acls(self, acl_filters):
+        self._rpc('DeleteAcls')
+        return [(acl_filter, [(acl_filter, kafka.errors.NoError)], kafka.errors.NoError) for acl_filter in acl_filters]
+
+    def list_consumer_groups(self, broker_ids=None):
+        self._rpc('ListGroups')
+        return [(group_id, 'consumer') for group_id in self.cluster.groups]
+
+    def _find_coordinator_ids(self, group_ids):
+        self._rpc('FindCoordinator')
+        return {group_id: hash(group_id) % self.cluster.num_brokers for group_id in group_ids}
+
+    # pipelined calls
+
+    def _send_request_to_node(self, node_id, request):
+        self._count(type(request).__name__.split('_v')[0])
+        future = Future()
+        self._client.send_later(future, lambda: self._respond(request))
+        return future
+
+    def _list_consumer_group_offsets_send_request(self, group_id, group_coordinator_id, partitions=None):
+        self._count('OffsetFetchRequest')
+        future = Future()
+        self._client.send_later(future, lambda: self.cluster.groups.get(group_id, {}))
+        return future
+
+    def _list_consumer_group_offsets_process_response(self, response):
+        return response
+
+    def _respond(self, request):
+        request_name = type(request).__name__.split('_v')[0]
+        if request_name == 'CreateTopicsRequest':
+            for create_topic_request in request.create_topic_requests:
+                self.cluster.topics[create_topic_request[0]] = create_topic_request[1]
+            return SimpleNamespace(throttle_time_ms=0, topic_errors=[
+                (create_topic_request[0], 0, None) for create_topic_request in request.create_topic_requests])
+        if request_name == 'CreatePartitionsRequest':
+            for name, (count, _) in request.topic_partitions:
+                self.cluster.topics[name] = count
+            return SimpleNamespace(throttle_time_ms=0, topic_errors=[
+                (name, 0, None) for name, _ in request.topic_partitions])
+        if request_name == 'DeleteTopicsRequest':
+            for name in request.topics:
+                self.cluster.topics.pop(name, None)
+            return SimpleNamespace(throttle_time_ms=0, topic_error_codes=[(name, 0) for name in request.topics])
+        if request_name == 'MetadataRequest':
+            topics = [self.cluster.topic_metadata(name) for name in request.topics]
+            return SimpleNamespace(to_object=lambda: dict(topics=topics))
+        if request_name == 'OffsetRequest':
+            return SimpleNamespace(API_VERSION=1, topics=[
+                (topic, [(partition, 0, -1, 0 if timestamp == -2 else 5000) for partition, timestamp in partitions])
+                for topic, partitions in request.topics])
+        if request_name == 'DescribeGroupsRequest':
+            response_class = DescribeGroupsResponse[request.API_VERSION]
+            groups = [(0, group_id, 'Empty', 'consumer', '', []) for group_id in request.groups]
+            if request.API_VERSION == 0:
+                return response_class(groups=groups)
+            return response_class(throttle_time_ms=0, groups=groups)
+        raise NotImplementedError(request_name)
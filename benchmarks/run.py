@@ -0,0 +1,278 @@
+"""Benchmarks against an in-memory fake cluster.
+
+    python benchmarks/run.py                     # small scale, compare with baseline.json
+    python benchmarks/run.py --scale large       # 100k topics / 1M partitions / 200k ACLs / 10k groups
+    python benchmarks/run.py --update-baseline   # record the current numbers
+    python benchmarks/run.py --case acl --latency-ms 5
+
+Exits with 1 when a case is slower or uses more memory than the baseline
+allows (see --time-tolerance / --memory-tolerance).
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'src'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_cluster import FakeAdminClient, FakeCluster  # noqa: E402
+from kafka.admin.acl_resource import ACLOperation, ACLPermissionType, ResourceType, ACLResourcePatternType  # noqa: E402
+from kafka_admin.definition_store import (  # noqa: E402
+    Acls, DefinitionStore, KafkaAclStoreAdapter, KafkaConsumerGroupOffsetsStoreAdapter,
+    KafkaConsumerGroupStoreAdapter, KafkaTopicOffsetsStoreAdapter, KafkaTopicStoreAdapter,
+    Topic, TopicFilter, Topics, TopicsPlan
+)
+from kafka_admin.diff import diff  # noqa: E402
+from kafka_admin.pyfixedwidths import FixedWidthFormatter  # noqa: E402
+from kafka_admin.rebalance import ReassignmentPlanner  # noqa: E402
+
+SCALES = {
+    'small': dict(num_topics=2000, num_partitions=20000, num_acls=10000, num_groups=500),
+    'large': dict(num_topics=100000, num_partitions=1000000, num_acls=200000, num_groups=10000),
+}
+BASELINE_FILENAME = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+
+class Context():
+    # What the cases share: the cluster, a client factory and the
+    # definitions file written from the cluster with some changes.
+    def __init__(self, cluster, latency_ms, workdir) -> None:
+        self.cluster = cluster
+        self.latency_ms = latency_ms
+        self.workdir = workdir
+        self.definitions_filename = os.path.join(workdir, 'definitions.csv')
+        self._write_definitions()
+
+    def client(self) -> FakeAdminClient:
+        return FakeAdminClient(self.cluster, latency_ms=self.latency_ms)
+
+    def cur_topics(self) -> Topics:
+        return KafkaTopicStoreAdapter(FakeAdminClient(self.cluster)).list()
+
+    def cur_acls(self) -> Acls:
+        return KafkaAclStoreAdapter(FakeAdminClient(self.cluster)).list()
+
+    def definitions(self) -> DefinitionStore:
+        store = DefinitionStore()
+        store.load(self.definitions_filename)
+        return store
+
+    def _write_definitions(self) -> None:
+        # every 10th topic gets one more partition, every 20th ACL is dropped
+        # and the same number of new ones are added
+        with open(self.definitions_filename, 'w') as f:
+            f.write("schema_version: 1\n---\nname, num_partitions, replication_factor\n")
+            for index, (name, num_partitions) in enumerate(self.cluster.topics.items()):
+                f.write(f"{name}, {num_partitions + (1 if index % 10 == 0 else 0)}, {self.cluster.replication_factor}\n")
+            f.write("---\nprincipal, resource_type, resource_name, pattern_type, operation, permission_type, host\n")
+            for index, acl_tuple in enumerate(self.cluster.acls):
+                principal, host, operation, permission_type, resource_type, resource_name, pattern_type = acl_tuple
+                if index % 20 == 0:
+                    principal = f"User:new{index}"
+                f.write(f"{principal}, {ResourceType(resource_type).name}, {resource_name},"
+                        f" {ACLResourcePatternType(pattern_type).name}, {ACLOperation(operation).name},"
+                        f" {ACLPermissionType(permission_type).name}, {host}\n")
+
+
+def case_definition_store_load(ctx):
+    return lambda: ctx.definitions()
+
+
+def case_topics_plan(ctx):
+    new_topics, cur_topics = ctx.definitions().topics, ctx.cur_topics()
+    return lambda: TopicsPlan(new_topics, cur_topics)
+
+
+def case_acls_diff(ctx):
+    new_acls, cur_acls = ctx.definitions().acls, ctx.cur_acls()
+    return lambda: diff(new_acls, cur_acls)
+
+
+def case_reorder_cur_topics(ctx):
+    from kafka_admin.cli import reorder_cur_topics
+    new_topics, cur_topics = ctx.definitions().topics, ctx.cur_topics()
+    return lambda: reorder_cur_topics(new_topics, cur_topics)
+
+
+def case_reorder_cur_acls(ctx):
+    from kafka_admin.cli import reorder_cur_acls
+    new_acls, cur_acls = ctx.definitions().acls, ctx.cur_acls()
+    return lambda: reorder_cur_acls(new_acls, cur_acls)
+
+
+def case_to_text(ctx):
+    topic_dicts = list(ctx.cur_topics().iter_dicts(verbose=True))
+    return lambda: FixedWidthFormatter().from_dict(topic_dicts).to_text()
+
+
+def case_topic_list(ctx):
+    adapter = KafkaTopicStoreAdapter(ctx.client())
+    return lambda: adapter.list()
+
+
+def case_topic_list_prefix(ctx):
+    adapter = KafkaTopicStoreAdapter(ctx.client())
+    return lambda: adapter.list(TopicFilter(prefixes=['team07.']))
+
+
+def case_topic_add_delete(ctx):
+    adapter = KafkaTopicStoreAdapter(ctx.client())
+    new_topics = Topics(*[Topic(f"bench.new{index:07d}", 3, 3) for index in range(max(1, len(ctx.cluster.topics) // 100))])
+
+    def run():
+        adapter.add(new_topics)
+        adapter.delete(new_topics)
+    return run
+
+
+def case_topic_add_partitions(ctx):
+    adapter = KafkaTopicStoreAdapter(ctx.client())
+    names = list(ctx.cluster.topics)[::100]
+    grown = Topics(*[Topic(name, ctx.cluster.topics[name], ctx.cluster.replication_factor) for name in names])
+    return lambda: adapter.add_partitions(grown)
+
+
+def case_topic_rebalance(ctx):
+    # three brokers added to the cluster
+    topics = ctx.cur_topics()
+    brokers = {broker: None for broker in range(ctx.cluster.num_brokers + 3)}
+    return lambda: ReassignmentPlanner(topics, brokers).plan()
+
+
+def case_topic_offsets_list(ctx):
+    topics = KafkaTopicStoreAdapter(ctx.client()).list(TopicFilter(prefixes=['team07.']))
+    adapter = KafkaTopicOffsetsStoreAdapter(ctx.client())
+    return lambda: adapter.list(topics)
+
+
+def case_acl_list(ctx):
+    adapter = KafkaAclStoreAdapter(ctx.client())
+    return lambda: adapter.list()
+
+
+def case_acl_add_delete(ctx):
+    adapter = KafkaAclStoreAdapter(ctx.client())
+    acls = ctx.definitions().acls[::20]
+
+    def run():
+        adapter.add(acls)
+        adapter.delete(acls)
+    return run
+
+
+def case_consumer_group_list(ctx):
+    adapter = KafkaConsumerGroupStoreAdapter(ctx.client())
+    return lambda: list(adapter.list())
+
+
+def case_consumer_group_offsets_list(ctx):
+    adapter = KafkaConsumerGroupOffsetsStoreAdapter(ctx.client())
+    return lambda: list(adapter.list())
+
+
+CASES = [(name[len('case_'):], function) for name, function in globals().items() if name.startswith('case_')]
+
+
+def measure(ctx, setup, memory) -> dict:
+    run = setup(ctx)
+    gc.collect()
+    started = time.perf_counter()
+    run()
+    result = dict(seconds=round(time.perf_counter() - started, 4))
+    if memory:
+        # a second run under tracemalloc: it slows the code down, so the
+        # time above is measured without it
+        run = setup(ctx)
+        gc.collect()
+        tracemalloc.start()
+        run()
+        result['peak_mib'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+    return result
+
+
+def regressions(name, result, baseline, time_tolerance, memory_tolerance) -> list:
+    # absolute floors keep timer noise on very short cases from failing the run
+    found = []
+    if baseline is None:
+        return found
+    if (result['seconds'] > baseline['seconds'] * (1 + time_tolerance)
+            and result['seconds'] - baseline['seconds'] > 0.05):
+        found.append(f"{name}: {result['seconds']}s, baseline {baseline['seconds']}s")
+    if ('peak_mib' in result and 'peak_mib' in baseline
+            and result['peak_mib'] > baseline['peak_mib'] * (1 + memory_tolerance)
+            and result['peak_mib'] - baseline['peak_mib'] > 1):
+        found.append(f"{name}: {result['peak_mib']} MiB, baseline {baseline['peak_mib']} MiB")
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='kafka-admin benchmarks against a fake cluster')
+    parser.add_argument('--scale', default='small', choices=sorted(SCALES))
+    parser.add_argument('--case', action='append', default=[], help='only cases whose name contains this (repeatable)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='latency of every fake RPC')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--baseline', default=BASELINE_FILENAME)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help='allowed slowdown, 0.5 = +50%%')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='allowed memory growth, 0.2 = +20%%')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    else:
+        baselines = {}
+    # a baseline recorded with latency is not comparable with one without
+    baseline_key = args.scale if not args.latency_ms else f"{args.scale}@{args.latency_ms:g}ms"
+    scale_baseline = baselines.get(baseline_key, {})
+
+    cluster = FakeCluster(**SCALES[args.scale])
+    results = {}
+    rows = []
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        ctx = Context(cluster, args.latency_ms, workdir)
+        for name, setup in CASES:
+            if args.case and not any(pattern in name for pattern in args.case):
+                continue
+            result = measure(ctx, setup, memory=not args.no_memory)
+            results[name] = result
+            baseline = scale_baseline.get(name)
+            failures.extend(regressions(name, result, baseline, args.time_tolerance, args.memory_tolerance))
+            rows.append(dict(
+                case=name,
+                seconds=result['seconds'],
+                baseline_seconds=baseline['seconds'] if baseline else '',
+                peak_mib=result.get('peak_mib', ''),
+                baseline_peak_mib=baseline.get('peak_mib', '') if baseline else '',
+            ))
+            print(f"{name}: {result}", file=sys.stderr)
+
+    print(FixedWidthFormatter().from_dict(rows).to_text())
+
+    if args.update_baseline:
+        baselines[baseline_key] = dict(scale_baseline, **results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if failures:
+        print("Regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
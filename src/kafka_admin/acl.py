@@ -1,73 +1,222 @@
 from __future__ import annotations
 import pdb
+import sys
+from collections import defaultdict, namedtuple
 from kafka.admin.acl_resource import ACL, ACLFilter, ACLOperation, ACLPermissionType, ResourcePattern, ResourceType, ACLResourcePatternType, ResourcePatternFilter
 from kafka.admin.client import KafkaAdminClient
 import kafka
-from kafka_admin.pyfixedwidths import FixedWidthFormatter
+from kafka_admin.pyfixedwidths import FixedWidthFormatter, iter_text_records
 from pprint import pprint as pp
 from kafka.admin import NewTopic
 
+_OPERATIONS = {member.name: int(member) for member in ACLOperation}
+_PERMISSION_TYPES = {member.name: int(member) for member in ACLPermissionType}
+_RESOURCE_TYPES = {member.name: int(member) for member in ResourceType}
+_PATTERN_TYPES = {member.name: int(member) for member in ACLResourcePatternType}
+_OPERATION_NAMES = {value: name for name, value in _OPERATIONS.items()}
+_PERMISSION_TYPE_NAMES = {value: name for name, value in _PERMISSION_TYPES.items()}
+_RESOURCE_TYPE_NAMES = {value: name for name, value in _RESOURCE_TYPES.items()}
+_PATTERN_TYPE_NAMES = {value: name for name, value in _PATTERN_TYPES.items()}
+
+
+class AclEntry(namedtuple('AclEntry', [
+        'principal', 'host', 'operation', 'permission_type', 'resource_type', 'resource_name', 'pattern_type'])):
+    # An ACL as a flat tuple: interned strings and the enums as plain ints.
+    # Hashing and equality are tuple operations, and an entry costs one
+    # object instead of ACL + ResourcePattern + four enum references.
+    # kafka-python ACL objects are only built for create/delete requests.
+    __slots__ = ()
+
+    @classmethod
+    def make(cls, principal, host, operation, permission_type, resource_type, resource_name, pattern_type) -> AclEntry:
+        return cls(sys.intern(principal), sys.intern(host), operation, permission_type,
+                   resource_type, sys.intern(resource_name), pattern_type)
+
+    @classmethod
+    def from_acl(cls, acl) -> AclEntry:
+        return cls.make(
+            acl.principal,
+            acl.host,
+            int(acl.operation),
+            int(acl.permission_type),
+            int(acl.resource_pattern.resource_type),
+            acl.resource_pattern.resource_name,
+            int(acl.resource_pattern.pattern_type),
+        )
+
+    def to_acl(self) -> ACL:
+        return ACL(
+            principal=self.principal,
+            host=self.host,
+            operation=ACLOperation(self.operation),
+            permission_type=ACLPermissionType(self.permission_type),
+            resource_pattern=ResourcePattern(
+                resource_type=ResourceType(self.resource_type),
+                resource_name=self.resource_name,
+                pattern_type=ACLResourcePatternType(self.pattern_type),
+            )
+        )
+
+    @property
+    def resource(self) -> tuple:
+        return (self.resource_type, self.resource_name, self.pattern_type)
+
+    def to_dict(self) -> dict:
+        return dict(
+            principal=self.principal,
+            resource_type=_RESOURCE_TYPE_NAMES[self.resource_type],
+            resource_name=self.resource_name,
+            pattern_type=_PATTERN_TYPE_NAMES[self.pattern_type],
+            operation=_OPERATION_NAMES[self.operation],
+            permission_type=_PERMISSION_TYPE_NAMES[self.permission_type],
+            host=self.host,
+        )
+
+    def __repr__(self) -> str:
+        return (f"<AclEntry principal={self.principal}, resource=<{_RESOURCE_TYPE_NAMES[self.resource_type]}"
+                f" {self.resource_name} {_PATTERN_TYPE_NAMES[self.pattern_type]}>,"
+                f" operation={_OPERATION_NAMES[self.operation]}, type={_PERMISSION_TYPE_NAMES[self.permission_type]},"
+                f" host={self.host}>")
+
+
+def to_acl_object(acl):
+    # RPC boundary: AclEntry -> kafka-python ACL, ACL/ACLFilter pass through
+    return acl.to_acl() if isinstance(acl, AclEntry) else acl
+
+
+def from_acl_object(acl):
+    return AclEntry.from_acl(acl) if isinstance(acl, ACL) else acl
+
+
 class Acls(list):
+    # A list of AclEntry. The principal and resource indexes are built on
+    # first use and dropped whenever the list changes (see _drops_indexes
+    # below the class).
     def __init__(self, *args) -> None:
         super().__init__(args)
+        self._by_principal = None
+        self._by_resource = None
         # self._headers = ['principal', 'resource_type', 'resource_name', 'pattern_type', 'operation', 'permission_type', 'host']
 
     def __sub__(self, other) -> Acls:
-        return self.__class__(*[item for item in self if item not in other])
-
-    def _dict_to_ACL(self, acl_dict) -> ACL:
-        acl = ACL(
-            principal=acl_dict['principal'].strip(),
-            host=acl_dict.get('host', "*").strip(),
-            operation=getattr(ACLOperation, acl_dict.get('operation', 'ALL').strip().upper()),
-            permission_type=getattr(ACLPermissionType, acl_dict.get('permission_type', 'ALLOW').strip().upper()),
-            resource_pattern=ResourcePattern(
-                resource_type=getattr(ResourceType, acl_dict.get('resource_type', 'TOPIC').strip().upper()),
-                resource_name=acl_dict.get('resource_name', "*").strip(),
-                pattern_type=getattr(ACLResourcePatternType, acl_dict.get('pattern_type', 'LITERAL').strip().upper()),
-            )
+        other_set = other if isinstance(other, (set, frozenset)) else set(other)
+        return self.__class__(*[item for item in self if item not in other_set])
+
+    def _reset_indexes(self) -> None:
+        self._by_principal = None
+        self._by_resource = None
+
+    def by_principal(self) -> dict:
+        # {principal: [AclEntry, ...]}
+        if self._by_principal is None:
+            index = defaultdict(list)
+            for entry in self:
+                index[entry.principal].append(entry)
+            self._by_principal = dict(index)
+        return self._by_principal
+
+    def by_resource(self) -> dict:
+        # {(resource_type, resource_name, pattern_type): [AclEntry, ...]}
+        if self._by_resource is None:
+            index = defaultdict(list)
+            for entry in self:
+                index[entry.resource].append(entry)
+            self._by_resource = dict(index)
+        return self._by_resource
+
+    def for_principal(self, principal) -> Acls:
+        return self.__class__(*self.by_principal().get(principal, ()))
+
+    def for_resource(self, resource_type, resource_name, pattern_type=ACLResourcePatternType.LITERAL) -> Acls:
+        return self.__class__(*self.by_resource().get((int(resource_type), resource_name, int(pattern_type)), ()))
+
+    def _dict_to_entry(self, acl_dict) -> AclEntry:
+        operation = _OPERATIONS[acl_dict.get('operation', 'ALL').strip().upper()]
+        permission_type = _PERMISSION_TYPES[acl_dict.get('permission_type', 'ALLOW').strip().upper()]
+        resource_type = _RESOURCE_TYPES[acl_dict.get('resource_type', 'TOPIC').strip().upper()]
+        pattern_type = _PATTERN_TYPES[acl_dict.get('pattern_type', 'LITERAL').strip().upper()]
+        # the checks ACL.validate() / ResourcePattern.validate() would do
+        if operation == ACLOperation.ANY:
+            raise kafka.errors.IllegalArgumentError(f"operation cannot be {_OPERATION_NAMES[operation]}")
+        if permission_type == ACLPermissionType.ANY:
+            raise kafka.errors.IllegalArgumentError(f"permission_type cannot be {_PERMISSION_TYPE_NAMES[permission_type]}")
+        if resource_type == ResourceType.ANY:
+            raise kafka.errors.IllegalArgumentError(f"resource_type cannot be {_RESOURCE_TYPE_NAMES[resource_type]}")
+        if pattern_type in (ACLResourcePatternType.ANY, ACLResourcePatternType.MATCH):
+            raise kafka.errors.IllegalArgumentError(
+                f"pattern_type cannot be {_PATTERN_TYPE_NAMES[pattern_type]} on a concrete ResourcePattern")
+        return AclEntry.make(
+            acl_dict['principal'].strip(),
+            acl_dict.get('host', "*").strip(),
+            operation,
+            permission_type,
+            resource_type,
+            acl_dict.get('resource_name', "*").strip(),
+            pattern_type,
         )
-        return acl
 
-    def load_from_lines(self, lines) -> Acls:
-        fwf = FixedWidthFormatter()
-        text = ''.join(lines)
-        acl_dicts = fwf.from_text(text, has_header=True).to_dict(write_header=False)
-        for acl_dict in acl_dicts:
-            acl = self._dict_to_ACL(acl_dict)
-            self.append(acl)
+    def iter_from_lines(self, lines, start_lineno=1):
+        for lineno, acl_dict in iter_text_records(lines, start_lineno=start_lineno):
+            try:
+                yield self._dict_to_entry(acl_dict)
+            except (KeyError, AttributeError, kafka.errors.IllegalArgumentError) as e:
+                raise Exception(f"line {lineno}: Invalid acl definition: {e!r}") from e
 
+    def load_from_lines(self, lines, start_lineno=1) -> Acls:
+        self.extend(self.iter_from_lines(lines, start_lineno))
         return self
 
     def load_from_acl_objects(self, acl_objects) -> Acls:
-        for acl_object in acl_objects:
-            self.append(acl_object)
+        self.extend(AclEntry.from_acl(acl_object) for acl_object in acl_objects)
+        return self
 
+    def load_from_tuples(self, acl_tuples) -> Acls:
+        self.extend(AclEntry.make(*acl_tuple) for acl_tuple in acl_tuples)
         return self
 
+    def to_tuples(self) -> list:
+        # (principal, host, operation, permission_type, resource_type, resource_name, pattern_type)
+        return [tuple(entry) for entry in self]
+
+    def to_acl_objects(self) -> list:
+        return [entry.to_acl() for entry in self]
+
     def to_csv(self) -> str:
         fwf = FixedWidthFormatter()
-        acl_dicts = []
-        for acl in self:
-            acl_dicts.append(dict(
-                principal=acl.principal,
-                resource_type=acl.resource_pattern.resource_type.name,
-                resource_name=acl.resource_pattern.resource_name,
-                pattern_type=acl.resource_pattern.pattern_type.name,
-                operation=acl.operation.name,
-                permission_type=acl.permission_type.name,
-                host=acl.host,
-            ))
+        return fwf.from_dict([entry.to_dict() for entry in self]).to_text()
+
+
+def _drops_indexes(method):
+    # the list method, followed by Acls._reset_indexes(); also when it fails
+    # part way, e.g. extend() from a generator that raises
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._reset_indexes()
+    wrapper.__name__ = method.__name__
+    return wrapper
+
 
-        return fwf.from_dict(acl_dicts).to_text()
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(Acls, _name, _drops_indexes(getattr(list, _name)))
+del _name
 
 
 class KafkaAclStoreAdapter():
-    def __init__(self, client) -> None:
+    def __init__(self, client, cache=None) -> None:
         self.client = client
-    
+        self.cache = cache
+
     def add(self, acls):
-        return self.client.create_acls(acls)
+        if self.cache:
+            self.cache.invalidate('acls')
+        result = self.client.create_acls([to_acl_object(acl) for acl in acls])
+        return dict(
+            succeeded=[from_acl_object(acl) for acl in result['succeeded']],
+            failed=[(from_acl_object(acl), error) for acl, error in result['failed']],
+        )
         # {'succeeded': [],
         #  'failed': [(
         #       <ACL principal=User:Alice, resource=<ResourcePattern type=TOPIC, name=*, pattern=LITERAL>,
@@ -77,26 +226,51 @@ class KafkaAclStoreAdapter():
         # }
 
     def delete(self, acls):
-        return self.client.delete_acls(acls)
+        if self.cache:
+            self.cache.invalidate('acls')
+        acls = list(acls)
+        result = self.client.delete_acls([to_acl_object(acl) for acl in acls])
+        # filters are given back as passed in, matches as AclEntry
+        return [
+            (acl, [(from_acl_object(matching_acl), error) for matching_acl, error in matching_acls], filter_error)
+            for acl, (_, matching_acls, filter_error) in zip(acls, result)
+        ]
         #[(<ACL principal=User:Alice, resource=<ResourcePattern type=TOPIC, name=*, pattern=LITERAL>, operation=ALL, type=ALLOW, host=*>,
         #  [(<ACL principal=User:Alice, resource=<ResourcePattern type=TOPIC, name=*, pattern=LITERAL>, operation=ALL, type=ALLOW, host=*>,
         #    <class 'kafka.errors.NoError'>)],
         #  <class 'kafka.errors.NoError'>)]
 
-    def list(self) -> Acls:
-        acl_all_filter = ACLFilter(
-            principal=None,
-            host=None,
-            operation=ACLOperation.ANY,
-            permission_type=ACLPermissionType.ANY,
+    def list(self, principal=None, host=None, operation=ACLOperation.ANY, permission_type=ACLPermissionType.ANY,
+             resource_type=ResourceType.ANY, resource_name=None, pattern_type=ACLResourcePatternType.ANY) -> Acls:
+        # The filter is sent to the broker, so only matching ACLs come back.
+        # None / ANY match everything; pattern_type MATCH also returns the
+        # wildcard and PREFIXED ACLs that apply to resource_name.
+        acl_filter = ACLFilter(
+            principal=principal,
+            host=host,
+            operation=operation,
+            permission_type=permission_type,
             resource_pattern=ResourcePatternFilter(
-                resource_type=ResourceType.ANY,
-                resource_name=None,
-                pattern_type=ACLResourcePatternType.ANY,
+                resource_type=resource_type,
+                resource_name=resource_name,
+                pattern_type=pattern_type,
             )
         )
-        acls, error = self.client.describe_acls(acl_all_filter)
+        # only the full listing is cached
+        match_all = (principal is None and host is None and resource_name is None
+                     and operation == ACLOperation.ANY and permission_type == ACLPermissionType.ANY
+                     and resource_type == ResourceType.ANY and pattern_type == ACLResourcePatternType.ANY)
+        use_cache = self.cache and match_all
+
+        acl_tuples = self.cache.get('acls') if use_cache else None
+        if acl_tuples is not None:
+            return Acls().load_from_tuples(acl_tuples)
+
+        acls, error = self.client.describe_acls(acl_filter)
         if error != kafka.errors.NoError:
             raise Exception(error)
 
-        return Acls().load_from_acl_objects(acls)
\ No newline at end of file
+        acls = Acls().load_from_acl_objects(acls)
+        if use_cache:
+            self.cache.put('acls', acls.to_tuples())
+        return acls
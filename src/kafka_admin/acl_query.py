@@ -0,0 +1,103 @@
+from __future__ import annotations
+from collections import defaultdict
+from kafka.admin.acl_resource import ACLOperation, ACLPermissionType, ResourceType, ACLResourcePatternType
+
+WILDCARD_RESOURCE = '*'
+WILDCARD_PRINCIPAL = 'User:*'
+WILDCARD_HOST = '*'
+
+_ALL = int(ACLOperation.ALL)
+_ALLOW = int(ACLPermissionType.ALLOW)
+_DENY = int(ACLPermissionType.DENY)
+_LITERAL = int(ACLResourcePatternType.LITERAL)
+_PREFIXED = int(ACLResourcePatternType.PREFIXED)
+
+# Same as the broker's authorizer: an ALLOW on any of these operations also
+# allows DESCRIBE (or DESCRIBE_CONFIGS). DENY is never implied.
+_IMPLIED_BY = {
+    int(ACLOperation.DESCRIBE): {int(ACLOperation.DESCRIBE), int(ACLOperation.READ), int(ACLOperation.WRITE),
+                                 int(ACLOperation.DELETE), int(ACLOperation.ALTER), _ALL},
+    int(ACLOperation.DESCRIBE_CONFIGS): {int(ACLOperation.DESCRIBE_CONFIGS), int(ACLOperation.ALTER_CONFIGS), _ALL},
+}
+
+
+class AclIndex():
+    # Answers "which ACLs apply to this resource" without scanning:
+    # LITERAL ACLs (including the '*' wildcard) are in a dict keyed by
+    # (resource_type, name), PREFIXED ACLs in one character trie per
+    # resource type. A lookup costs one dict hit plus one walk down the
+    # trie along the resource name.
+    def __init__(self, acls) -> None:
+        self.literal = defaultdict(list)
+        self.prefixed = defaultdict(dict)
+        for entry in acls:
+            if entry.pattern_type == _LITERAL:
+                self.literal[(entry.resource_type, entry.resource_name)].append(entry)
+            elif entry.pattern_type == _PREFIXED:
+                node = self.prefixed[entry.resource_type]
+                for char in entry.resource_name:
+                    node = node.setdefault(char, {})
+                # entries of a node live under the None key
+                node.setdefault(None, []).append(entry)
+
+    def matching(self, resource_type, resource_name) -> list:
+        resource_type = int(resource_type)
+        entries = []
+        entries.extend(self.literal.get((resource_type, resource_name), ()))
+        if resource_name != WILDCARD_RESOURCE:
+            entries.extend(self.literal.get((resource_type, WILDCARD_RESOURCE), ()))
+
+        node = self.prefixed.get(resource_type)
+        if node is not None:
+            entries.extend(node.get(None, ()))
+            for char in resource_name:
+                node = node.get(char)
+                if node is None:
+                    break
+                entries.extend(node.get(None, ()))
+        return entries
+
+    def check(self, principal, operation, resource_type, resource_name, host=None) -> tuple:
+        # (allowed, [deciding AclEntry, ...]); DENY wins over ALLOW.
+        # host=None ignores the host column of the ACLs: the entries of
+        # every host apply, so a DENY for one host denies.
+        operation = int(operation)
+        allows = []
+        denies = []
+        for entry in self.matching(resource_type, resource_name):
+            if entry.principal != principal and entry.principal != WILDCARD_PRINCIPAL:
+                continue
+            if host is not None and entry.host != host and entry.host != WILDCARD_HOST:
+                continue
+            if entry.permission_type == _DENY:
+                if entry.operation == operation or entry.operation == _ALL:
+                    denies.append(entry)
+            elif entry.permission_type == _ALLOW:
+                if entry.operation in _IMPLIED_BY.get(operation, (operation, _ALL)):
+                    allows.append(entry)
+        if denies:
+            return False, denies
+        return bool(allows), allows
+
+    def who_can(self, operation, resource_type, resource_name, host=None) -> list:
+        # [(principal, [allowing AclEntry, ...])] for every principal with a
+        # matching ALLOW that is not cancelled by a DENY.
+        principals = {entry.principal for entry in self.matching(resource_type, resource_name)
+                      if entry.permission_type == _ALLOW}
+        result = []
+        for principal in sorted(principals):
+            allowed, entries = self.check(principal, operation, resource_type, resource_name, host=host)
+            if allowed:
+                result.append((principal, entries))
+        return result
+
+
+def parse_query(query_dict) -> tuple:
+    # {principal, operation, resource_type, resource_name[, host]} -> check() args
+    return (
+        query_dict['principal'],
+        ACLOperation[query_dict.get('operation', 'ALL').upper()],
+        ResourceType[query_dict.get('resource_type', 'TOPIC').upper()],
+        query_dict['resource_name'],
+        query_dict.get('host') or None,
+    )
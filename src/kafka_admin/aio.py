@@ -0,0 +1,130 @@
+from __future__ import annotations
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from kafka_admin.topic import KafkaTopicStoreAdapter
+from kafka_admin.acl import KafkaAclStoreAdapter
+from kafka_admin.consumer_group import KafkaConsumerGroupStoreAdapter
+from kafka_admin.consumer_group_offsets import KafkaConsumerGroupOffsetsStoreAdapter
+from kafka_admin.profiling import profiler
+
+
+class AsyncClusterSession():
+    # asyncio front end of a ClusterSession. The *StoreAdapter calls are
+    # blocking, so each one runs on a worker thread. A KafkaAdminClient must
+    # not be used by two threads at once, so every worker borrows its own
+    # client from a pool: the session's client first, then extra clients
+    # created on demand. max_concurrency bounds both the calls in flight and
+    # the number of clients.
+    def __init__(self, session, max_concurrency=4) -> None:
+        self.session = session
+        self.max_concurrency = max_concurrency
+        # created in the running loop: before Python 3.10 a Semaphore binds
+        # to the loop that is current when it is created
+        self._semaphore = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='kafka-admin')
+        self._lock = threading.Lock()
+        self._idle_clients = []
+        self._extra_clients = []
+        self._session_client_taken = False
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle_clients:
+                return self._idle_clients.pop()
+            use_session_client = not self._session_client_taken
+            self._session_client_taken = True
+        if use_session_client:
+            return self.session.admin_client
+        client = self.session.create_admin_client()
+        with self._lock:
+            self._extra_clients.append(client)
+        return client
+
+    def _checkin(self, client) -> None:
+        with self._lock:
+            self._idle_clients.append(client)
+
+    def _call(self, make_adapter, method, args, kwargs):
+        client = self._checkout()
+        try:
+            result = getattr(make_adapter(client), method)(*args, **kwargs)
+            # generators have to be drained on the thread that owns the client
+            if isinstance(result, Iterator):
+                result = list(result)
+            return result
+        finally:
+            self._checkin(client)
+
+    async def run(self, make_adapter, method, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, make_adapter, method, args, kwargs)
+
+    def topic_adapter(self, **kwargs) -> AsyncStoreAdapter:
+        cache = self.session.metadata_cache
+        return AsyncKafkaTopicStoreAdapter(
+            self, lambda client: profiler.wrap(KafkaTopicStoreAdapter(client=client, cache=cache, **kwargs)))
+
+    def acl_adapter(self) -> AsyncStoreAdapter:
+        cache = self.session.metadata_cache
+        return AsyncStoreAdapter(self, lambda client: profiler.wrap(KafkaAclStoreAdapter(client=client, cache=cache)))
+
+    def consumer_group_adapter(self) -> AsyncStoreAdapter:
+        cache = self.session.metadata_cache
+        return AsyncStoreAdapter(self, lambda client: profiler.wrap(KafkaConsumerGroupStoreAdapter(client=client, cache=cache)))
+
+    def consumer_group_offsets_adapter(self, **kwargs) -> AsyncStoreAdapter:
+        cache = self.session.metadata_cache
+        return AsyncStoreAdapter(
+            self, lambda client: profiler.wrap(KafkaConsumerGroupOffsetsStoreAdapter(client=client, cache=cache, **kwargs)))
+
+    async def snapshot(self) -> dict:
+        # the four listings are independent, so this takes as long as the slowest
+        topics, acls, consumer_groups, consumer_groups_offsets = await asyncio.gather(
+            self.topic_adapter().list(),
+            self.acl_adapter().list(),
+            self.consumer_group_adapter().list(),
+            self.consumer_group_offsets_adapter().list(),
+        )
+        return dict(
+            topics=topics,
+            acls=acls,
+            consumer_groups=consumer_groups,
+            consumer_groups_offsets=consumer_groups_offsets,
+        )
+
+    def close(self) -> None:
+        # the session's own client is closed by ClusterSession.close()
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            extra_clients, self._extra_clients = self._extra_clients, []
+            self._idle_clients = []
+        for client in extra_clients:
+            client.close()
+
+
+class AsyncStoreAdapter():
+    # Same methods as the wrapped *StoreAdapter, as coroutines.
+    # Generators (KafkaConsumerGroupOffsetsStoreAdapter.list) come back as lists.
+    def __init__(self, session, make_adapter) -> None:
+        self.session = session
+        self.make_adapter = make_adapter
+
+    async def list(self, *args, **kwargs):
+        return await self.session.run(self.make_adapter, 'list', *args, **kwargs)
+
+    async def add(self, *args, **kwargs):
+        return await self.session.run(self.make_adapter, 'add', *args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await self.session.run(self.make_adapter, 'delete', *args, **kwargs)
+
+
+class AsyncKafkaTopicStoreAdapter(AsyncStoreAdapter):
+    async def add_partitions(self, *args, **kwargs):
+        return await self.session.run(self.make_adapter, 'add_partitions', *args, **kwargs)
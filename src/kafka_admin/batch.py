@@ -0,0 +1,101 @@
+from __future__ import annotations
+import time
+from collections import deque
+from logging import getLogger
+import kafka
+
+logger = getLogger(__name__)
+
+
+class ControllerBatchRunner():
+    # Sends topic-level controller requests (CreateTopics, DeleteTopics,
+    # CreatePartitions) in chunks, a few chunks at a time, and collects a
+    # per-topic result instead of failing on the first error.
+    #
+    # Pacing: the broker's throttle_time_ms holds back further sends, and
+    # the number of chunks in flight is halved when a chunk takes longer
+    # than target_latency_ms and grows back by one otherwise.
+    def __init__(self, client, chunk_size=100, max_in_flight=4, max_retries=3,
+                 retry_backoff_ms=500, target_latency_ms=10000) -> None:
+        self.client = client
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_backoff_ms = retry_backoff_ms
+        self.target_latency_ms = target_latency_ms
+
+    def _chunks(self, names):
+        for index in range(0, len(names), self.chunk_size):
+            yield names[index:index + self.chunk_size]
+
+    def run(self, names, build_request, done_error=None) -> dict:
+        # build_request(list of topic names) -> request for those topics
+        # done_error: the error that means the change is in place already
+        # (TopicAlreadyExistsError for a create, UnknownTopicOrPartitionError
+        # for a delete). It is never retried, and on a retry it counts as
+        # succeeded: the earlier attempt may have gone through after timing
+        # out on our side.
+        result = dict(succeeded=[], failed=[])
+        queue = deque((chunk, 0, 0.0) for chunk in self._chunks(list(names)))
+        in_flight = {}
+        concurrency = self.max_in_flight
+        not_before = 0.0
+
+        while queue or in_flight:
+            now = time.monotonic()
+            while queue and len(in_flight) < concurrency and now >= not_before and now >= queue[0][2]:
+                chunk, attempt, _ = queue.popleft()
+                future = self.client._send_request_to_node(self.client._controller_id, build_request(chunk))
+                in_flight[future] = (chunk, attempt, time.monotonic())
+
+            self.client._client.poll(timeout_ms=100)
+
+            for future in [future for future in in_flight if future.is_done]:
+                chunk, attempt, sent_at = in_flight.pop(future)
+                latency_ms = (time.monotonic() - sent_at) * 1000
+                if latency_ms > self.target_latency_ms:
+                    concurrency = max(1, concurrency // 2)
+                else:
+                    concurrency = min(self.max_in_flight, concurrency + 1)
+
+                if future.failed():
+                    logger.debug(f"{len(chunk)} topics: request failed: {future.exception!r}")
+                    retry = [(name, type(future.exception)) for name in chunk]
+                else:
+                    response = future.value
+                    throttle_time_ms = getattr(response, 'throttle_time_ms', 0)
+                    if throttle_time_ms:
+                        not_before = max(not_before, time.monotonic() + throttle_time_ms / 1000)
+                    retry = self._collect(response, result, done_error, attempt)
+
+                if not retry:
+                    continue
+                if any(error_type is kafka.errors.NotControllerError for _, error_type in retry):
+                    self.client._refresh_controller_id()
+                if attempt >= self.max_retries:
+                    result['failed'].extend(retry)
+                    continue
+                retry_at = time.monotonic() + self.retry_backoff_ms * (2 ** attempt) / 1000
+                queue.append(([name for name, _ in retry], attempt + 1, retry_at))
+
+        return result
+        # {'succeeded': ['example_topic1'],
+        #  'failed': [('example_topic2', <class 'kafka.errors.TopicAlreadyExistsError'>)]}
+
+    def _collect(self, response, result, done_error=None, attempt=0) -> list:
+        # CreateTopics / CreatePartitions use topic_errors,
+        # DeleteTopics uses topic_error_codes.
+        topic_error_tuples = (response.topic_errors if hasattr(response, 'topic_errors')
+                              else response.topic_error_codes)
+        retry = []
+        for topic, error_code in map(lambda e: e[:2], topic_error_tuples):
+            error_type = kafka.errors.for_code(error_code)
+            if error_type is kafka.errors.NoError or (error_type is done_error and attempt > 0):
+                result['succeeded'].append(topic)
+            elif error_type is done_error:
+                result['failed'].append((topic, error_type))
+            elif error_type is kafka.errors.NotControllerError or error_type.retriable:
+                retry.append((topic, error_type))
+            else:
+                result['failed'].append((topic, error_type))
+        return retry
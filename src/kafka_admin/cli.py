@@ -1,22 +1,31 @@
 import argparse
-import os
+import asyncio
+import json
+import sys
+import time
 import click
-import ssl
 from click.globals import pop_context
 from kafka.admin.acl_resource import ACL, ACLFilter, ACLOperation, ACLPermissionType, ResourcePattern, ResourceType, ACLResourcePatternType, ResourcePatternFilter
 from kafka.admin.client import KafkaAdminClient, KafkaClient
-from kafka import KafkaConsumer
 import kafka
 
 from kafka_admin.definition_store import (
-    KafkaTopicStoreAdapter,
-    KafkaAclStoreAdapter,
-    KafkaConsumerGroupStoreAdapter,
-    KafkaConsumerGroupOffsetsStoreAdapter,
-    DefinitionStore, Acls, Topics
+    ConsumerGroupLag,
+    DefinitionStore, Acls, Topics, TopicFilter, TopicsPlan
 )
 
-from kafka_admin.config import Config
+from kafka_admin.diff import diff, reorder, unified_diff
+from kafka_admin.session import ClusterSession
+from kafka_admin.aio import AsyncClusterSession
+from kafka_admin.output import OUTPUT_FORMATS, row_writer
+from kafka_admin.profiling import profiler
+from kafka_admin.reconcile import Reconciler
+from kafka_admin.snapshot import write_snapshot
+from kafka_admin.plan import Plan, PlanExecutor
+from kafka_admin.rebalance import ReassignmentPlanner, list_brokers, parse_broker
+from kafka_admin.skew import SkewReport, message_weights, rate_weights
+from kafka_admin.health import PROBLEM_KINDS, HealthReport, RowWatcher, topic_min_isr
+from kafka_admin.acl_query import AclIndex, parse_query
 from pprint import pprint as pp
 from types import SimpleNamespace
 
@@ -32,39 +41,37 @@ import click_log
 click_log.basic_config(logger)
 
 
-def create_admin_client(profilename=None):
-    config = Config('config.yaml')
-    context = ssl.create_default_context()
-    context.check_hostname = False
-    context.verify_mode = ssl.CERT_NONE
-    admin_client = KafkaAdminClient(
-        bootstrap_servers=config.bootstrap_servers,
-        security_protocol=config.security_protocol,
-        # sasl_mechanism=config.sasl_mechanism,
-        # sasl_plain_username=config.sasl_plain_username,
-        # sasl_plain_password=config.sasl_plain_password,
-        # ssl_context=context,
-    )
-    return admin_client
-
-def create_consumer_client(profilename=None):
-    config = Config('config.yaml')
-    context = ssl.create_default_context()
-    context.check_hostname = False
-    context.verify_mode = ssl.CERT_NONE
-    client = KafkaConsumer(
-        bootstrap_servers=config.bootstrap_servers,
-        security_protocol=config.security_protocol,
-        # sasl_mechanism=config.sasl_mechanism,
-        # sasl_plain_username=config.sasl_plain_username,
-        # sasl_plain_password=config.sasl_plain_password,
-        # ssl_context=context,
-    )
-    return client
-
 @click.group()
-def cmd():
-    pass
+@click.option('--cache/--no-cache', default=False, help='cache cluster metadata on disk')
+@click.option('--cache-ttl', default=300, help='seconds cached metadata stays valid')
+@click.option('--refresh', is_flag=True, default=False, help='refetch metadata and update the cache')
+@click.option('--output', default='table', type=click.Choice(OUTPUT_FORMATS), help='format of list commands')
+@click.option('--profile', is_flag=True, default=False, help='print time, requests and bytes per phase to stderr')
+@click.option('--profile-trace', default=None, type=click.Path(dir_okay=False), help='write a Chrome trace (chrome://tracing, Perfetto) to this file')
+@click.option('--snapshot', 'snapshot_filename', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='read topics and ACLs from a file written by "snapshot export" instead of the broker')
+@click.pass_context
+def cmd(ctx, cache, cache_ttl, refresh, output, profile, profile_trace, snapshot_filename):
+    if profile or profile_trace:
+        profiler.enable()
+        # registered first so it runs last, after the session is closed
+        ctx.call_on_close(lambda: report_profile(profile, profile_trace))
+    ctx.obj = ClusterSession('config.yaml', cache=cache, cache_ttl=cache_ttl, refresh=refresh,
+                             snapshot_filename=snapshot_filename)
+    ctx.call_on_close(ctx.obj.close)
+
+def report_profile(profile, profile_trace):
+    if profile:
+        click.echo(profiler.summary(), err=True)
+    if profile_trace:
+        profiler.write_chrome_trace(profile_trace)
+        click.echo(f"trace written to {profile_trace}", err=True)
+
+def output_format():
+    return click.get_current_context().find_root().params['output']
+
+def open_row_writer(headers=None, widths=None):
+    return row_writer(output_format(), sys.stdout, headers=headers, widths=widths)
 
 @cmd.group()
 def topic():
@@ -74,217 +81,300 @@ def topic():
 @click.option('--num-partitions', default=1, help='num of partitions')
 @click.option('--replication-factor', default=1, help='replication factor')
 @click.argument('topicname')
-def add(topicname, num_partitions, replication_factor):
+@click.pass_obj
+def add(session, topicname, num_partitions, replication_factor):
     click.echo(f"topic name: {topicname}")
     click.echo(f"num of partitions: {num_partitions}")
     click.echo(f"replication factor: {replication_factor}")
 
-    admin_client = create_admin_client()
-    adapter = KafkaTopicStoreAdapter(client=admin_client)
+    adapter = session.topic_adapter()
 
-    try:
-        ret = adapter.add([SimpleNamespace(
-            name=topicname,
-            num_partitions=num_partitions,
-            replication_factor=replication_factor,
-        )])
-        logger.debug(ret)
+    ret = adapter.add([SimpleNamespace(
+        name=topicname,
+        num_partitions=num_partitions,
+        replication_factor=replication_factor,
+    )])
+    logger.debug(ret)
+    for name, error_type in ret['failed']:
+        if error_type is kafka.errors.TopicAlreadyExistsError:
+            print("ERROR: Topic Already Exists.")
+        else:
+            print(f"ERROR: {error_type.__name__}")
+    if ret['succeeded']:
         print("Success: Topic Added")
-    except kafka.errors.TopicAlreadyExistsError as e:
-        logger.debug(e)
-        print("ERROR: Topic Already Exists.")
     return
 
 @topic.command()
 @click.argument('topicname')
-def remove(topicname):
-    admin_client = create_admin_client()
-    adapter = KafkaTopicStoreAdapter(client=admin_client)
+@click.pass_obj
+def remove(session, topicname):
+    adapter = session.topic_adapter()
 
-    try:
-        ret = adapter.delete([SimpleNamespace(name=topicname)])
-        logger.debug(ret)
+    ret = adapter.delete([SimpleNamespace(name=topicname)])
+    logger.debug(ret)
+    for name, error_type in ret['failed']:
+        if error_type is kafka.errors.UnknownTopicOrPartitionError:
+            print("ERROR: Unknown Topic On Partition.")
+        else:
+            print(f"ERROR: {error_type.__name__}")
+    if ret['succeeded']:
         print("Success: Topic Deleted")
-    except kafka.errors.UnknownTopicOrPartitionError as e:
-        logger.debug(e)
-        print("ERROR: Unknown Topic On Partition.")
+
+def topic_filter_options(f):
+    f = click.option('--regex', default=None, help='only topics whose name matches this regex')(f)
+    f = click.option('--prefix', multiple=True, help='only topics with this name prefix (repeatable)')(f)
+    f = click.option('--topic', 'topic_names', multiple=True, help='only this topic (repeatable)')(f)
+    f = click.option('--describe-chunk-size', default=1000, help='topics per Metadata request when filtering')(f)
+    return f
 
 @topic.command(name='list')
-def list_command():
-    admin_client = create_admin_client()
-    adapter = KafkaTopicStoreAdapter(client=admin_client)
+@topic_filter_options
+@click.pass_obj
+def list_command(session, topic_names, prefix, regex, describe_chunk_size):
+    adapter = session.topic_adapter(describe_chunk_size=describe_chunk_size)
+    topic_filter = TopicFilter(names=topic_names, prefixes=prefix, regex=regex)
     try:
-        topics = adapter.list()
-        print(topics.to_csv(verbose=True))
+        topics = adapter.list(topic_filter)
     except Exception as e:
         print(e)
         click.secho(e, fg='red')
+        return
+
+    if output_format() == 'table':
+        with profiler.span('render'):
+            print(topics.to_csv(verbose=True))
+        if session.snapshot:
+            # a snapshot has no offsets
+            return
+        offsets = session.topic_offsets_adapter().list(topics)
+        with profiler.span('render'), open_row_writer() as writer:
+            print("offsets")
+            writer.writerows(offsets)
+        return
+
+    # one row per partition, with its offsets
+    if session.snapshot:
+        offsets = {}
+    else:
+        offsets = {(row['topic'], row['partition']): row for row in session.topic_offsets_adapter().list(topics)}
+    with profiler.span('render'), open_row_writer() as writer:
+        for row in topics.iter_dicts(verbose=True, blank_repeated=False):
+            offset_row = offsets.get((row['name'], row['partition_id']), {})
+            writer.writerow(dict(
+                row,
+                start_offset=offset_row.get('start_offset'),
+                end_offset=offset_row.get('end_offset'),
+                messages=offset_row.get('messages'),
+            ))
 
-    config = Config('config.yaml')
-    context = ssl.create_default_context()
-    context.check_hostname = False
-    context.verify_mode = ssl.CERT_NONE
-    client = create_consumer_client()
-
-    print("last_positions")
-    from kafka import TopicPartition
-    for topic in topics:
-        partition_ids = client.partitions_for_topic(topic.name)
-        topic_partitions = [TopicPartition(topic.name, partition_id) for partition_id in partition_ids]
-        client.assign(topic_partitions)
-        client.seek_to_end()
-        for topic_partition in topic_partitions:
-            last_position = client.position(topic_partition)
-            print(f"{topic_partition.topic} {topic_partition.partition} {last_position}")
 
+def print_diff(cur_text, new_text):
+    print(unified_diff(
+        cur_text.splitlines(), new_text.splitlines(),
+        fromfile='broker.txt', tofile='csv.txt',
+        color=True, ignore_all_space=True,
+    ))
 
 def reorder_cur_topics(new_topics, cur_topics):
-    result_cur_topics = Topics()
-
-    for new_topic in new_topics:
-        try:
-            cur_topics.remove(new_topic)
-            result_cur_topics.append(new_topic)
-        except ValueError:
-            pass
-    result_cur_topics.extend(sorted(cur_topics, key=lambda x: x.name))
-
-    return result_cur_topics
+    return Topics(*reorder(new_topics, cur_topics, key=lambda x: x.name, sort_key=lambda x: x.name))
 
 @topic.command()
 @click.option('--check', is_flag=True, default=False, help='check mode')
 @click.option('--delete-first', is_flag=True, default=False, help='Delete first when recreate pertition')
-def apply(check, delete_first):
-    config = Config('config.yaml')
-    store = DefinitionStore()
-    store.load('definitions/sample.csv')
-
-    admin_client = create_admin_client()
-    adapter = KafkaTopicStoreAdapter(client=admin_client)
-
-    new_topics = store.topics
-    cur_topics = adapter.list()
-
-    topics_marked_add = new_topics - cur_topics
-    topics_marked_del = cur_topics - new_topics
-
-    click.secho('Will be added', fg='green')
-    print(topics_marked_add.to_csv(verbose=False))
-    click.secho('Will be deleted', fg='green')
-    print(topics_marked_del.to_csv(verbose=False))
-
-    click.secho('diff', fg='green')
-    cur_topics = reorder_cur_topics(new_topics, cur_topics)
-
-    import os
-    import subprocess
-    import tempfile
-    with tempfile.TemporaryDirectory() as dname:
-        with open(os.path.join(dname, "broker.txt"), "w") as f:
-            print(cur_topics.to_csv(verbose=False), file=f)
-        with open(os.path.join(dname, "csv.txt"), "w") as f:
-            print(new_topics.to_csv(verbose=False), file=f)
-
-        proc = subprocess.run([
-                'diff', '-u', '--color=always', '--ignore-all-space',
-                os.path.join(dname, "broker.txt"), os.path.join(dname, "csv.txt")
-            ],
-            encoding='utf-8', stdout=subprocess.PIPE)
-        print(proc.stdout)
+@click.option('--chunk-size', default=100, help='topics per CreateTopics/DeleteTopics request')
+@click.option('--max-in-flight', default=4, help='max number of concurrent requests to the controller')
+@click.option('--max-retries', default=3, help='retries for topics that failed with a retriable error')
+@topic_filter_options
+@click.pass_obj
+def apply(session, check, delete_first, chunk_size, max_in_flight, max_retries,
+          topic_names, prefix, regex, describe_chunk_size):
+    with profiler.span('load'):
+        store = DefinitionStore()
+        store.load('definitions/sample.csv')
+
+    adapter = session.topic_adapter(chunk_size=chunk_size, max_in_flight=max_in_flight, max_retries=max_retries,
+                                    describe_chunk_size=describe_chunk_size)
+
+    # with a filter only the selected slice of both sides is compared
+    topic_filter = TopicFilter(names=topic_names, prefixes=prefix, regex=regex)
+    new_topics = topic_filter.select(store.topics)
+    cur_topics = adapter.list(topic_filter)
+
+    with profiler.span('plan'):
+        plan = TopicsPlan(new_topics, cur_topics)
+
+    with profiler.span('render'):
+        click.secho('Will be added', fg='green')
+        print(plan.add.to_csv(verbose=False))
+        click.secho('Will be deleted', fg='green')
+        print(plan.delete.to_csv(verbose=False))
+        click.secho('Will add partitions', fg='green')
+        print(plan.add_partitions.to_csv(verbose=False))
+        if plan.reassign:
+            click.secho('Needs replica reassignment (not applied)', fg='yellow')
+            print(plan.reassign_to_csv())
+
+        click.secho('diff', fg='green')
+        cur_topics = reorder_cur_topics(new_topics, cur_topics)
+
+        print_diff(cur_topics.to_csv(verbose=False), new_topics.to_csv(verbose=False))
 
     if check:
         click.secho('Check mode', fg='blue')
     else:
-        if delete_first:
-            click.secho("Result of deletion", fg='green')
-            result = adapter.delete(topics_marked_del)
-            pp(result)
-            click.secho("Result of addition", fg='green')
-            result = adapter.add(topics_marked_add)
-            pp(result)
-        else:
-            click.secho("Result of addition", fg='green')
-            result = adapter.add(topics_marked_add)
-            pp(result)
-            click.secho("Result of deletion", fg='green')
-            result = adapter.delete(topics_marked_del)
+        with profiler.span('apply'):
+            if delete_first:
+                click.secho("Result of deletion", fg='green')
+                result = adapter.delete(plan.delete)
+                pp(result)
+                click.secho("Result of addition", fg='green')
+                result = adapter.add(plan.add)
+                pp(result)
+            else:
+                click.secho("Result of addition", fg='green')
+                result = adapter.add(plan.add)
+                pp(result)
+                click.secho("Result of deletion", fg='green')
+                result = adapter.delete(plan.delete)
+                pp(result)
+            click.secho("Result of partition addition", fg='green')
+            result = adapter.add_partitions(plan.add_partitions)
             pp(result)
 
     click.secho('Finish', fg='green')
 
+@topic.command()
+@click.option('--broker', 'broker_specs', multiple=True,
+              help='broker to balance over as ID or ID:RACK (repeatable); default: the brokers of the cluster')
+@click.option('-o', '--out', 'filename', required=True, type=click.Path(dir_okay=False, writable=True),
+              help='reassignment JSON for kafka-reassign-partitions.sh')
+@click.option('--rollback', 'rollback_filename', default=None, type=click.Path(dir_okay=False, writable=True),
+              help='also write the current assignment of the moved partitions here')
+@topic_filter_options
+@click.pass_obj
+def rebalance(session, broker_specs, filename, rollback_filename, topic_names, prefix, regex, describe_chunk_size):
+    # Replicas on brokers left out of --broker are moved off them.
+    if broker_specs:
+        brokers = dict(parse_broker(spec) for spec in broker_specs)
+    elif session.snapshot:
+        # a snapshot has no broker list: the brokers that hold replicas, without racks
+        brokers = None
+    else:
+        brokers = list_brokers(session.admin_client)
+
+    adapter = session.topic_adapter(describe_chunk_size=describe_chunk_size)
+    topics = adapter.list(TopicFilter(names=topic_names, prefixes=prefix, regex=regex))
+
+    with profiler.span('plan'):
+        planner = ReassignmentPlanner(topics, brokers)
+        moved = planner.plan()
+        reassignment = planner.reassignment()
+
+    with profiler.span('render'):
+        with open_row_writer() as writer:
+            writer.writerows(planner.broker_rows())
+        with open(filename, 'w') as f:
+            f.write(json.dumps(reassignment))
+        if rollback_filename:
+            with open(rollback_filename, 'w') as f:
+                f.write(json.dumps(planner.rollback()))
+    click.secho(f"{moved} replicas of {len(reassignment['partitions'])} partitions move"
+                f"{' (rack aware)' if planner.rack_aware else ''}; reassignment written to {filename}",
+                fg='green', err=True)
+
 @cmd.group()
 def consumer_groups():
     pass
 
 @consumer_groups.command(name='list')
-def list_command():
-    admin_client = create_admin_client()
-    adapter = KafkaConsumerGroupStoreAdapter(client=admin_client)
-    consumer_group_details = adapter.list()
-    logger.debug(consumer_group_details)
-    consumer_group_detail_dicts = []
-
-    for consumer_group_detail in consumer_group_details:
-        if len(consumer_group_detail.members) == 0:
-            consumer_group_detail_dicts.append(dict(
+@click.option('--state', multiple=True,
+              type=click.Choice(['Stable', 'Empty', 'PreparingRebalance', 'CompletingRebalance', 'Dead'], case_sensitive=False),
+              help='only groups in this state (repeatable)')
+@click.option('--group-regex', default=None, help='only groups whose name matches this regex')
+@click.option('--batch-size', default=100, help='groups per DescribeGroups request')
+@click.option('--max-in-flight', default=8, help='max number of concurrent DescribeGroups requests')
+@click.pass_obj
+def list_command(session, state, group_regex, batch_size, max_in_flight):
+    adapter = session.consumer_group_adapter(batch_size=batch_size, max_in_flight=max_in_flight)
+
+    # estimated widths so that rows are printed as groups are described
+    widths = dict(error_code=10, consumer_group=40, state=19, protocol_type=13, protocol=10,
+                  client_id=40, client_host=15, topic=30, partitions=20)
+    with open_row_writer(headers=widths.keys(), widths=widths) as writer:
+        for consumer_group_detail in adapter.list(group_regex=group_regex, states=state or None):
+            logger.debug(consumer_group_detail)
+            group_dict = dict(
                 error_code=consumer_group_detail.error_code,
-                group=consumer_group_detail.group,
+                consumer_group=consumer_group_detail.group,
                 state=consumer_group_detail.state,
                 protocol_type=consumer_group_detail.protocol_type,
                 protocol=consumer_group_detail.protocol,
-                client_id="",
-                client_host="",
-                subscription="",
-                topic="",
-                partitions="",
-            ))
-        else:
+            )
+            if len(consumer_group_detail.members) == 0:
+                writer.writerow(group_dict)
+                continue
             for member_info in consumer_group_detail.members:
                 for assignment in member_info.member_assignment.assignment:
-                    consumer_group_detail_dicts.append(dict(
-                        error_code=consumer_group_detail.error_code,
-                        consumer_group=consumer_group_detail.group,
-                        state=consumer_group_detail.state,
-                        protocol_type=consumer_group_detail.protocol_type,
-                        protocol=consumer_group_detail.protocol,
+                    writer.writerow(dict(
+                        group_dict,
                         client_id=member_info.client_id,
                         client_host=member_info.client_host,
                         topic=assignment[0],
                         partitions=str(assignment[1])
                     ))
 
-    from kafka_admin.pyfixedwidths import FixedWidthFormatter
-    fwf = FixedWidthFormatter()
-    print(fwf.from_dict(consumer_group_detail_dicts).to_text())
-
 @cmd.group()
 def consumer_group_offsets():
     pass
 
 @consumer_group_offsets.command(name='list')
-def list_command():
-    admin_client = create_admin_client()
-    adapter = KafkaConsumerGroupOffsetsStoreAdapter(client=admin_client)
-    consumer_groups_offsets_info = adapter.list()
-    logger.debug(consumer_groups_offsets_info)
-
-    consumer_group_offset_dicts = []
-    for consumer_groups_offset_info in consumer_groups_offsets_info:
-        consumer_group_id = consumer_groups_offset_info['consumer_group']
-        consumer_group_offsets = consumer_groups_offset_info['consumer_group_offsets']
-
-        for topic_partition, offset_and_metadata in consumer_group_offsets.items():
-            consumer_group_offset_dicts.append(dict(
-                consumer_group=consumer_group_id,
-                topic=topic_partition.topic,
-                partition=topic_partition.partition,
-                offset=offset_and_metadata.offset,
-                metadata=offset_and_metadata.metadata,
-            ))
+@click.option('--max-in-flight', default=32, help='max number of concurrent OffsetFetch requests')
+@click.pass_obj
+def list_command(session, max_in_flight):
+    adapter = session.consumer_group_offsets_adapter(max_in_flight=max_in_flight)
+
+    with open_row_writer(headers=['consumer_group', 'topic', 'partition', 'offset', 'metadata']) as writer:
+        for consumer_groups_offset_info in adapter.list():
+            logger.debug(consumer_groups_offset_info)
+            consumer_group_id = consumer_groups_offset_info['consumer_group']
+            consumer_group_offsets = consumer_groups_offset_info['consumer_group_offsets']
+
+            for topic_partition, offset_and_metadata in consumer_group_offsets.items():
+                writer.writerow(dict(
+                    consumer_group=consumer_group_id,
+                    topic=topic_partition.topic,
+                    partition=topic_partition.partition,
+                    offset=offset_and_metadata.offset,
+                    metadata=offset_and_metadata.metadata,
+                ))
+
+@consumer_group_offsets.command()
+@click.option('--group', multiple=True, help='consumer group (repeatable)')
+@click.option('--topic', multiple=True, help='topic (repeatable)')
+@click.option('--max-in-flight', default=32, help='max number of concurrent OffsetFetch requests')
+@click.pass_obj
+def lag(session, group, topic, max_in_flight):
+    adapter = session.consumer_group_offsets_adapter(max_in_flight=max_in_flight)
+    consumer_groups_offsets = list(adapter.list(group_ids=list(group) if group else None))
+
+    topics = set(topic)
+    offsets_adapter = session.topic_offsets_adapter()
+    end_offsets = offsets_adapter.end_offsets(ConsumerGroupLag.partitions_of(consumer_groups_offsets, topics))
+    consumer_group_lag = ConsumerGroupLag().load(consumer_groups_offsets, end_offsets, topics)
+
+    if output_format() != 'table':
+        # per-topic and per-group lag are sums of these rows
+        with open_row_writer() as writer:
+            writer.writerows(consumer_group_lag.partitions)
+        return
 
     from kafka_admin.pyfixedwidths import FixedWidthFormatter
-    fwf = FixedWidthFormatter()
-    print(fwf.from_dict(consumer_group_offset_dicts).to_text())
+    click.secho('Lag per consumer group', fg='green')
+    print(FixedWidthFormatter().from_dict(consumer_group_lag.groups).to_text())
+    click.secho('Lag per topic', fg='green')
+    print(FixedWidthFormatter().from_dict(consumer_group_lag.topics).to_text())
+    click.secho('Lag per partition', fg='green')
+    print(FixedWidthFormatter().from_dict(consumer_group_lag.partitions).to_text())
 
 
 @cmd.group()
@@ -292,7 +382,8 @@ def acl():
     pass
 
 @acl.command()
-def add():
+@click.pass_obj
+def add(session):
     acl = ACL(
         principal='User:Alice',
         host="*",
@@ -304,8 +395,7 @@ def add():
             pattern_type=ACLResourcePatternType.LITERAL,
         )
     )
-    admin_client = create_admin_client()
-    adapter = KafkaAclStoreAdapter(client=admin_client)
+    adapter = session.acl_adapter()
     ret = adapter.add([acl])
     logger.debug(ret)
     if ret['failed'] != []:
@@ -315,7 +405,8 @@ def add():
         click.secho('Finish', fg='green')
 
 @acl.command()
-def remove():
+@click.pass_obj
+def remove(session):
     acl = ACLFilter(
         principal='User:Alice',
         host="*",
@@ -327,8 +418,7 @@ def remove():
             pattern_type=ACLResourcePatternType.LITERAL,
         )
     )
-    admin_client = create_admin_client()
-    adapter = KafkaAclStoreAdapter(client=admin_client)
+    adapter = session.acl_adapter()
     ret = adapter.delete([acl])
     logger.debug(ret)
     if ret[0][2] != kafka.errors.NoError:
@@ -337,138 +427,438 @@ def remove():
         click.secho(ret, fg='green')
         click.secho('Finish', fg='green')
 
+def enum_names(enum_class):
+    return [member.name for member in enum_class if member.name != 'UNKNOWN']
+
 @acl.command(name='list')
-def list_command():
-    config = Config('config.yaml')
-    admin_client = create_admin_client()
-    adapter = KafkaAclStoreAdapter(client=admin_client)
+@click.option('--principal', default=None, help='e.g. User:Alice')
+@click.option('--host', default=None, help='host')
+@click.option('--operation', default='ANY', type=click.Choice(enum_names(ACLOperation), case_sensitive=False))
+@click.option('--permission-type', default='ANY', type=click.Choice(enum_names(ACLPermissionType), case_sensitive=False))
+@click.option('--resource-type', default='ANY', type=click.Choice(enum_names(ResourceType), case_sensitive=False))
+@click.option('--resource-name', default=None, help='resource name')
+@click.option('--pattern-type', default='ANY', type=click.Choice(enum_names(ACLResourcePatternType), case_sensitive=False),
+              help='MATCH also returns the wildcard and prefixed ACLs that apply to --resource-name')
+@click.pass_obj
+def list_command(session, principal, host, operation, permission_type, resource_type, resource_name, pattern_type):
+    adapter = session.acl_adapter()
     try:
-        acls = adapter.list()
-        print(acls)
+        acls = adapter.list(
+            principal=principal,
+            host=host,
+            operation=ACLOperation[operation.upper()],
+            permission_type=ACLPermissionType[permission_type.upper()],
+            resource_type=ResourceType[resource_type.upper()],
+            resource_name=resource_name,
+            pattern_type=ACLResourcePatternType[pattern_type.upper()],
+        )
     except Exception as e:
         print(e)
         click.secho(e, fg='red')
+        return
 
+    if output_format() == 'table':
+        print(acls.to_csv())
+        return
+    with open_row_writer() as writer:
+        writer.writerows(entry.to_dict() for entry in acls)
+
+
+def load_acl_index(session, source, filename):
+    if source == 'file':
+        store = DefinitionStore()
+        store.load(filename)
+        return AclIndex(store.acls)
+    return AclIndex(session.acl_adapter().list())
+
+def format_acl_entries(entries):
+    return " ".join(
+        f"{entry_dict['permission_type']}:{entry_dict['operation']}:{entry_dict['pattern_type']}:{entry_dict['resource_name']}"
+        for entry_dict in map(lambda entry: entry.to_dict(), entries))
 
 @acl.command()
-def diff():
+@click.option('--source', default='cluster', type=click.Choice(['cluster', 'file']), help='where the ACLs come from')
+@click.option('--file', 'filename', default='definitions/sample.csv', help='definitions file for --source file')
+@click.option('--principal', default=None, help='e.g. User:Alice')
+@click.option('--operation', default='READ', type=click.Choice(enum_names(ACLOperation), case_sensitive=False))
+@click.option('--resource-type', default='TOPIC', type=click.Choice(enum_names(ResourceType), case_sensitive=False))
+@click.option('--resource-name', default=None, help='resource name')
+@click.option('--host', default=None, help='client host; without it the ACLs of every host apply, DENYs included')
+@click.option('--batch', 'batch_filename', default=None,
+              help='CSV file with principal, operation, resource_type, resource_name[, host] columns')
+@click.pass_obj
+def check(session, source, filename, principal, operation, resource_type, resource_name, host, batch_filename):
+    index = load_acl_index(session, source, filename)
+
+    from kafka_admin.pyfixedwidths import iter_text_records
+    if batch_filename is None:
+        if principal is None or resource_name is None:
+            raise click.UsageError('--principal and --resource-name are required without --batch')
+        queries = [(None, dict(principal=principal, operation=operation, resource_type=resource_type,
+                               resource_name=resource_name, host=host))]
+    else:
+        with open(batch_filename, 'r') as f:
+            queries = list(iter_text_records(f))
+
+    with open_row_writer() as writer:
+        for lineno, query_dict in queries:
+            try:
+                query = parse_query(query_dict)
+            except KeyError as e:
+                raise Exception(f"{batch_filename}: line {lineno}: Invalid query: {e!r}") from e
+            allowed, entries = index.check(*query)
+            writer.writerow(dict(
+                principal=query[0],
+                operation=query[1].name,
+                resource_type=query[2].name,
+                resource_name=query[3],
+                host=query[4] or '',
+                result='ALLOWED' if allowed else 'DENIED',
+                acls=format_acl_entries(entries),
+            ))
+
+@acl.command(name='who-can')
+@click.option('--source', default='cluster', type=click.Choice(['cluster', 'file']), help='where the ACLs come from')
+@click.option('--file', 'filename', default='definitions/sample.csv', help='definitions file for --source file')
+@click.option('--operation', default='WRITE', type=click.Choice(enum_names(ACLOperation), case_sensitive=False))
+@click.option('--resource-type', default='TOPIC', type=click.Choice(enum_names(ResourceType), case_sensitive=False))
+@click.option('--resource-name', required=True, help='resource name')
+@click.option('--host', default=None, help='client host; without it the ACLs of every host apply, DENYs included')
+@click.pass_obj
+def who_can(session, source, filename, operation, resource_type, resource_name, host):
+    index = load_acl_index(session, source, filename)
+
+    with open_row_writer(headers=['principal', 'acls']) as writer:
+        for principal, entries in index.who_can(
+                ACLOperation[operation.upper()], ResourceType[resource_type.upper()], resource_name, host=host):
+            writer.writerow(dict(principal=principal, acls=format_acl_entries(entries)))
+
+@acl.command(name='diff')
+def diff_command():
     pass
 
 @acl.command()
 @click.option('--check', is_flag=True, default=False, help='check mode')
-def clear(check):
+@click.pass_obj
+def clear(session, check):
 
-    admin_client = create_admin_client()
-    adapter = KafkaAclStoreAdapter(client=admin_client)
+    adapter = session.acl_adapter()
 
     store = DefinitionStore()
     new_acls = store.acls
     cur_acls = adapter.list()
 
-    acls_marked_add = new_acls - cur_acls
-    acls_marked_del = cur_acls - new_acls
-
-    click.secho('Will be added', fg='green')
-    print(acls_marked_add.to_csv())
-    click.secho('Will be deleted', fg='green')
-    print(acls_marked_del.to_csv())
-
-    cur_acls = reorder_cur_acls(new_acls, cur_acls)
-    click.secho('diff', fg='green')
-
-    import os
-    import subprocess
-    import tempfile
-    with tempfile.TemporaryDirectory() as dname:
-        with open(os.path.join(dname, "broker.txt"), "w") as f:
-            print(cur_acls.to_csv(), file=f)
-        with open(os.path.join(dname, "csv.txt"), "w") as f:
-            print(new_acls.to_csv(), file=f)
-
-        proc = subprocess.run([
-                'diff', '-u', '--color=always', '--ignore-all-space',
-                os.path.join(dname, "broker.txt"), os.path.join(dname, "csv.txt")
-            ],
-            encoding='utf-8', stdout=subprocess.PIPE)
-        print(proc.stdout)
+    with profiler.span('plan'):
+        changes = diff(new_acls, cur_acls)
+        acls_marked_add = Acls(*changes.added)
+        acls_marked_del = Acls(*changes.deleted)
+
+    with profiler.span('render'):
+        click.secho('Will be added', fg='green')
+        print(acls_marked_add.to_csv())
+        click.secho('Will be deleted', fg='green')
+        print(acls_marked_del.to_csv())
+
+        cur_acls = reorder_cur_acls(new_acls, cur_acls)
+        click.secho('diff', fg='green')
+
+        print_diff(cur_acls.to_csv(), new_acls.to_csv())
 
     if check:
         click.secho('Check mode', fg='blue')
     else:
-        click.secho("Result of addition", fg='green')
-        result = adapter.add(acls_marked_add)
-        pp(result)
+        with profiler.span('apply'):
+            click.secho("Result of addition", fg='green')
+            result = adapter.add(acls_marked_add)
+            pp(result)
 
-        click.secho("Result of deletion", fg='green')
-        result = adapter.delete(acls_marked_del)
-        pp(result)
+            click.secho("Result of deletion", fg='green')
+            result = adapter.delete(acls_marked_del)
+            pp(result)
 
     click.secho('Finish', fg='green')
 
 def reorder_cur_acls(new_acls, cur_acls):
-    result_cur_acls = Acls()
-
-    for new_acl in new_acls:
-        try:
-            cur_acls.remove(new_acl)
-            result_cur_acls.append(new_acl)
-        except ValueError:
-            pass
-    result_cur_acls.extend(cur_acls)
-
-    return result_cur_acls
+    return Acls(*reorder(new_acls, cur_acls))
 
 @acl.command()
 @click.option('--check', is_flag=True, default=False, help='check mode')
-def apply(check):
-    config = Config('config.yaml')
-    store = DefinitionStore()
-    store.load('definitions/sample.csv')
+@click.pass_obj
+def apply(session, check):
+    with profiler.span('load'):
+        store = DefinitionStore()
+        store.load('definitions/sample.csv')
 
-    admin_client = create_admin_client()
-    adapter = KafkaAclStoreAdapter(client=admin_client)
+    adapter = session.acl_adapter()
 
     new_acls = store.acls
     cur_acls = adapter.list()
 
-    acls_marked_add = new_acls - cur_acls
-    acls_marked_del = cur_acls - new_acls
-
-    click.secho('Will be added', fg='green')
-    print(acls_marked_add.to_csv())
-    click.secho('Will be deleted', fg='green')
-    print(acls_marked_del.to_csv())
-
-    cur_acls = reorder_cur_acls(new_acls, cur_acls)
-    click.secho('diff', fg='green')
-
-    import os
-    import subprocess
-    import tempfile
-    with tempfile.TemporaryDirectory() as dname:
-        with open(os.path.join(dname, "broker.txt"), "w") as f:
-            print(cur_acls.to_csv(), file=f)
-        with open(os.path.join(dname, "csv.txt"), "w") as f:
-            print(new_acls.to_csv(), file=f)
-
-        proc = subprocess.run([
-                'diff', '-u', '--color=always', '--ignore-all-space',
-                os.path.join(dname, "broker.txt"), os.path.join(dname, "csv.txt")
-            ],
-            encoding='utf-8', stdout=subprocess.PIPE)
-        print(proc.stdout)
+    with profiler.span('plan'):
+        changes = diff(new_acls, cur_acls)
+        acls_marked_add = Acls(*changes.added)
+        acls_marked_del = Acls(*changes.deleted)
+
+    with profiler.span('render'):
+        click.secho('Will be added', fg='green')
+        print(acls_marked_add.to_csv())
+        click.secho('Will be deleted', fg='green')
+        print(acls_marked_del.to_csv())
+
+        cur_acls = reorder_cur_acls(new_acls, cur_acls)
+        click.secho('diff', fg='green')
+
+        print_diff(cur_acls.to_csv(), new_acls.to_csv())
 
     if check:
         click.secho('Check mode', fg='blue')
     else:
-        click.secho("Result of addition", fg='green')
-        result = adapter.add(acls_marked_add)
-        pp(result)
+        with profiler.span('apply'):
+            click.secho("Result of addition", fg='green')
+            result = adapter.add(acls_marked_add)
+            pp(result)
+
+            click.secho("Result of deletion", fg='green')
+            result = adapter.delete(acls_marked_del)
+            pp(result)
+
+    click.secho('Finish', fg='green')
+
+@cmd.group()
+def cluster():
+    pass
+
+@cluster.command()
+@click.option('--max-concurrency', default=4, help='max number of listings running at once')
+@click.pass_obj
+def summary(session, max_concurrency):
+    async_session = AsyncClusterSession(session, max_concurrency=max_concurrency)
+    try:
+        snapshot = asyncio.run(async_session.snapshot())
+    finally:
+        async_session.close()
+
+    with open_row_writer() as writer:
+        writer.writerow(dict(
+            topics=len(snapshot['topics']),
+            partitions=sum(len(topic._raw['partitions']) for topic in snapshot['topics']),
+            acls=len(snapshot['acls']),
+            consumer_groups=len(snapshot['consumer_groups']),
+            committed_offsets=sum(len(x['consumer_group_offsets']) for x in snapshot['consumer_groups_offsets']),
+        ))
+
+def print_plan(plan):
+    click.secho('Topics to add', fg='green')
+    print(plan.topics.add.to_csv(verbose=False))
+    click.secho('Topics to delete', fg='green')
+    print(plan.topics.delete.to_csv(verbose=False))
+    click.secho('Topics to add partitions to', fg='green')
+    print(plan.topics.add_partitions.to_csv(verbose=False))
+    if plan.topics.reassign:
+        click.secho('Needs replica reassignment (not applied)', fg='yellow')
+        print(plan.topics.reassign_to_csv())
+    click.secho('ACLs to add', fg='green')
+    print(plan.acls_add.to_csv())
+    click.secho('ACLs to delete', fg='green')
+    print(plan.acls_delete.to_csv())
+
+@cluster.command()
+@click.option('--by', default='broker', type=click.Choice(['broker', 'topic']),
+              help='one row per broker, or the topics that add most to the leader imbalance')
+@click.option('--top', default=10, help='number of topics with --by topic')
+@click.option('--weight', default='none', type=click.Choice(['none', 'messages', 'rate']),
+              help='weigh partitions by messages held or by messages/s produced')
+@click.option('--rate-interval', default=10.0, help='seconds between the two end offset samples of --weight rate')
+@topic_filter_options
+@click.pass_obj
+def skew(session, by, top, weight, rate_interval, topic_names, prefix, regex, describe_chunk_size):
+    topics = session.topic_adapter(describe_chunk_size=describe_chunk_size).list(
+        TopicFilter(names=topic_names, prefixes=prefix, regex=regex))
+    # brokers without any partition count too; a snapshot only knows the ones with replicas
+    brokers = None if session.snapshot else list_brokers(session.admin_client)
+
+    weights = None
+    if weight == 'messages':
+        weights = message_weights(session.topic_offsets_adapter(), topics)
+    elif weight == 'rate':
+        weights = rate_weights(session.topic_offsets_adapter(), topics, rate_interval)
+
+    with profiler.span('plan'):
+        report = SkewReport(topics, brokers=brokers, weights=weights)
+        rows = report.broker_rows() if by == 'broker' else report.topic_rows(top)
+
+    with profiler.span('render'), open_row_writer() as writer:
+        writer.writerows(rows)
+    if report.offline_partitions:
+        click.secho(f"{report.offline_partitions} of {report.num_partitions} partitions have no leader",
+                    fg='red', err=True)
+
+HEALTH_KEYS = dict(partition=('topic', 'partition'), broker=('broker',), topic=('topic',), summary=())
+
+@cluster.command()
+@click.option('--by', default='partition', type=click.Choice(list(HEALTH_KEYS)),
+              help='problem partitions, counts per broker or per topic, or the totals only')
+@click.option('--min-isr', default=None, type=int,
+              help='min.insync.replicas to check every topic against instead of its own config')
+@click.option('--config-chunk-size', default=1000, help='topics per DescribeConfigs request')
+@click.option('--watch', is_flag=True, default=False, help='keep polling and print only what changed')
+@click.option('--interval', default=10.0, help='seconds between polls with --watch')
+@topic_filter_options
+@click.pass_obj
+def health(session, by, min_isr, config_chunk_size, watch, interval, topic_names, prefix, regex, describe_chunk_size):
+    if watch and session.snapshot:
+        raise click.UsageError("--watch polls the broker; it can not run against --snapshot")
+    topic_filter = TopicFilter(names=topic_names, prefixes=prefix, regex=regex)
+
+    def poll():
+        cache = session.metadata_cache
+        if cache and watch:
+            # every poll has to see the broker, not the cache
+            cache.invalidate('topics')
+            cache.invalidate('topic_names')
+        topics = session.topic_adapter(describe_chunk_size=describe_chunk_size).list(topic_filter)
+        # without live brokers (a snapshot) only offline_replicas tells a replica is down
+        live_brokers = None if session.snapshot else list_brokers(session.admin_client)
+        with profiler.span('plan'):
+            report = HealthReport(topics, live_brokers=live_brokers)
+        if min_isr is not None:
+            report.check_min_isr({}, default=min_isr)
+        elif not session.snapshot:
+            report.check_min_isr(topic_min_isr(session.admin_client, report.problem_topics(), config_chunk_size))
+        if by == 'summary':
+            return report, [report.counts()]
+        return report, getattr(report, f"{by}_rows")()
+
+    def echo_counts(counts):
+        problems = any(counts[kind] for kind in PROBLEM_KINDS)
+        click.secho(" ".join(f"{name}: {value}" for name, value in counts.items() if value != ''),
+                    fg='red' if problems else 'green', err=True)
+
+    if not watch:
+        report, rows = poll()
+        with profiler.span('render'), open_row_writer() as writer:
+            writer.writerows(rows)
+        if by != 'summary':
+            echo_counts(report.counts())
+        return
+
+    watcher = RowWatcher(HEALTH_KEYS[by])
+    last_counts = None
+    try:
+        while True:
+            try:
+                report, rows = poll()
+            except Exception as e:
+                # the watcher keeps the last rows, so the next good poll is
+                # diffed against them
+                click.secho(f"poll failed: {e}", fg='red', err=True)
+                time.sleep(interval)
+                continue
+            changes = watcher.poll(rows)
+            if changes:
+                polled_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+                with open_row_writer() as writer:
+                    writer.writerows(dict(polled_at=polled_at, **row) for row in changes)
+            counts = report.counts()
+            if by != 'summary' and counts != last_counts:
+                echo_counts(counts)
+            last_counts = counts
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+@cmd.command(name='plan')
+@click.option('-o', '--out', 'filename', required=True, type=click.Path(dir_okay=False, writable=True),
+              help='plan file to write, for "apply"')
+@click.option('--file', 'definitions_filename', default='definitions/sample.csv', help='definitions file')
+@click.pass_obj
+def plan_command(session, filename, definitions_filename):
+    # topics and ACLs in one plan; also works against --snapshot
+    with profiler.span('load'):
+        store = DefinitionStore()
+        store.load(definitions_filename)
+
+    cur_topics = session.topic_adapter().list()
+    cur_acls = session.acl_adapter().list()
+
+    with profiler.span('plan'):
+        plan = Plan.compute(store.topics, cur_topics, store.acls, cur_acls, definitions=definitions_filename)
+
+    with profiler.span('render'):
+        print_plan(plan)
+    plan.save(filename)
+    click.secho(f"Plan written to {filename}: {plan.counts()}", fg='green')
+
+@cmd.command(name='apply')
+@click.argument('filename', type=click.Path(exists=True, dir_okay=False))
+@click.option('--max-concurrency', default=4, help='max number of batches running at once')
+@click.option('--acl-batch-size', default=1000, help='ACLs per CreateAcls/DeleteAcls request')
+@click.option('--chunk-size', default=100, help='topics per CreateTopics/DeleteTopics request')
+@click.option('--max-in-flight', default=4, help='max number of concurrent requests to the controller')
+@click.option('--max-retries', default=3, help='retries for topics that failed with a retriable error')
+@click.pass_obj
+def apply_command(session, filename, max_concurrency, acl_batch_size, chunk_size, max_in_flight, max_retries):
+    # runs a file written by "plan" as is, without comparing with the cluster again
+    plan = Plan.load(filename)
+    # connect first, so --snapshot is refused before anything is printed
+    session.admin_client
+    click.secho(f"Applying {filename}: {plan.counts()}", fg='green')
+    if not plan:
+        click.secho('Finish', fg='green')
+        return
 
-        click.secho("Result of deletion", fg='green')
-        result = adapter.delete(acls_marked_del)
-        pp(result)
+    async_session = AsyncClusterSession(session, max_concurrency=max_concurrency)
+    executor = PlanExecutor(
+        async_session, acl_batch_size=acl_batch_size, echo=lambda message: click.secho(message, fg='green'),
+        chunk_size=chunk_size, max_in_flight=max_in_flight, max_retries=max_retries)
+    try:
+        with profiler.span('apply'):
+            result = asyncio.run(executor.run(plan))
+    finally:
+        async_session.close()
+
+    click.secho(f"succeeded: {len(result['succeeded'])}", fg='green')
+    if result['failed']:
+        click.secho("failed", fg='red')
+        pp(result['failed'])
+    if result['skipped']:
+        click.secho("skipped, a dependency failed", fg='yellow')
+        pp(result['skipped'])
+    click.secho('Finish', fg='green')
 
+@cmd.group()
+def snapshot():
+    pass
+
+@snapshot.command(name='export')
+@click.argument('filename', type=click.Path(dir_okay=False, writable=True))
+@click.pass_obj
+def export_command(session, filename):
+    # topics and ACLs as listed from the broker, for --snapshot
+    topics = session.topic_adapter().list()
+    acls = session.acl_adapter().list()
+    with profiler.span('render'):
+        write_snapshot(filename, topics, acls, bootstrap_servers=session.config.bootstrap_servers)
+    click.secho(f"Wrote {len(topics)} topics and {len(acls)} ACLs to {filename}", fg='green')
+
+@cmd.command()
+@click.option('--file', 'filename', default='definitions/sample.csv', help='definitions file')
+@click.option('--watch', is_flag=True, default=False, help='keep running and apply changes as they happen')
+@click.option('--interval', default=1.0, help='seconds between definitions file checks')
+@click.option('--drift-interval', default=60, help='seconds between cluster drift checks')
+@click.option('--check', is_flag=True, default=False, help='check mode')
+@click.pass_obj
+def reconcile(session, filename, watch, interval, drift_interval, check):
+    reconciler = Reconciler(
+        session, filename, interval=interval, drift_interval=drift_interval, check=check,
+        echo=lambda message: click.secho(message, fg='green'))
+    if watch:
+        try:
+            reconciler.run()
+        except KeyboardInterrupt:
+            pass
+    else:
+        reconciler.run_once()
     click.secho('Finish', fg='green')
 
 if __name__ == "__main__":
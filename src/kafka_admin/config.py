@@ -3,6 +3,7 @@ import yaml
 
 class Config():
     def __init__(self, filename):
+        self.profile_name = None
         self.profile = self.load(filename)
 
     def load(self, filename):
@@ -12,13 +13,13 @@ class Config():
         default_profile = data.get('default_profile', None)
         profiles = data.get('profiles', {})
         if default_profile in profiles:
-            result = profiles[default_profile]
+            self.profile_name = default_profile
         elif len(profiles.keys()) > 0:
-            result = profiles[profiles.keys()[0]]
+            self.profile_name = list(profiles.keys())[0]
         else:
             raise Exception("No profile")
         
-        return result
+        return profiles[self.profile_name]
 
     @property
     def bootstrap_servers(self):
@@ -1,21 +1,125 @@
 from __future__ import annotations
 import pdb
+import re
+import time
+from collections import defaultdict, deque
+from logging import getLogger
+from typing import Iterator
 from kafka.admin.acl_resource import ACL, ACLFilter, ACLOperation, ACLPermissionType, ResourcePattern, ResourceType, ACLResourcePatternType, ResourcePatternFilter
 from kafka.admin.client import KafkaAdminClient
 import kafka
 from kafka_admin.pyfixedwidths import FixedWidthFormatter
 from pprint import pprint as pp
 from kafka.admin import NewTopic
+from kafka.protocol.admin import DescribeGroupsRequest
+from kafka.structs import GroupInformation
+
+logger = getLogger(__name__)
+
+def send_pipelined(client, pending_by_node, send, max_in_flight) -> Iterator[tuple]:
+    # Sends send(node_id, item) -> Future for the items of pending_by_node
+    # ({node_id: deque of items}) to every node at once, at most
+    # max_in_flight in total, and yields (item, response) in completion
+    # order. ready() is False while the connection is still being set up or
+    # already has max_in_flight_requests_per_connection requests, so a busy
+    # node never blocks the others. The items of a node that fails to
+    # connect, or is not ready within request_timeout_ms, are skipped with a
+    # warning; the client times out the requests in flight itself.
+    network_client = client._client
+    timeout = client.config['request_timeout_ms'] / 1000
+    waiting_since = {}  # {node_id: monotonic time it was first not ready}
+    in_flight = {}
+    while pending_by_node or in_flight:
+        now = time.monotonic()
+        for node_id in list(pending_by_node.keys()):
+            pending = pending_by_node[node_id]
+            while pending and len(in_flight) < max_in_flight and network_client.ready(node_id):
+                item = pending.popleft()
+                in_flight[send(node_id, item)] = item
+                waiting_since.pop(node_id, None)
+            if pending and len(in_flight) < max_in_flight:
+                # stopped because the node is not ready
+                if network_client.is_disconnected(node_id) or now - waiting_since.setdefault(node_id, now) > timeout:
+                    logger.warning(f"node {node_id} is not reachable, skipping {len(pending)} requests")
+                    pending.clear()
+            if not pending:
+                del pending_by_node[node_id]
+
+        network_client.poll(timeout_ms=100)
+
+        for future in [future for future in in_flight if future.is_done]:
+            item = in_flight.pop(future)
+            if future.failed():
+                raise future.exception
+            yield item, future.value
+
+
+def list_consumer_groups(client, cache=None) -> list:
+    consumer_groups = cache.get('consumer_groups') if cache else None
+    if consumer_groups is None:
+        consumer_groups = client.list_consumer_groups()
+        if cache:
+            cache.put('consumer_groups', consumer_groups)
+    return consumer_groups
+    # [('console-consumer-11249', 'consumer')]
 
 class KafkaConsumerGroupStoreAdapter():
-    def __init__(self, client) -> None:
+    def __init__(self, client, cache=None, batch_size=100, max_in_flight=8) -> None:
         self.client = client
-    
-    def list(self) -> list:
-        consumer_groups = self.client.list_consumer_groups()
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+
+    def list(self, group_regex=None, states=None) -> Iterator[GroupInformation]:
+        consumer_groups = list_consumer_groups(self.client, self.cache)
         consumer_group_ids = list(map(lambda x: x[0], consumer_groups))
-        consumer_group_details = self.client.describe_consumer_groups(consumer_group_ids)
-        return consumer_group_details
+        # ListGroups (v0-v2) carries no state, so only the name filter can be
+        # applied before the describe step.
+        if group_regex is not None:
+            pattern = re.compile(group_regex)
+            consumer_group_ids = [group_id for group_id in consumer_group_ids if pattern.search(group_id)]
+        if states is not None:
+            states = {state.lower() for state in states}
+
+        for group_information in self._describe(consumer_group_ids):
+            if states is None or group_information.state.lower() in states:
+                yield group_information
+
+    def _describe(self, group_ids) -> Iterator[GroupInformation]:
+        # describe_consumer_groups() sends one DescribeGroups request per
+        # group. A request can carry many groups, so the groups are batched
+        # per coordinator and the batches are pipelined to every coordinator
+        # at once. Results are yielded in completion order.
+        batches_by_coordinator = defaultdict(deque)
+        group_ids_by_coordinator = defaultdict(list)
+        for group_id, coordinator_id in self.client._find_coordinator_ids(group_ids).items():
+            group_ids_by_coordinator[coordinator_id].append(group_id)
+        for coordinator_id, coordinator_group_ids in group_ids_by_coordinator.items():
+            for index in range(0, len(coordinator_group_ids), self.batch_size):
+                batches_by_coordinator[coordinator_id].append(coordinator_group_ids[index:index + self.batch_size])
+
+        # kafka-python 2.0.2 decodes the v3 response with the v2 schema
+        # (authorized_operations is misplaced), which breaks on more than
+        # one group per request
+        version = min(self.client._matching_api_version(DescribeGroupsRequest), 2)
+
+        def send(coordinator_id, batch):
+            return self.client._send_request_to_node(coordinator_id, DescribeGroupsRequest[version](groups=batch))
+
+        for _, response in send_pipelined(self.client, batches_by_coordinator, send, self.max_in_flight):
+            yield from self._process_response(response)
+
+    def _process_response(self, response) -> Iterator[GroupInformation]:
+        # kafka-python only parses single-group responses, so each group is
+        # handed to its parser as a response of its own.
+        fields = {name: getattr(response, name) for name in response.SCHEMA.names}
+        for group in response.groups:
+            error_type = kafka.errors.for_code(group[0])
+            if error_type is not kafka.errors.NoError:
+                logger.warning(f"DescribeGroups failed for {group[1]}: {error_type.__name__}")
+                continue
+            fields['groups'] = [group]
+            yield self.client._describe_consumer_groups_process_response(response.__class__(**fields))
 
         # [GroupInformation(
         #  error_code=0, group='console-consumer-11249', state='Stable', protocol_type='consumer', protocol='range',
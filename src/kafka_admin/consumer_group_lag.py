@@ -0,0 +1,58 @@
+from __future__ import annotations
+from collections import defaultdict
+
+
+class ConsumerGroupLag():
+    def __init__(self) -> None:
+        self.partitions = []
+        self.topics = []
+        self.groups = []
+
+    def load(self, consumer_groups_offsets, end_offsets, topics=None) -> ConsumerGroupLag:
+        # consumer_groups_offsets: as yielded by KafkaConsumerGroupOffsetsStoreAdapter.list
+        # end_offsets: {TopicPartition: log end offset}
+        # Partition, topic and group lag are accumulated in the same pass.
+        topic_lags = defaultdict(int)
+        group_lags = defaultdict(int)
+        for consumer_groups_offset_info in consumer_groups_offsets:
+            consumer_group_id = consumer_groups_offset_info['consumer_group']
+            for topic_partition, offset_and_metadata in consumer_groups_offset_info['consumer_group_offsets'].items():
+                if topics and topic_partition.topic not in topics:
+                    continue
+                end_offset = end_offsets.get(topic_partition)
+                committed = offset_and_metadata.offset
+                if end_offset is None or committed < 0:
+                    lag = None
+                else:
+                    lag = max(end_offset - committed, 0)
+                    topic_lags[(consumer_group_id, topic_partition.topic)] += lag
+                    group_lags[consumer_group_id] += lag
+                self.partitions.append(dict(
+                    consumer_group=consumer_group_id,
+                    topic=topic_partition.topic,
+                    partition=topic_partition.partition,
+                    offset=committed,
+                    end_offset=end_offset,
+                    lag=lag,
+                ))
+
+        self.partitions.sort(key=lambda x: -1 if x['lag'] is None else x['lag'], reverse=True)
+        self.topics = [
+            dict(consumer_group=consumer_group_id, topic=topic, lag=lag)
+            for (consumer_group_id, topic), lag in sorted(topic_lags.items(), key=lambda x: x[1], reverse=True)
+        ]
+        self.groups = [
+            dict(consumer_group=consumer_group_id, lag=lag)
+            for consumer_group_id, lag in sorted(group_lags.items(), key=lambda x: x[1], reverse=True)
+        ]
+        return self
+
+    @staticmethod
+    def partitions_of(consumer_groups_offsets, topics=None) -> set:
+        # every partition once, however many groups consume it
+        return {
+            topic_partition
+            for consumer_groups_offset_info in consumer_groups_offsets
+            for topic_partition in consumer_groups_offset_info['consumer_group_offsets']
+            if not topics or topic_partition.topic in topics
+        }
@@ -1,28 +1,42 @@
 from __future__ import annotations
 import pdb
+from collections import defaultdict, deque
+from typing import Iterator
 from kafka.admin.acl_resource import ACL, ACLFilter, ACLOperation, ACLPermissionType, ResourcePattern, ResourceType, ACLResourcePatternType, ResourcePatternFilter
 from kafka.admin.client import KafkaAdminClient
 import kafka
 from kafka_admin.pyfixedwidths import FixedWidthFormatter
+from kafka_admin.consumer_group import list_consumer_groups, send_pipelined
 from pprint import pprint as pp
 from kafka.admin import NewTopic
 
 class KafkaConsumerGroupOffsetsStoreAdapter():
-    def __init__(self, client) -> None:
+    def __init__(self, client, max_in_flight=32, cache=None) -> None:
         self.client = client
-    
-    def list(self) -> list:
-        consumer_groups = self.client.list_consumer_groups()
-        consumer_group_ids = list(map(lambda x: x[0], consumer_groups))
+        self.max_in_flight = max_in_flight
+        self.cache = cache
 
-        consumer_groups_offsets = []
-        for consumer_group_id in consumer_group_ids:
-            consumer_groups_offsets.append(dict(
-                consumer_group=consumer_group_id,
-                consumer_group_offsets=self.client.list_consumer_group_offsets(consumer_group_id),
-            ))
-        # {consumer_group="consumer-group-1", 
+    def list(self, group_ids=None) -> Iterator[dict]:
+        if group_ids is None:
+            consumer_groups = list_consumer_groups(self.client, self.cache)
+            group_ids = list(map(lambda x: x[0], consumer_groups))
+
+        # One FindCoordinator round for all groups, then OffsetFetch requests
+        # pipelined to every coordinator at once. Results are yielded in
+        # completion order, not in group_ids order.
+        groups_by_coordinator = defaultdict(deque)
+        for group_id, coordinator_id in self.client._find_coordinator_ids(group_ids).items():
+            groups_by_coordinator[coordinator_id].append(group_id)
+
+        def send(coordinator_id, group_id):
+            return self.client._list_consumer_group_offsets_send_request(group_id, coordinator_id)
+
+        responses = send_pipelined(self.client, groups_by_coordinator, send, self.max_in_flight)
+        for group_id, response in responses:
+            yield dict(
+                consumer_group=group_id,
+                consumer_group_offsets=self.client._list_consumer_group_offsets_process_response(response),
+            )
+        # {consumer_group="consumer-group-1",
         #  consumer_group_offsets={TopicPartition(topic='unko1', partition=0): OffsetAndMetadata(offset=5, metadata='')}
         # }
-
-        return consumer_groups_offsets
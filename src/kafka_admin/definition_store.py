@@ -1,7 +1,31 @@
 from .topic import *
+from .topic_offsets import *
 from .acl import *
 from .consumer_group import *
 from .consumer_group_offsets import *
+from .consumer_group_lag import *
+
+
+class NumberedLines():
+    # Iterator over lines that remembers the number of the last line read,
+    # so sections can be handed to the parsers without copying them.
+    def __init__(self, lines) -> None:
+        self._lines = iter(lines)
+        self.lineno = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        self.lineno += 1
+        return line
+
+    def section(self):
+        for line in self:
+            if line.startswith('---'):
+                return
+            yield line
 
 
 class DefinitionStore():
@@ -11,37 +35,31 @@ class DefinitionStore():
         self.acls = Acls()
 
     def load_v1(self, lines) -> None:
-        # cut out topics section
-        topic_lines = []
-        while len(lines) > 0:
-            line = lines.pop(0)
-            if line.startswith('---'):
-                break
-            else:
-                topic_lines.append(line)
+        if not isinstance(lines, NumberedLines):
+            lines = NumberedLines(lines)
 
-        self.topics.load_from_lines(topic_lines)
+        # topics section
+        self.topics.load_from_lines(lines.section(), start_lineno=lines.lineno + 1)
 
         # read acls
-        acl_lines = lines
-        self.acls.load_from_lines(acl_lines)
+        self.acls.load_from_lines(lines, start_lineno=lines.lineno + 1)
 
     def load(self, filename) -> None:
         with open(filename, 'r') as f:
-            lines = f.readlines()
+            lines = NumberedLines(f)
 
-        while len(lines) > 0:
-            line = lines.pop(0)
+            schema_version = None
+            for line in lines.section():
+                if line.startswith('schema_version:'):
+                    schema_version = int(line.split(':')[1].strip())
+                else:
+                    raise Exception(f"{filename}:{lines.lineno}: Unknown metadata: {line}")
 
-            if line.startswith('---'):
-                break
-            elif line.startswith('schema_version:'):
-                schema_version = int(line.split(':')[1].strip())
+            if schema_version == 1:
+                self.schema_version = schema_version
+                try:
+                    self.load_v1(lines)
+                except Exception as e:
+                    raise Exception(f"{filename}: {e}") from e
             else:
-                raise Exception(f"Unknown metadata: {line}")
-
-        if schema_version == 1:
-            self.schema_version = schema_version
-            self.load_v1(lines)
-        else:
-            raise Exception(f"Unsupported schema_version: {schema_version}")
+                raise Exception(f"Unsupported schema_version: {schema_version}")
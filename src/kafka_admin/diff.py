@@ -0,0 +1,150 @@
+from __future__ import annotations
+import click
+
+
+def identity(item):
+    return item
+
+
+class Diff():
+    def __init__(self) -> None:
+        self.added = []
+        self.deleted = []
+        self.modified = []  # [(cur_item, new_item), ...]
+        self.unchanged = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.deleted or self.modified)
+
+
+def diff(new_items, cur_items, key=identity) -> Diff:
+    # Items sharing a key but not equal are reported as modified, so the key
+    # decides what counts as "the same object" (e.g. a topic name).
+    result = Diff()
+    cur_index = {key(item): item for item in cur_items}
+
+    new_keys = set()
+    for new_item in new_items:
+        item_key = key(new_item)
+        new_keys.add(item_key)
+        cur_item = cur_index.get(item_key)
+        if cur_item is None:
+            result.added.append(new_item)
+        elif cur_item == new_item:
+            result.unchanged.append(new_item)
+        else:
+            result.modified.append((cur_item, new_item))
+
+    result.deleted.extend(item for item in cur_items if key(item) not in new_keys)
+    return result
+
+
+def reorder(new_items, cur_items, key=identity, sort_key=None) -> list:
+    # cur_items in the order of new_items, followed by the ones new_items
+    # does not know about. Keeps the rendered diff small.
+    cur_index = {key(item): item for item in cur_items}
+
+    result = []
+    matched = set()
+    for new_item in new_items:
+        item_key = key(new_item)
+        if item_key in cur_index and item_key not in matched:
+            matched.add(item_key)
+            result.append(cur_index[item_key])
+
+    rest = [item for item in cur_items if key(item) not in matched]
+    if sort_key:
+        rest.sort(key=sort_key)
+    result.extend(rest)
+    return result
+
+
+def _format_range(start, stop) -> str:
+    # same as `diff -u`: "start,length", 1-origin
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def _edit_script(a, b, ignore_all_space):
+    # Greedy two-pointer walk with hashed membership. Linear, and minimal
+    # whenever the common lines appear in the same order on both sides,
+    # which is what reorder() guarantees.
+    if ignore_all_space:
+        normalize = lambda line: ''.join(line.split())  # noqa: E731
+    else:
+        normalize = identity
+    a_norm = [normalize(line) for line in a]
+    b_norm = [normalize(line) for line in b]
+    a_set = set(a_norm)
+    b_set = set(b_norm)
+
+    ops = []  # (tag, a_index, b_index)
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a_norm[i] == b_norm[j]:
+            ops.append((' ', i, j))
+            i += 1
+            j += 1
+        elif a_norm[i] not in b_set:
+            ops.append(('-', i, j))
+            i += 1
+        elif b_norm[j] not in a_set:
+            ops.append(('+', i, j))
+            j += 1
+        else:
+            ops.append(('-', i, j))
+            i += 1
+    ops.extend(('-', i, len(b)) for i in range(i, len(a)))
+    ops.extend(('+', len(a), j) for j in range(j, len(b)))
+    return ops
+
+
+def unified_diff(a, b, fromfile='a', tofile='b', n=3, color=False, ignore_all_space=False) -> str:
+    ops = _edit_script(a, b, ignore_all_space)
+    changes = [idx for idx, op in enumerate(ops) if op[0] != ' ']
+    if not changes:
+        return ''
+
+    style = (lambda text, **kwargs: click.style(text, **kwargs)) if color else (lambda text, **kwargs: text)
+    lines = [
+        style(f"--- {fromfile}", bold=True),
+        style(f"+++ {tofile}", bold=True),
+    ]
+
+    # changes with at most 2*n unchanged lines between them share a hunk
+    groups = []
+    start = changes[0]
+    end = changes[0]
+    for idx in changes[1:]:
+        if idx - end - 1 > 2 * n:
+            groups.append((start, end))
+            start = idx
+        end = idx
+    groups.append((start, end))
+
+    for start, end in groups:
+        first = max(start - n, 0)
+        last = min(end + n + 1, len(ops))
+        hunk = ops[first:last]
+
+        a_start, b_start = hunk[0][1], hunk[0][2]
+        a_len = sum(1 for tag, _, _ in hunk if tag != '+')
+        b_len = sum(1 for tag, _, _ in hunk if tag != '-')
+        lines.append(style(
+            f"@@ -{_format_range(a_start, a_start + a_len)} +{_format_range(b_start, b_start + b_len)} @@",
+            fg='cyan'))
+
+        for tag, i, j in hunk:
+            if tag == ' ':
+                lines.append(f" {a[i]}")
+            elif tag == '-':
+                lines.append(style(f"-{a[i]}", fg='red'))
+            else:
+                lines.append(style(f"+{b[j]}", fg='green'))
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,171 @@
+from __future__ import annotations
+from collections import defaultdict
+from logging import getLogger
+import kafka
+from kafka.admin.config_resource import ConfigResource, ConfigResourceType
+
+logger = getLogger(__name__)
+
+UNDER_REPLICATED = 'under_replicated'
+UNDER_MIN_ISR = 'under_min_isr'
+LEADERLESS = 'leaderless'
+OFFLINE = 'offline'
+PROBLEM_KINDS = [UNDER_REPLICATED, UNDER_MIN_ISR, LEADERLESS, OFFLINE]
+
+
+class HealthReport():
+    # Partitions that need attention, found in one pass over the partitions
+    # of the describe_topics response:
+    #   under_replicated  fewer replicas in the ISR than assigned
+    #   under_min_isr     fewer replicas in the ISR than min.insync.replicas,
+    #                     so acks=all produce fails (see check_min_isr)
+    #   leaderless        no leader, nothing can be produced or consumed
+    #   offline           leaderless and every replica is down, so there is
+    #                     nothing to elect until a broker comes back
+    # A replica is down when the broker lists it in offline_replicas, or
+    # when live_brokers is given and its broker is not in it.
+    # Only the partitions with a problem are kept.
+    def __init__(self, topics, live_brokers=None) -> None:
+        self.live_brokers = set(live_brokers) if live_brokers is not None else None
+        self.num_partitions = 0
+        self.num_partitions_by_topic = {}
+        self.problems = []  # [[topic, partition dict, set of kinds]]
+        self.min_isr_checked = False
+
+        live_brokers = self.live_brokers
+        for topic in topics:
+            partitions = topic._raw['partitions']
+            self.num_partitions += len(partitions)
+            self.num_partitions_by_topic[topic.name] = len(partitions)
+            for partition in partitions:
+                replicas = partition['replicas']
+                isr = partition['isr']
+                leader = partition['leader']
+                if len(isr) >= len(replicas) and leader is not None and leader >= 0:
+                    continue
+                kinds = set()
+                if len(isr) < len(replicas):
+                    kinds.add(UNDER_REPLICATED)
+                if leader is None or leader < 0:
+                    kinds.add(LEADERLESS)
+                    offline_replicas = partition['offline_replicas']
+                    if all(broker in offline_replicas or (live_brokers is not None and broker not in live_brokers)
+                           for broker in replicas):
+                        kinds.add(OFFLINE)
+                self.problems.append([topic.name, partition, kinds])
+
+    def problem_topics(self) -> list:
+        return sorted({topic for topic, _, _ in self.problems})
+
+    def check_min_isr(self, min_isr, default=None) -> None:
+        # min_isr: {topic: min.insync.replicas}, default for the topics not
+        # in it; a topic with neither is not checked. A partition with its
+        # whole assignment in the ISR is assumed to be above
+        # min.insync.replicas, so only the partitions kept already need it.
+        for topic, partition, kinds in self.problems:
+            value = min_isr.get(topic, default)
+            if value is not None and len(partition['isr']) < value:
+                kinds.add(UNDER_MIN_ISR)
+        self.min_isr_checked = True
+
+    def counts(self) -> dict:
+        counts = dict(partitions=self.num_partitions)
+        for kind in PROBLEM_KINDS:
+            counts[kind] = sum(1 for _, _, kinds in self.problems if kind in kinds)
+        if not self.min_isr_checked:
+            counts[UNDER_MIN_ISR] = ''
+        return counts
+
+    def partition_rows(self) -> list:
+        return [dict(
+            topic=topic,
+            partition=partition['partition'],
+            leader=partition['leader'],
+            replicas=partition['replicas'],
+            isr=partition['isr'],
+            offline_replicas=partition['offline_replicas'],
+            problems=[kind for kind in PROBLEM_KINDS if kind in kinds],
+        ) for topic, partition, kinds in self.problems]
+
+    def broker_rows(self) -> list:
+        # out_of_sync: replicas on the broker that are not in their ISR; the
+        # problem columns count the partitions with a replica on the broker
+        counts = defaultdict(lambda: defaultdict(int))
+        for _, partition, kinds in self.problems:
+            isr = partition['isr']
+            for broker in partition['replicas']:
+                broker_counts = counts[broker]
+                if broker not in isr:
+                    broker_counts['out_of_sync'] += 1
+                for kind in kinds:
+                    broker_counts[kind] += 1
+        brokers = set(counts) | (self.live_brokers or set())
+        rows = []
+        for broker in sorted(brokers):
+            row = dict(broker=broker)
+            if self.live_brokers is not None:
+                row['live'] = broker in self.live_brokers
+            row['out_of_sync'] = counts[broker]['out_of_sync']
+            row.update(self._kind_counts(counts[broker]))
+            rows.append(row)
+        return rows
+
+    def topic_rows(self) -> list:
+        counts = defaultdict(lambda: defaultdict(int))
+        for topic, _, kinds in self.problems:
+            for kind in kinds:
+                counts[topic][kind] += 1
+        rows = []
+        for topic in sorted(counts):
+            row = dict(topic=topic, partitions=self.num_partitions_by_topic[topic])
+            row.update(self._kind_counts(counts[topic]))
+            rows.append(row)
+        return rows
+
+    def _kind_counts(self, counts) -> dict:
+        return {kind: counts.get(kind, 0) if kind != UNDER_MIN_ISR or self.min_isr_checked else ''
+                for kind in PROBLEM_KINDS}
+
+
+def topic_min_isr(client, topic_names, chunk_size=1000) -> dict:
+    # {topic: min.insync.replicas} from DescribeConfigs, chunk_size topics
+    # per request
+    topic_names = list(topic_names)
+    min_isr = {}
+    for index in range(0, len(topic_names), chunk_size):
+        resources = [ConfigResource(ConfigResourceType.TOPIC, name, configs={'min.insync.replicas': None})
+                     for name in topic_names[index:index + chunk_size]]
+        for response in client.describe_configs(resources):
+            for error_code, error_message, _, name, config_entries, *_ in response.resources:
+                error_type = kafka.errors.for_code(error_code)
+                if error_type is not kafka.errors.NoError:
+                    logger.warning(f"DescribeConfigs failed for {name}: {error_type.__name__} {error_message}")
+                    continue
+                for config_name, config_value, *_ in config_entries:
+                    if config_name == 'min.insync.replicas' and config_value is not None:
+                        min_isr[name] = int(config_value)
+    return min_isr
+
+
+class RowWatcher():
+    # Keeps the rows of the last poll by key and returns only what differs:
+    # new and changed rows as they are now, rows that are gone as they were,
+    # each with a change column.
+    def __init__(self, key_fields) -> None:
+        self.key_fields = key_fields
+        self._rows = {}
+
+    def poll(self, rows) -> list:
+        rows = {tuple(row[field] for field in self.key_fields): row for row in rows}
+        changes = []
+        for key, row in rows.items():
+            previous = self._rows.get(key)
+            if previous is None:
+                changes.append(dict(change='new', **row))
+            elif previous != row:
+                changes.append(dict(change='changed', **row))
+        for key, row in self._rows.items():
+            if key not in rows:
+                changes.append(dict(change='resolved', **row))
+        self._rows = rows
+        return changes
@@ -0,0 +1,61 @@
+from __future__ import annotations
+import json
+import os
+import tempfile
+import time
+import zlib
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'kafka-admin')
+
+
+class MetadataCache():
+    # Cluster metadata (describe_topics output, ACLs, consumer group ids)
+    # kept on disk per profile as zlib-compressed JSON, one file per kind.
+    def __init__(self, profile_name, ttl=300, refresh=False, cache_dir=None) -> None:
+        self.ttl = ttl
+        self.refresh = refresh
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), profile_name)
+
+    def _path(self, name) -> str:
+        return os.path.join(self.cache_dir, f"{name}.json.z")
+
+    def load(self, name):
+        # (data, saved_at) regardless of age, or (None, None)
+        try:
+            with open(self._path(name), 'rb') as f:
+                entry = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None, None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Ignoring broken metadata cache {self._path(name)}: {e}")
+            return None, None
+        return entry['data'], entry['saved_at']
+
+    def get(self, name):
+        if self.refresh:
+            return None
+        data, saved_at = self.load(name)
+        if data is None or time.time() - saved_at > self.ttl:
+            return None
+        logger.debug(f"Using cached {name} ({time.time() - saved_at:.0f}s old)")
+        return data
+
+    def put(self, name, data) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        payload = zlib.compress(json.dumps(dict(saved_at=time.time(), data=data), separators=(',', ':')).encode('utf-8'))
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(name))
+
+    def invalidate(self, name) -> None:
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
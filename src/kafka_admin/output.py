@@ -0,0 +1,96 @@
+from __future__ import annotations
+import csv
+import json
+import os
+import tempfile
+
+from kafka_admin.pyfixedwidths import FixedWidthWriter
+
+OUTPUT_FORMATS = ['table', 'csv', 'ndjson']
+
+
+class NdjsonWriter():
+    # One JSON object per line, written as soon as the row arrives.
+    def __init__(self, file) -> None:
+        self._file = file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def writerow(self, row):
+        self._file.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def close(self):
+        self._file.flush()
+
+
+class CsvWriter():
+    # Plain RFC 4180 CSV, written as soon as the row arrives. Without
+    # headers the columns are taken from the first row.
+    def __init__(self, file, headers=None) -> None:
+        self._file = file
+        self._writer = csv.writer(file)
+        self._headers = list(headers) if headers else None
+        self._header_written = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def writerow(self, row):
+        if self._headers is None:
+            self._headers = list(row)
+        if not self._header_written:
+            self._writer.writerow(self._headers)
+            self._header_written = True
+        self._writer.writerow([row.get(header, '') for header in self._headers])
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def close(self):
+        if self._headers and not self._header_written:
+            self._writer.writerow(self._headers)
+            self._header_written = True
+        self._file.flush()
+
+
+def row_writer(output, file, headers=None, widths=None):
+    # csv / ndjson stream with constant memory; table is FixedWidthWriter,
+    # which needs widths to stream and otherwise renders on close().
+    if output == 'ndjson':
+        return NdjsonWriter(file)
+    if output == 'csv':
+        return CsvWriter(file, headers=headers)
+    return FixedWidthWriter(file, headers=headers, widths=widths)
+
+
+def replace_file(filename, chunks) -> None:
+    # Writes chunks to a temporary file next to filename and renames it over
+    # filename, so a reader sees the old file or the whole new one. mkstemp
+    # creates the file 0600; it gets the mode open() would have given it.
+    umask = os.umask(0)
+    os.umask(umask)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import asyncio
+import json
+import time
+import zlib
+from collections import defaultdict
+import kafka
+from kafka.admin.acl_resource import ResourceType
+
+from kafka_admin.acl import Acls
+from kafka_admin.acl_query import AclIndex
+from kafka_admin.diff import diff
+from kafka_admin.output import replace_file
+from kafka_admin.topic import Topic, Topics, TopicsPlan
+
+PLAN_VERSION = 1
+
+ACL_DELETE = 'acl_delete'
+TOPIC_DELETE = 'topic_delete'
+TOPIC_ADD = 'topic_add'
+TOPIC_ADD_PARTITIONS = 'topic_add_partitions'
+ACL_ADD = 'acl_add'
+ACTION_KINDS = [ACL_DELETE, TOPIC_DELETE, TOPIC_ADD, TOPIC_ADD_PARTITIONS, ACL_ADD]
+
+_TOPIC = int(ResourceType.TOPIC)
+
+
+class Plan():
+    # What topic apply and acl apply would change, as one object that can be
+    # written to a file, reviewed, and applied later exactly as computed.
+    def __init__(self, topics_plan, acls_add=(), acls_delete=(), info=None, created_at=None) -> None:
+        self.topics = topics_plan
+        self.acls_add = Acls(*acls_add)
+        self.acls_delete = Acls(*acls_delete)
+        self.info = info or {}
+        self.created_at = created_at or time.time()
+
+    @classmethod
+    def compute(cls, new_topics, cur_topics, new_acls, cur_acls, **info) -> Plan:
+        changes = diff(new_acls, cur_acls)
+        return cls(TopicsPlan(new_topics, cur_topics), changes.added, changes.deleted, info=info)
+
+    def counts(self) -> dict:
+        return {
+            ACL_DELETE: len(self.acls_delete),
+            TOPIC_DELETE: len(self.topics.delete),
+            TOPIC_ADD: len(self.topics.add),
+            TOPIC_ADD_PARTITIONS: len(self.topics.add_partitions),
+            ACL_ADD: len(self.acls_add),
+        }
+
+    def __bool__(self) -> bool:
+        return any(self.counts().values())
+
+    def actions(self) -> dict:
+        # {(kind, key): [(kind, key) it has to wait for, ...]}, key being the
+        # topic name or the AclEntry.
+        #   ACL revokes go before the delete of every topic they apply to
+        #   (literal, prefixed or '*'), so nothing is left granted on a
+        #   topic that is about to go away.
+        #   A recreated topic (fewer partitions) is deleted before it is added.
+        #   ACL grants wait for the creates of the topics they apply to.
+        # Everything else has no dependency.
+        depends = {}
+        for entry in self.acls_delete:
+            depends[(ACL_DELETE, entry)] = []
+        revoked = AclIndex(self.acls_delete)
+        for topic in self.topics.delete:
+            depends[(TOPIC_DELETE, topic.name)] = [
+                (ACL_DELETE, entry) for entry in revoked.matching(_TOPIC, topic.name)]
+
+        deleted = {topic.name for topic in self.topics.delete}
+        for topic in self.topics.add:
+            depends[(TOPIC_ADD, topic.name)] = [(TOPIC_DELETE, topic.name)] if topic.name in deleted else []
+        for topic in self.topics.add_partitions:
+            depends[(TOPIC_ADD_PARTITIONS, topic.name)] = []
+
+        for entry in self.acls_add:
+            depends[(ACL_ADD, entry)] = []
+        granted = AclIndex(self.acls_add)
+        for topic in self.topics.add:
+            for entry in granted.matching(_TOPIC, topic.name):
+                depends[(ACL_ADD, entry)].append((TOPIC_ADD, topic.name))
+        return depends
+
+    def save(self, filename) -> None:
+        # zlib-compressed JSON, like the metadata cache
+        data = dict(
+            version=PLAN_VERSION,
+            created_at=self.created_at,
+            info=self.info,
+            topics=dict(
+                add=[_topic_to_list(topic) for topic in self.topics.add],
+                delete=[_topic_to_list(topic) for topic in self.topics.delete],
+                add_partitions=[_topic_to_list(topic) for topic in self.topics.add_partitions],
+                reassign=[[_topic_to_list(cur_topic), _topic_to_list(new_topic)]
+                          for cur_topic, new_topic in self.topics.reassign],
+            ),
+            acls=dict(add=self.acls_add.to_tuples(), delete=self.acls_delete.to_tuples()),
+        )
+        payload = zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        replace_file(filename, [payload])
+
+    @classmethod
+    def load(cls, filename) -> Plan:
+        try:
+            with open(filename, 'rb') as f:
+                data = json.loads(zlib.decompress(f.read()))
+        except (ValueError, zlib.error) as e:
+            raise Exception(f"{filename}: not a kafka-admin plan: {e}") from e
+        if data.get('version') != PLAN_VERSION:
+            raise Exception(f"{filename}: unsupported plan version {data.get('version')}")
+
+        topics_plan = TopicsPlan(Topics(), Topics())
+        topics_plan.add = Topics(*[Topic(*values) for values in data['topics']['add']])
+        topics_plan.delete = Topics(*[Topic(*values) for values in data['topics']['delete']])
+        topics_plan.add_partitions = Topics(*[Topic(*values) for values in data['topics']['add_partitions']])
+        topics_plan.reassign = [(Topic(*cur_values), Topic(*new_values))
+                                for cur_values, new_values in data['topics']['reassign']]
+        return cls(
+            topics_plan,
+            Acls().load_from_tuples(data['acls']['add']),
+            Acls().load_from_tuples(data['acls']['delete']),
+            info=data['info'],
+            created_at=data['created_at'],
+        )
+
+
+def _topic_to_list(topic) -> list:
+    return [topic.name, topic.num_partitions, topic.replication_factor]
+
+
+class PlanExecutor():
+    # Runs a Plan in waves. A wave is every action whose dependencies have
+    # all succeeded; its batches (one per kind, ACLs further split into
+    # acl_batch_size chunks) run concurrently on an AsyncClusterSession.
+    # An action whose dependency failed is skipped instead of attempted.
+    def __init__(self, async_session, acl_batch_size=1000, echo=None, **topic_adapter_kwargs) -> None:
+        self.async_session = async_session
+        self.acl_batch_size = acl_batch_size
+        self.echo = echo or (lambda message: None)
+        self.topic_adapter_kwargs = topic_adapter_kwargs
+
+    async def run(self, plan) -> dict:
+        # {'succeeded': [(kind, key)], 'failed': [(kind, key, error)], 'skipped': [(kind, key)]}
+        self._items = {
+            TOPIC_DELETE: {topic.name: topic for topic in plan.topics.delete},
+            TOPIC_ADD: {topic.name: topic for topic in plan.topics.add},
+            TOPIC_ADD_PARTITIONS: {topic.name: topic for topic in plan.topics.add_partitions},
+        }
+        pending = plan.actions()
+        done = set()
+        failed = set()
+        result = dict(succeeded=[], failed=[], skipped=[])
+        wave_number = 0
+        while pending:
+            wave = defaultdict(list)
+            skipped = False
+            for action, depends in list(pending.items()):
+                if any(dependency in failed for dependency in depends):
+                    del pending[action]
+                    failed.add(action)
+                    result['skipped'].append(action)
+                    skipped = True
+                elif all(dependency in done for dependency in depends):
+                    del pending[action]
+                    wave[action[0]].append(action[1])
+            if not wave:
+                if skipped:
+                    continue
+                raise Exception(f"Dependency cycle in plan: {list(pending)[:5]}")
+
+            wave_number += 1
+            self.echo(f"wave {wave_number}: " + ", ".join(
+                f"{kind} {len(wave[kind])}" for kind in ACTION_KINDS if kind in wave))
+            batches = []
+            for kind, keys in wave.items():
+                size = self.acl_batch_size if kind in (ACL_ADD, ACL_DELETE) else len(keys)
+                batches.extend((kind, keys[index:index + size]) for index in range(0, len(keys), size))
+            outcomes = await asyncio.gather(*[self._run_batch(kind, keys) for kind, keys in batches])
+            for (kind, keys), (succeeded, failures) in zip(batches, outcomes):
+                for key in succeeded:
+                    done.add((kind, key))
+                    result['succeeded'].append((kind, key))
+                for key, error in failures:
+                    failed.add((kind, key))
+                    result['failed'].append((kind, key, error))
+                # a key the broker did not answer for counts as failed
+                for key in set(keys) - set(succeeded) - {key for key, _ in failures}:
+                    failed.add((kind, key))
+                    result['failed'].append((kind, key, 'no result'))
+        return result
+
+    async def _run_batch(self, kind, keys) -> tuple:
+        # ([succeeded key, ...], [(failed key, error), ...])
+        if kind in (ACL_ADD, ACL_DELETE):
+            adapter = self.async_session.acl_adapter()
+            if kind == ACL_ADD:
+                result = await adapter.add(Acls(*keys))
+                return result['succeeded'], result['failed']
+            succeeded = []
+            failures = []
+            for entry, matching_acls, error in await adapter.delete(Acls(*keys)):
+                errors = [error] + [matching_error for _, matching_error in matching_acls]
+                error = next((error for error in errors if error is not kafka.errors.NoError), None)
+                if error is None:
+                    succeeded.append(entry)
+                else:
+                    failures.append((entry, error))
+            return succeeded, failures
+
+        adapter = self.async_session.topic_adapter(**self.topic_adapter_kwargs)
+        topics = Topics(*[self._items[kind][name] for name in keys])
+        if kind == TOPIC_ADD:
+            result = await adapter.add(topics)
+        elif kind == TOPIC_DELETE:
+            result = await adapter.delete(topics)
+        else:
+            result = await adapter.add_partitions(topics)
+        return result['succeeded'], result['failed']
@@ -0,0 +1,230 @@
+from __future__ import annotations
+import inspect
+import json
+import os
+import threading
+import time
+from typing import Iterator
+
+from kafka_admin.pyfixedwidths import FixedWidthFormatter
+
+
+class Span():
+    __slots__ = ('name', 'category', 'started', 'duration', 'requests', 'items', 'bytes', 'thread_id')
+
+    def __init__(self, name, category) -> None:
+        self.name = name
+        self.category = category
+        self.started = None
+        self.duration = 0.0
+        self.requests = 0
+        self.items = None
+        self.bytes = 0
+        self.thread_id = threading.get_ident()
+
+
+class _SpanContext():
+    __slots__ = ('profiler', 'span')
+
+    def __init__(self, profiler, span) -> None:
+        self.profiler = profiler
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.span.started = time.perf_counter()
+        self.profiler._push(self.span)
+        return self.span
+
+    def __exit__(self, *args):
+        self.span.duration = time.perf_counter() - self.span.started
+        self.profiler._pop()
+        self.profiler._record(self.span)
+
+
+class _NullSpanContext():
+    # what span() returns while profiling is off: no clock reads, no allocation
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_SPAN_CONTEXT = _NullSpanContext()
+
+
+class Profiler():
+    # Timers for phases (load, plan, render, apply) and adapter calls.
+    # Every Kafka request sent while a span is open is counted against the
+    # innermost one, with the encoded request and response sizes as an
+    # approximation of the bytes on the wire. Off by default; while off,
+    # span() is a shared no-op and adapters are not wrapped at all.
+    def __init__(self) -> None:
+        self.enabled = False
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self._origin = time.perf_counter()
+
+    def span(self, name, category='phase'):
+        if not self.enabled:
+            return _NULL_SPAN_CONTEXT
+        return _SpanContext(self, Span(name, category))
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, span) -> None:
+        self._stack().append(span)
+
+    def _pop(self) -> None:
+        self._stack().pop()
+
+    def _record(self, span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def instrument_client(self, admin_client) -> None:
+        if not self.enabled:
+            return
+        network_client = admin_client._client
+        send = network_client.send
+
+        def profiled_send(node_id, request, wakeup=True):
+            span = self.current()
+            future = send(node_id, request, wakeup=wakeup)
+            if span is not None:
+                span.requests += 1
+                span.bytes += _encoded_size(request)
+                future.add_callback(lambda response: setattr(span, 'bytes', span.bytes + _encoded_size(response)))
+            return future
+        network_client.send = profiled_send
+
+    def wrap(self, adapter):
+        return ProfiledAdapter(self, adapter) if self.enabled else adapter
+
+    def _profiled_iterator(self, name, iterator) -> Iterator:
+        # only the time spent inside next() counts, not the caller's work
+        # between items
+        span = Span(name, 'adapter')
+        span.items = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                if span.started is None:
+                    span.started = started
+                self._push(span)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._pop()
+                    span.duration += time.perf_counter() - started
+                span.items += 1
+                yield item
+        finally:
+            if span.started is not None:
+                self._record(span)
+
+    def summary_rows(self) -> list:
+        by_name = {}
+        for span in self.spans:
+            row = by_name.get(span.name)
+            if row is None:
+                row = by_name[span.name] = dict(
+                    name=span.name, category=span.category, calls=0, total_ms=0.0, max_ms=0.0,
+                    requests=0, items=0, bytes=0)
+            duration_ms = span.duration * 1000
+            row['calls'] += 1
+            row['total_ms'] += duration_ms
+            row['max_ms'] = max(row['max_ms'], duration_ms)
+            row['requests'] += span.requests
+            row['items'] += span.items or 0
+            row['bytes'] += span.bytes
+        rows = sorted(by_name.values(), key=lambda row: row['total_ms'], reverse=True)
+        for row in rows:
+            row['mean_ms'] = f"{row['total_ms'] / row['calls']:.1f}"
+            row['total_ms'] = f"{row['total_ms']:.1f}"
+            row['max_ms'] = f"{row['max_ms']:.1f}"
+        return rows
+
+    def summary(self) -> str:
+        headers = ['name', 'category', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'requests', 'items', 'bytes']
+        return FixedWidthFormatter().from_dict(self.summary_rows(), headers=headers).to_text()
+
+    def write_chrome_trace(self, filename) -> None:
+        # chrome://tracing / Perfetto "complete" events, times in microseconds
+        pid = os.getpid()
+        events = [dict(
+            name=span.name,
+            cat=span.category,
+            ph='X',
+            ts=round((span.started - self._origin) * 1e6),
+            dur=round(span.duration * 1e6),
+            pid=pid,
+            tid=span.thread_id,
+            args=dict(requests=span.requests, items=span.items, bytes=span.bytes),
+        ) for span in self.spans if span.started is not None]
+        with open(filename, 'w') as f:
+            json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f)
+
+
+class ProfiledAdapter():
+    # Wraps every method of a *StoreAdapter in a span named
+    # "<AdapterClass>.<method>"; items is the size of the result.
+    def __init__(self, profiler, adapter) -> None:
+        self._profiler = profiler
+        self._adapter = adapter
+
+    def __getattr__(self, name):
+        attr = getattr(self._adapter, name)
+        if not callable(attr):
+            return attr
+        span_name = f"{type(self._adapter).__name__}.{name}"
+        profiler = self._profiler
+
+        if inspect.isgeneratorfunction(attr):
+            # the work happens while the caller iterates
+            def profiled_generator(*args, **kwargs):
+                return profiler._profiled_iterator(span_name, attr(*args, **kwargs))
+            return profiled_generator
+
+        def profiled(*args, **kwargs):
+            with profiler.span(span_name, 'adapter') as span:
+                result = attr(*args, **kwargs)
+                span.items = _result_size(result)
+            return result
+        return profiled
+
+
+def _result_size(result):
+    if isinstance(result, dict) and 'succeeded' in result:
+        return len(result['succeeded']) + len(result.get('failed', ()))
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def _encoded_size(struct) -> int:
+    try:
+        return len(struct.encode())
+    except Exception:
+        return 0
+
+
+profiler = Profiler()
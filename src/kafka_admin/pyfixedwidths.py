@@ -1,3 +1,8 @@
+import csv
+import tempfile
+from operator import methodcaller
+
+
 class Schema():
     def __init__(self, schema=None, default={}):
         self._default_schema_item = dict(
@@ -39,29 +44,82 @@ class Schema():
     def get_schema(self, index_or_key):
         return self._schema.get(index_or_key, self._default_schema_item)
 
-    def format_column_value(self, index_or_key, val, default_width):
+    def column_spec(self, index_or_key, default_width):
+        # (format, justification, width) of one column, resolved once
         width = default_width
-        justification = 'ljust'
-        width_calc_func = lambda width: width  # noqa: E731
-        formatting = None
-        if self._schema:
-            min_width = self.get_schema(index_or_key).get('min_width', 0)
-            justification = self.get_schema(index_or_key).get(
-                'justification', justification)
-            width_calc_func = self.get_schema(index_or_key).get(
-                'width_calc_func', width_calc_func)
-            formatting = self.get_schema(
-                index_or_key).get('format', formatting)
-
-            width = max(int(width), int(min_width))
-            width = width_calc_func(width)
+        if not self._schema:
+            return None, 'ljust', width
+
+        schema_item = self.get_schema(index_or_key)
+        formatting = schema_item.get('format')
+        justification = schema_item.get('justification', 'ljust')
+        width_calc_func = schema_item.get('width_calc_func', lambda width: width)
+        width = max(int(width), int(schema_item.get('min_width', 0)))
+        width = width_calc_func(width)
+        return formatting, justification, width
 
+    def format_column_value(self, index_or_key, val, default_width):
+        formatting, justification, width = self.column_spec(index_or_key, default_width)
         if formatting:
-            val = ("{" + formatting + "}").format(val)
+            return ("{" + formatting + "}").format(val)
+        return getattr(val, justification)(width)
+
+
+class ColumnPlan():
+    # Per-column formatting resolved once for a given set of widths.
+    # format_row() renders a whole line with a single str.format call when
+    # every column is plain left/right justification.
+    _ALIGNMENTS = {'ljust': '<', 'rjust': '>'}
+
+    def __init__(self, schema, headers, widths, padding=1, sep=","):
+        self.headers = headers
+        self.sep = ' ' * padding + sep + ' ' * padding
+        specs = [schema.column_spec(header, widths.get(header, 0)) for header in headers]
+
+        self._cell_formatters = []
+        for formatting, justification, width in specs:
+            if formatting:
+                self._cell_formatters.append(("{" + formatting + "}").format)
+            else:
+                self._cell_formatters.append(methodcaller(justification, width))
+
+        if all(not formatting and justification in self._ALIGNMENTS for formatting, justification, _ in specs):
+            escaped_sep = self.sep.replace('{', '{{').replace('}', '}}')
+            template = escaped_sep.join(
+                "{:" + self._ALIGNMENTS[justification] + str(width) + "}"
+                for _, justification, width in specs)
+            self._template = template.format
         else:
-            justification_func = getattr(val, justification)
-            val = justification_func(width)
-        return val
+            self._template = None
+
+    def format_cells(self, values):
+        return [formatter(val) for formatter, val in zip(self._cell_formatters, values)]
+
+    def format_row(self, values):
+        if self._template:
+            return self._template(*values)
+        return self.sep.join(self.format_cells(values))
+
+
+def column_widths(str_rows, num_columns):
+    widths = [0] * num_columns
+    for index in range(num_columns):
+        widths[index] = max((len(row[index]) for row in str_rows), default=0)
+    return widths
+
+
+def iter_text_records(lines, sep=",", start_lineno=1):
+    # Parse "header, header, ...\nval, val, ...\n..." one line at a time.
+    # Yields (lineno, {header: stripped value}); blank lines are skipped.
+    headers = None
+    for lineno, line in enumerate(lines, start_lineno):
+        if not line.strip():
+            continue
+        vals = [val.strip() for val in line.split(sep)]
+        if headers is None:
+            headers = vals
+            continue
+        yield lineno, dict(zip(headers, vals))
 
 
 class FixedWidthFormatter():
@@ -72,9 +130,11 @@ class FixedWidthFormatter():
         self._rows = []
 
     def extract_headers(self, array_of_dict):
-        headers = [header for row in array_of_dict for header in row.keys()]
-        headers = list({value: "" for value in headers})
-        return headers
+        headers = {}
+        for row in array_of_dict:
+            for header in row:
+                headers[header] = ""
+        return list(headers)
 
     def from_dict(self, array_of_dict, headers=None, valid_headers=True):
         if valid_headers and headers:
@@ -93,28 +153,24 @@ class FixedWidthFormatter():
         return self
 
     def from_list(self, array_of_array, has_header=False, headers=None):
-        import copy
-        tmp = copy.deepcopy(array_of_array)
         _headers = None
         _valid_headers = False
+        rows = iter(array_of_array)
 
         if has_header:
-            _headers = [str(val).strip() for val in tmp.pop(0)]
+            _headers = [str(val).strip() for val in next(rows)]
             _valid_headers = True
 
         if headers:
             _headers = headers
             _valid_headers = True
 
+        data = [list(row) for row in rows]
         if not _headers:
-            _headers = list(range(len(tmp[0])))
+            _headers = list(range(len(data[0])))
             _valid_headers = False
 
-        data = []
-        for row in tmp:
-            data.append(dict(zip(_headers, row)))
-
-        self.from_dict(data, _headers, valid_headers=_valid_headers)
+        self.from_dict([dict(zip(_headers, row)) for row in data], _headers, valid_headers=_valid_headers)
         return self
 
     def from_text(self, text, sep=",", has_header=False):
@@ -126,46 +182,43 @@ class FixedWidthFormatter():
         return self.from_list(_rows, has_header)
 
     def _column_width(self, rows):
-        data_t = list(zip(*rows))
-        widths = list(map(lambda val: len(val), [max(row, key=len) for row in data_t]))
-        return widths
+        return column_widths(rows, len(rows[0]) if rows else 0)
 
     def _column_width_from_dict(self, rows):
         headers = self.extract_headers(rows)
-        data = []
-        for row in rows:
-            data.append(list(map(lambda header: str(row.get(header, '')), headers)))
-        widths = self._column_width(data)
+        widths = column_widths(self._str_rows(rows, headers), len(headers))
         return dict(zip(headers, widths))
 
-    def to_list_inner(self, rows_of_dict=None, default_widths=None):
-        new_rows = []
-        for row in rows_of_dict:
-            new_row = []
+    def _str_rows(self, rows_of_dict, headers=None):
+        headers = self._headers if headers is None else headers
+        return [[str(row.get(header, '')) for header in headers] for row in rows_of_dict]
 
-            for header in self._headers:
-                default_width = default_widths[header]
-                val = str(row.get(header, ''))
-                val = self._schema.format_column_value(
-                    header, val, default_width)
-                new_row.append(val)
+    def _header_row(self):
+        return [str(header) for header in self._headers]
 
-            new_rows.append(new_row)
-        return new_rows
+    def _plan(self, str_rows, padding=1, sep=","):
+        widths = dict(zip(self._headers, column_widths(str_rows, len(self._headers))))
+        return ColumnPlan(self._schema, self._headers, widths, padding=padding, sep=sep)
 
-    def to_list(self, rows_of_dict=None, write_headers=True):
+    def to_list_inner(self, rows_of_dict=None, default_widths=None):
+        plan = ColumnPlan(self._schema, self._headers, default_widths)
+        return [plan.format_cells(row) for row in self._str_rows(rows_of_dict)]
+
+    def _to_str_rows(self, rows_of_dict=None, write_headers=True):
         # criteriaの準備
-        data = []
         if not rows_of_dict:
             rows_of_dict = self._rows
 
+        str_rows = []
         if write_headers and self._valid_headers:
-            data.append(dict(zip(self._headers, self._headers)))
-        data.extend(rows_of_dict)
-        widths = self._column_width_from_dict(data)
+            str_rows.append(self._header_row())
+        str_rows.extend(self._str_rows(rows_of_dict))
+        return str_rows
 
-        # to_list_innerを使ってself._rowsをフォーマット
-        return self.to_list_inner(rows_of_dict=data, default_widths=widths)
+    def to_list(self, rows_of_dict=None, write_headers=True):
+        str_rows = self._to_str_rows(rows_of_dict, write_headers)
+        plan = self._plan(str_rows)
+        return [plan.format_cells(row) for row in str_rows]
 
     def to_dict(self, write_header=True):
         if not self._valid_headers:
@@ -181,11 +234,9 @@ class FixedWidthFormatter():
         return new_rows
 
     def to_text(self, padding=1, end="\n", sep=","):
-        new_rows = []
-        sep = ' ' * padding + sep + ' ' * padding
-        for row in self.to_list():
-            new_rows.append(sep.join(row))
-        return "\n".join(new_rows) + end
+        str_rows = self._to_str_rows()
+        plan = self._plan(str_rows, padding=padding, sep=sep)
+        return "\n".join(map(plan.format_row, str_rows)) + end
 
     def format_rows_to_dict(self, rows, write_headers=False, consider_headers=True):
         array = self.format_rows_to_list(rows, write_headers=write_headers, consider_headers=consider_headers)
@@ -195,19 +246,100 @@ class FixedWidthFormatter():
         return new_rows
 
     def format_rows_to_list(self, rows, write_headers=False, consider_headers=True):
-        import copy
-        tmp = copy.deepcopy(rows)
-
         # criteriaの準備
-        data = []
-        if consider_headers and self._valid_headers:
-            data.append(dict(zip(self._headers, self._headers)))
-        data.extend(self._rows)
-        widths = self._column_width_from_dict(data)
+        criteria = self._to_str_rows(write_headers=consider_headers)
+        plan = self._plan(criteria)
 
+        str_rows = []
         if write_headers and self._valid_headers:
-            tmp.insert(0, dict(zip(self._headers, self._headers)))
+            str_rows.append(self._header_row())
+        str_rows.extend(self._str_rows(rows))
+        return [plan.format_cells(row) for row in str_rows]
+
+
+class FixedWidthWriter():
+    # Streams rows (dicts) to a text file.
+    #
+    # With widths (fixed or estimated, keyed by header) each row is written
+    # as soon as it arrives; longer values simply overflow their column.
+    # Without widths rows are spooled to a compact CSV buffer (in memory up
+    # to spool_max_size, then on disk) while the widths are measured, and
+    # are rendered on close(). Either way only per-column state is kept.
+    def __init__(self, file, headers=None, widths=None, schema=None, write_headers=True,
+                 padding=1, sep=",", spool_max_size=1024 * 1024):
+        self._file = file
+        self._schema = schema if isinstance(schema, Schema) else Schema(schema)
+        self._headers = list(headers) if headers else []
+        self._header_index = {header: index for index, header in enumerate(self._headers)}
+        self._write_headers = write_headers
+        self._padding = padding
+        self._sep = sep
+        self._plan = None
+        self._spool = None
+
+        if widths is not None:
+            self._widths = dict(widths)
+        else:
+            self._widths = None
+            self._spool = tempfile.SpooledTemporaryFile(
+                max_size=spool_max_size, mode='w+', encoding='utf-8', newline='')
+            self._spool_writer = csv.writer(self._spool)
+            self._max_widths = [len(str(header)) if write_headers else 0 for header in self._headers]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _add_headers(self, row):
+        for header in row:
+            if header not in self._header_index:
+                self._header_index[header] = len(self._headers)
+                self._headers.append(header)
+                if self._widths is None:
+                    self._max_widths.append(len(str(header)) if self._write_headers else 0)
+
+    def _start(self):
+        widths = {header: self._widths.get(header, len(str(header))) for header in self._headers}
+        self._plan = ColumnPlan(self._schema, self._headers, widths, padding=self._padding, sep=self._sep)
+        if self._write_headers:
+            self._file.write(self._plan.format_row([str(header) for header in self._headers]) + "\n")
+
+    def writerow(self, row):
+        if self._widths is not None:
+            if self._plan is None:
+                self._add_headers(row)
+                self._start()
+            self._file.write(self._plan.format_row([str(row.get(header, '')) for header in self._headers]) + "\n")
+            return
+
+        self._add_headers(row)
+        values = [str(row.get(header, '')) for header in self._headers]
+        max_widths = self._max_widths
+        for index, val in enumerate(values):
+            if len(val) > max_widths[index]:
+                max_widths[index] = len(val)
+        self._spool_writer.writerow(values)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def close(self):
+        if self._spool is None:
+            if self._plan is None and self._headers:
+                self._start()
+            return
 
-        # to_list_innerを使ってself._rowsをフォーマット
-        array = self.to_list_inner(rows_of_dict=tmp, default_widths=widths)
-        return array
\ No newline at end of file
+        self._widths = dict(zip(self._headers, self._max_widths))
+        self._start()
+        num_columns = len(self._headers)
+        self._spool.seek(0)
+        for values in csv.reader(self._spool):
+            if len(values) < num_columns:
+                # written before a later row introduced more headers
+                values.extend([''] * (num_columns - len(values)))
+            self._file.write(self._plan.format_row(values) + "\n")
+        self._spool.close()
+        self._spool = None
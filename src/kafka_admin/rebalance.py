@@ -0,0 +1,234 @@
+from __future__ import annotations
+import heapq
+from collections import Counter
+
+
+def list_brokers(client) -> dict:
+    # {node_id: rack or None}. Metadata v1+ with an empty topic list returns
+    # the brokers only.
+    metadata = client._get_cluster_metadata(topics=[])
+    return {broker['node_id']: broker.get('rack') for broker in metadata.to_object()['brokers']}
+
+
+def parse_broker(spec) -> tuple:
+    # "ID" or "ID:RACK" -> (id, rack or None)
+    broker_id, _, rack = spec.partition(':')
+    return int(broker_id), rack or None
+
+
+class ReassignmentPlanner():
+    # Balances the number of replicas per broker while moving as few
+    # replicas as possible:
+    #   1. replicas on brokers that are not in `brokers` have to move, and
+    #      so do replicas over the rack limit of their partition
+    #      (ceil(replication factor / number of racks)) when racks are known;
+    #   2. every broker gets a target of total // brokers replicas, plus one
+    #      for the brokers that hold the most now, so no more replicas move
+    #      than the imbalance requires. With racks, the total and the
+    #      brokers are those of the broker's rack: the rack limit pins most
+    #      replicas to their rack, so a cluster-wide target is not
+    #      reachable when racks have different numbers of brokers;
+    #   3. brokers above their target give replicas, followers before
+    #      leaders, to the brokers below their target (in the same rack) in
+    #      turn, skipping a broker that is in the partition already or would
+    #      break the rack limit.
+    # A moved replica keeps its position, so the preferred leader of a
+    # partition only changes when the leader replica itself moves.
+    def __init__(self, topics, brokers=None) -> None:
+        self.partitions = []  # [(topic, partition)]
+        # the describe response's lists; a partition's list is copied the
+        # first time one of its replicas moves
+        self.replicas = []
+        for topic in topics:
+            for partition in topic._raw['partitions']:
+                self.partitions.append((topic.name, partition['partition']))
+                self.replicas.append(partition['replicas'])
+        self.original = {}  # {index: replicas before the first move}
+        self.counts_before = Counter(broker for replicas in self.replicas for broker in replicas)
+        self.leaders_before = Counter(replicas[0] for replicas in self.replicas if replicas)
+
+        # {broker_id: rack or None}; by default the brokers that hold replicas now
+        self.brokers = dict(brokers) if brokers else {broker: None for broker in self.counts_before}
+        if not self.brokers:
+            raise Exception("No brokers to assign replicas to")
+        racks = set(self.brokers.values())
+        self.rack_aware = None not in racks and len(racks) > 1
+        self.num_racks = len(racks)
+
+    def _rack_limit(self, replicas) -> int:
+        return -(-len(replicas) // self.num_racks)
+
+    def _fits_check(self, replicas, slot):
+        # broker -> can replicas[slot] move there
+        if not self.rack_aware:
+            return lambda broker: broker not in replicas
+        rack_of = self.brokers
+        other_racks = [rack_of.get(other) for other_slot, other in enumerate(replicas) if other_slot != slot]
+        limit = self._rack_limit(replicas)
+        return lambda broker: broker not in replicas and other_racks.count(rack_of[broker]) < limit
+
+    def _writable(self, index) -> list:
+        replicas = self.replicas[index]
+        if index not in self.original:
+            self.original[index] = replicas
+            replicas = self.replicas[index] = list(replicas)
+        return replicas
+
+    def plan(self) -> int:
+        # returns the number of replicas moved (see moved_replicas)
+        brokers = self.brokers
+        counts = self.counts = {broker: self.counts_before.get(broker, 0) for broker in brokers}
+        displaced = []  # [(index, slot)], the slot set to None until placed
+        if self.rack_aware or not set(self.counts_before) <= set(brokers):
+            for index, replicas in enumerate(self.replicas):
+                racks = [brokers.get(broker, False) for broker in replicas]
+                if False not in racks and (not self.rack_aware or len(set(racks)) == len(racks)):
+                    continue
+                self._displace(index, racks, displaced)
+
+        self.targets = self._targets(sum(counts.values()) + len(displaced), list(brokers))
+        self._place(displaced)
+        if self.rack_aware:
+            self.targets = {}
+            for members in self._brokers_by_rack().values():
+                self.targets.update(self._targets(sum(counts[broker] for broker in members), members))
+        targets = self.targets
+
+        # brokers below their target take the excess of the others in their
+        # group (rack, or the whole cluster without racks) in turn
+        self._receivers = {}  # {group: [broker, ...]}
+        for broker in sorted(brokers):
+            if counts[broker] < targets[broker]:
+                self._receivers.setdefault(self._group(broker), []).append(broker)
+        self._cursors = dict.fromkeys(self._receivers, 0)
+        # followers first, leaders only if that was not enough
+        for leaders in (False, True):
+            if not self._receivers:
+                break
+            for index, replicas in enumerate(self.replicas):
+                for slot in ((0,) if leaders else range(1, len(replicas))):
+                    broker = replicas[slot]
+                    if counts[broker] <= targets[broker]:
+                        continue
+                    destination = self._next_receiver(replicas, slot)
+                    if destination is None:
+                        continue
+                    replicas = self._writable(index)
+                    replicas[slot] = destination
+                    counts[broker] -= 1
+                    counts[destination] += 1
+                    if counts[destination] >= targets[destination]:
+                        group = self._group(destination)
+                        self._receivers[group].remove(destination)
+                        if not self._receivers[group]:
+                            del self._receivers[group]
+                if not self._receivers:
+                    break
+        return self.moved_replicas()
+
+    def _group(self, broker):
+        return self.brokers[broker] if self.rack_aware else None
+
+    def _brokers_by_rack(self) -> dict:
+        by_rack = {}
+        for broker, rack in self.brokers.items():
+            by_rack.setdefault(rack, []).append(broker)
+        return by_rack
+
+    def _targets(self, total, members) -> dict:
+        counts = self.counts
+        base, extra = divmod(total, len(members))
+        by_count = sorted(members, key=lambda broker: (-counts[broker], broker))
+        return {broker: base + (1 if rank < extra else 0) for rank, broker in enumerate(by_count)}
+
+    def _displace(self, index, racks, displaced) -> None:
+        # racks[slot] is False for a broker that is not in self.brokers
+        replicas = self.replicas[index]
+        limit = self._rack_limit(replicas)
+        # later slots first, so the leader stays where it is if it can
+        for slot in range(len(replicas) - 1, -1, -1):
+            rack = racks[slot]
+            if rack is not False and (not self.rack_aware or racks.count(rack) <= limit):
+                continue
+            replicas = self._writable(index)
+            if rack is not False:
+                self.counts[replicas[slot]] -= 1
+            racks[slot] = None if self.rack_aware else False
+            replicas[slot] = None
+            displaced.append((index, slot))
+
+    def _place(self, displaced) -> None:
+        # each on the broker furthest below its target that fits
+        counts = self.counts
+        targets = self.targets
+        heap = [(counts[broker] - targets[broker], broker) for broker in self.brokers]
+        heapq.heapify(heap)
+        for index, slot in displaced:
+            replicas = self.replicas[index]
+            fits = self._fits_check(replicas, slot)
+            skipped = []
+            while heap:
+                load, broker = heapq.heappop(heap)
+                if fits(broker):
+                    break
+                skipped.append((load, broker))
+            else:
+                raise Exception(f"No broker can take a replica of {self.partitions[index]}")
+            replicas[slot] = broker
+            counts[broker] += 1
+            heapq.heappush(heap, (load + 1, broker))
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+
+    def _next_receiver(self, replicas, slot) -> int:
+        group = self._group(replicas[slot])
+        receivers = self._receivers.get(group)
+        if not receivers:
+            return None
+        fits = self._fits_check(replicas, slot)
+        cursor = self._cursors[group]
+        for offset in range(len(receivers)):
+            position = (cursor + offset) % len(receivers)
+            broker = receivers[position]
+            if fits(broker):
+                self._cursors[group] = position + 1
+                return broker
+        return None
+
+    def moved_indexes(self) -> list:
+        # partitions whose replicas changed, in listing order
+        return [index for index in sorted(self.original) if list(self.original[index]) != self.replicas[index]]
+
+    def moved_replicas(self) -> int:
+        # slots whose broker changed; a displaced replica can be placed back
+        # on the broker it came from
+        replicas = self.replicas
+        return sum(before != after for index, original in self.original.items()
+                   for before, after in zip(original, replicas[index]))
+
+    def reassignment(self) -> dict:
+        # kafka-reassign-partitions.sh --reassignment-json-file format, moved
+        # partitions only
+        return dict(version=1, partitions=[
+            dict(topic=self.partitions[index][0], partition=self.partitions[index][1], replicas=self.replicas[index])
+            for index in self.moved_indexes()
+        ])
+
+    def rollback(self) -> dict:
+        # the same partitions with the replicas they have now
+        return dict(version=1, partitions=[
+            dict(topic=self.partitions[index][0], partition=self.partitions[index][1],
+                 replicas=list(self.original[index]))
+            for index in self.moved_indexes()
+        ])
+
+    def broker_rows(self) -> list:
+        leaders_after = Counter(replicas[0] for replicas in self.replicas if replicas)
+        return [dict(
+            broker=broker,
+            rack=self.brokers.get(broker) or '',
+            replicas_before=self.counts_before.get(broker, 0),
+            replicas_after=self.counts.get(broker, 0),
+            leaders_before=self.leaders_before.get(broker, 0),
+            leaders_after=leaders_after.get(broker, 0),
+        ) for broker in sorted(set(self.brokers) | set(self.counts_before))]
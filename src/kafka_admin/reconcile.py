@@ -0,0 +1,196 @@
+from __future__ import annotations
+import hashlib
+import os
+import time
+from logging import getLogger
+import kafka
+
+from kafka_admin.acl import Acls
+from kafka_admin.diff import diff
+from kafka_admin.topic import Topic, Topics, TopicsPlan
+
+logger = getLogger(__name__)
+
+
+def split_sections(lines) -> list:
+    # [(start_lineno, [line, ...]), ...] split at '---' lines
+    sections = [(1, [])]
+    for lineno, line in enumerate(lines, 1):
+        if line.startswith('---'):
+            sections.append((lineno + 1, []))
+        else:
+            sections[-1][1].append(line)
+    return sections
+
+
+class DefinitionWatcher():
+    # Re-reads the definitions file when its mtime changes, and re-parses
+    # only the sections whose text actually changed.
+    def __init__(self, filename) -> None:
+        self.filename = filename
+        self.topics = Topics()
+        self.acls = Acls()
+        self._mtime = None
+        self._digests = {}
+
+    def poll(self) -> set:
+        # nothing is kept until the whole file parses, so a broken file is
+        # read again on the next poll and the last good definitions stay
+        mtime = os.stat(self.filename).st_mtime_ns
+        if mtime == self._mtime:
+            return set()
+
+        with open(self.filename, 'r') as f:
+            sections = split_sections(f)
+        if len(sections) != 3:
+            raise Exception(f"{self.filename}: expected metadata, topics and acls sections, found {len(sections)}")
+
+        (_, metadata_lines), topic_section, acl_section = sections
+        for line in metadata_lines:
+            if line.startswith('schema_version:') and int(line.split(':')[1].strip()) != 1:
+                raise Exception(f"Unsupported schema_version: {line.split(':')[1].strip()}")
+
+        parsed = {}  # {name: (digest, definitions)}
+        for name, (start_lineno, lines) in (('topics', topic_section), ('acls', acl_section)):
+            digest = hashlib.sha1(''.join(lines).encode('utf-8')).digest()
+            if self._digests.get(name) == digest:
+                continue
+            try:
+                if name == 'topics':
+                    parsed[name] = digest, Topics().load_from_lines(lines, start_lineno=start_lineno)
+                else:
+                    parsed[name] = digest, Acls().load_from_lines(lines, start_lineno=start_lineno)
+            except Exception as e:
+                raise Exception(f"{self.filename}: {e}") from e
+
+        for name, (digest, definitions) in parsed.items():
+            setattr(self, name, definitions)
+            self._digests[name] = digest
+        self._mtime = mtime
+        return set(parsed)
+
+
+class Reconciler():
+    # Keeps the cluster state in memory, applies only the delta against the
+    # definitions and updates the in-memory state from the results, so a
+    # file change costs no cluster listing. The cluster is re-listed every
+    # drift_interval seconds to pick up changes made by others.
+    def __init__(self, session, filename, interval=1.0, drift_interval=60, check=False, echo=print) -> None:
+        self.session = session
+        self.watcher = DefinitionWatcher(filename)
+        self.interval = interval
+        self.drift_interval = drift_interval
+        self.check = check
+        self.echo = echo
+        self.cur_topics = {}
+        self.cur_acls = set()
+        self._last_refresh = None
+
+    def refresh_cluster(self) -> None:
+        cache = self.session.metadata_cache
+        if cache:
+            # a drift check has to see the broker, not the cache
+            cache.invalidate('topics')
+            cache.invalidate('acls')
+        self.cur_topics = {topic.name: topic for topic in self.session.topic_adapter().list()}
+        self.cur_acls = set(self.session.acl_adapter().list())
+        self._last_refresh = time.monotonic()
+
+    def reconcile_topics(self) -> None:
+        plan = TopicsPlan(self.watcher.topics, Topics(*self.cur_topics.values()))
+        if not (plan.add or plan.delete or plan.add_partitions or plan.reassign):
+            return
+        self.echo(f"topics: +{len(plan.add)} -{len(plan.delete)} partitions:{len(plan.add_partitions)}"
+                  f" reassign(not applied):{len(plan.reassign)}")
+        if self.check:
+            return
+
+        adapter = self.session.topic_adapter()
+        # delete first so that recreated topics can be added again
+        result = adapter.delete(plan.delete)
+        for name in result['succeeded']:
+            self.cur_topics.pop(name, None)
+        if result['failed']:
+            self.echo(f"topics delete failed: {result['failed']}")
+
+        result = adapter.add(plan.add)
+        added = {topic.name: topic for topic in plan.add}
+        for name in result['succeeded']:
+            self.cur_topics[name] = added[name]
+        if result['failed']:
+            self.echo(f"topics add failed: {result['failed']}")
+
+        result = adapter.add_partitions(plan.add_partitions)
+        grown = {topic.name: topic for topic in plan.add_partitions}
+        for name in result['succeeded']:
+            cur_topic = self.cur_topics[name]
+            self.cur_topics[name] = Topic(name, grown[name].num_partitions, cur_topic.replication_factor)
+        if result['failed']:
+            self.echo(f"partitions add failed: {result['failed']}")
+
+    def reconcile_acls(self) -> None:
+        changes = diff(self.watcher.acls, Acls(*self.cur_acls))
+        if not changes:
+            return
+        self.echo(f"acls: +{len(changes.added)} -{len(changes.deleted)}")
+        if self.check:
+            return
+
+        adapter = self.session.acl_adapter()
+        if changes.added:
+            result = adapter.add(changes.added)
+            self.cur_acls.update(result['succeeded'])
+            if result['failed']:
+                self.echo(f"acls add failed: {result['failed']}")
+        if changes.deleted:
+            for acl_filter, matching_acls, error in adapter.delete(changes.deleted):
+                if error is not kafka.errors.NoError:
+                    self.echo(f"acls delete failed: {acl_filter} {error}")
+                for matching_acl, matching_error in matching_acls:
+                    if matching_error is kafka.errors.NoError:
+                        self.cur_acls.discard(matching_acl)
+
+    def run_once(self) -> None:
+        self.watcher.poll()
+        self.refresh_cluster()
+        self.reconcile_topics()
+        self.reconcile_acls()
+
+    def run(self) -> None:
+        # --watch: an error is logged and retried on the next interval, it
+        # does not end the loop
+        while True:
+            try:
+                self.run_once()
+                break
+            except Exception as e:
+                logger.error(e)
+            time.sleep(self.interval)
+
+        while True:
+            time.sleep(self.interval)
+            try:
+                changed = self.watcher.poll()
+            except Exception as e:
+                # keep the last good definitions until the file is fixed
+                logger.error(e)
+                changed = set()
+
+            if time.monotonic() - self._last_refresh >= self.drift_interval:
+                try:
+                    self.refresh_cluster()
+                    changed = {'topics', 'acls'}
+                except Exception as e:
+                    logger.error(f"cluster refresh failed: {e}")
+            if 'topics' in changed:
+                self._reconcile(self.reconcile_topics)
+            if 'acls' in changed:
+                self._reconcile(self.reconcile_acls)
+
+    def _reconcile(self, reconcile) -> None:
+        try:
+            reconcile()
+        except Exception as e:
+            logger.error(e)
+            # part of it may have been applied: re-list on the next interval
+            self._last_refresh = float('-inf')
@@ -0,0 +1,97 @@
+from __future__ import annotations
+import click
+from kafka.admin.client import KafkaAdminClient
+
+from kafka_admin.config import Config
+from kafka_admin.metadata_cache import MetadataCache
+from kafka_admin.profiling import profiler
+from kafka_admin.snapshot import ClusterSnapshot, SnapshotAclStoreAdapter, SnapshotTopicStoreAdapter
+from kafka_admin.topic import KafkaTopicStoreAdapter
+from kafka_admin.topic_offsets import KafkaTopicOffsetsStoreAdapter
+from kafka_admin.acl import KafkaAclStoreAdapter
+from kafka_admin.consumer_group import KafkaConsumerGroupStoreAdapter
+from kafka_admin.consumer_group_offsets import KafkaConsumerGroupOffsetsStoreAdapter
+
+
+class ClusterSession():
+    # One per process: the profile is read once and a single admin client
+    # (one bootstrap, one set of broker connections and metadata) is created
+    # on first use and shared by every *StoreAdapter.
+    # With snapshot_filename, topics and ACLs are read from that file
+    # (see snapshot.write_snapshot) and nothing connects to a broker.
+    def __init__(self, config_filename='config.yaml', cache=False, cache_ttl=300, refresh=False,
+                 snapshot_filename=None) -> None:
+        self.config_filename = config_filename
+        self.use_cache = cache
+        self.cache_ttl = cache_ttl
+        self.refresh = refresh
+        self.snapshot_filename = snapshot_filename
+        self._config = None
+        self._admin_client = None
+        self._metadata_cache = None
+        self._snapshot = None
+
+    @property
+    def config(self) -> Config:
+        if self._config is None:
+            self._config = Config(self.config_filename)
+        return self._config
+
+    def create_admin_client(self) -> KafkaAdminClient:
+        if self.snapshot_filename:
+            raise click.UsageError(f"This command needs a broker; it can not run against --snapshot {self.snapshot_filename}")
+        with profiler.span('bootstrap'):
+            admin_client = KafkaAdminClient(
+                bootstrap_servers=self.config.bootstrap_servers,
+                security_protocol=self.config.security_protocol,
+                # sasl_mechanism=self.config.sasl_mechanism,
+                # sasl_plain_username=self.config.sasl_plain_username,
+                # sasl_plain_password=self.config.sasl_plain_password,
+            )
+        profiler.instrument_client(admin_client)
+        return admin_client
+
+    @property
+    def admin_client(self) -> KafkaAdminClient:
+        if self._admin_client is None:
+            self._admin_client = self.create_admin_client()
+        return self._admin_client
+
+    @property
+    def snapshot(self) -> ClusterSnapshot:
+        if self.snapshot_filename and self._snapshot is None:
+            self._snapshot = ClusterSnapshot(self.snapshot_filename)
+        return self._snapshot
+
+    @property
+    def metadata_cache(self) -> MetadataCache:
+        if self.use_cache and not self.snapshot_filename and self._metadata_cache is None:
+            self._metadata_cache = MetadataCache(self.config.profile_name, ttl=self.cache_ttl, refresh=self.refresh)
+        return self._metadata_cache
+
+    def topic_adapter(self, **kwargs) -> KafkaTopicStoreAdapter:
+        if self.snapshot:
+            return profiler.wrap(SnapshotTopicStoreAdapter(self.snapshot))
+        return profiler.wrap(KafkaTopicStoreAdapter(client=self.admin_client, cache=self.metadata_cache, **kwargs))
+
+    def topic_offsets_adapter(self) -> KafkaTopicOffsetsStoreAdapter:
+        return profiler.wrap(KafkaTopicOffsetsStoreAdapter(client=self.admin_client))
+
+    def acl_adapter(self) -> KafkaAclStoreAdapter:
+        if self.snapshot:
+            return profiler.wrap(SnapshotAclStoreAdapter(self.snapshot))
+        return profiler.wrap(KafkaAclStoreAdapter(client=self.admin_client, cache=self.metadata_cache))
+
+    def consumer_group_adapter(self, **kwargs) -> KafkaConsumerGroupStoreAdapter:
+        return profiler.wrap(KafkaConsumerGroupStoreAdapter(client=self.admin_client, cache=self.metadata_cache, **kwargs))
+
+    def consumer_group_offsets_adapter(self, **kwargs) -> KafkaConsumerGroupOffsetsStoreAdapter:
+        return profiler.wrap(KafkaConsumerGroupOffsetsStoreAdapter(client=self.admin_client, cache=self.metadata_cache, **kwargs))
+
+    def close(self) -> None:
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+        if self._admin_client is not None:
+            self._admin_client.close()
+            self._admin_client = None
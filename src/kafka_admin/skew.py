@@ -0,0 +1,120 @@
+from __future__ import annotations
+import heapq
+import time
+from collections import defaultdict
+from kafka.structs import TopicPartition
+
+
+class SkewReport():
+    # Leaders, replicas and preferred-leader mismatches per broker, counted
+    # in one pass over the partitions of the describe_topics response.
+    # weights ({(topic, partition): weight}, e.g. messages or messages/s)
+    # turn the leader and replica counts into loads; without them every
+    # partition weighs 1.
+    def __init__(self, topics, brokers=None, weights=None) -> None:
+        self.brokers = dict(brokers) if brokers else {}  # {broker_id: rack or None}
+        self.weighted = bool(weights)
+        self.leaders = defaultdict(int)
+        self.replicas = defaultdict(int)
+        self.leader_load = defaultdict(float)
+        self.replica_load = defaultdict(float)
+        # partitions this broker is the preferred (first) replica of but
+        # does not lead; a preferred leader election moves them back
+        self.preferred_mismatches = defaultdict(int)
+        self.offline_partitions = 0
+        self.num_partitions = 0
+        self._topic_leader_loads = []  # [(topic, {broker: load})]
+
+        for topic in topics:
+            topic_leader_load = defaultdict(float)
+            for partition in topic._raw['partitions']:
+                weight = weights.get((topic.name, partition['partition']), 0) if weights else 1
+                leader = partition['leader']
+                replicas = partition['replicas']
+                self.num_partitions += 1
+                if leader is None or leader < 0:
+                    self.offline_partitions += 1
+                else:
+                    self.leaders[leader] += 1
+                    self.leader_load[leader] += weight
+                    topic_leader_load[leader] += weight
+                if replicas and replicas[0] != leader:
+                    self.preferred_mismatches[replicas[0]] += 1
+                for broker in replicas:
+                    self.replicas[broker] += 1
+                    self.replica_load[broker] += weight
+            self._topic_leader_loads.append((topic.name, topic_leader_load))
+
+        for broker in self.replicas:
+            self.brokers.setdefault(broker, None)
+
+    def broker_rows(self) -> list:
+        num_brokers = len(self.brokers) or 1
+        mean_leader_load = sum(self.leader_load.values()) / num_brokers
+        mean_replica_load = sum(self.replica_load.values()) / num_brokers
+        rows = []
+        for broker in sorted(self.brokers):
+            row = dict(
+                broker=broker,
+                rack=self.brokers[broker] or '',
+                leaders=self.leaders.get(broker, 0),
+                replicas=self.replicas.get(broker, 0),
+                preferred_mismatches=self.preferred_mismatches.get(broker, 0),
+            )
+            if self.weighted:
+                row['leader_load'] = round(self.leader_load.get(broker, 0), 2)
+                row['replica_load'] = round(self.replica_load.get(broker, 0), 2)
+            # load / mean load, 1.00 is even
+            row['leader_skew'] = _ratio(self.leader_load.get(broker, 0), mean_leader_load)
+            row['replica_skew'] = _ratio(self.replica_load.get(broker, 0), mean_replica_load)
+            rows.append(row)
+        return rows
+
+    def topic_rows(self, top=10) -> list:
+        # The topics whose leaders are furthest from an even spread: excess
+        # is the leader load above the topic's fair share (its total load /
+        # brokers), summed over the brokers, i.e. what would have to move.
+        num_brokers = len(self.brokers) or 1
+
+        def excess(item):
+            _, leader_load = item
+            fair_share = sum(leader_load.values()) / num_brokers
+            return sum(load - fair_share for load in leader_load.values() if load > fair_share)
+
+        rows = []
+        for item in heapq.nlargest(top, self._topic_leader_loads, key=excess):
+            topic, leader_load = item
+            if not leader_load:
+                continue
+            hottest = max(leader_load, key=leader_load.get)
+            rows.append(dict(
+                topic=topic,
+                leader_load=round(sum(leader_load.values()), 2),
+                excess=round(excess(item), 2),
+                hottest_broker=hottest,
+                hottest_broker_load=round(leader_load[hottest], 2),
+                brokers_with_leaders=len(leader_load),
+            ))
+        return rows
+
+
+def _ratio(value, mean) -> str:
+    return f"{value / mean:.2f}" if mean else ''
+
+
+def message_weights(offsets_adapter, topics) -> dict:
+    # messages currently in each partition (end - start offset)
+    return {(row['topic'], row['partition']): row['messages'] or 0 for row in offsets_adapter.list(topics)}
+
+
+def rate_weights(offsets_adapter, topics, interval) -> dict:
+    # messages/s produced to each partition, from two end offset samples
+    partition_leaders = {TopicPartition(topic.name, partition['partition']): partition['leader']
+                         for topic in topics for partition in topic._raw['partitions']}
+    first = offsets_adapter.end_offsets(partition_leaders, partition_leaders)
+    first_at = time.monotonic()
+    time.sleep(interval)
+    second = offsets_adapter.end_offsets(partition_leaders, partition_leaders)
+    elapsed = time.monotonic() - first_at
+    return {(topic_partition.topic, topic_partition.partition): (offset - first[topic_partition]) / elapsed
+            for topic_partition, offset in second.items() if topic_partition in first}
@@ -0,0 +1,232 @@
+from __future__ import annotations
+import json
+import mmap
+import struct
+import sys
+import time
+import zlib
+import click
+from kafka.admin.acl_resource import ACLOperation, ACLPermissionType, ResourceType, ACLResourcePatternType
+
+from kafka_admin.topic import Topic, Topics, TopicFilter
+from kafka_admin.acl import AclEntry, Acls
+from kafka_admin.acl_query import AclIndex
+from kafka_admin.output import replace_file
+
+SNAPSHOT_MAGIC = b'KAFKA-ADMIN-SNAPSHOT\n'
+SNAPSHOT_VERSION = 1
+# topics per partitions section, so a filtered listing only decodes the
+# sections its topics are in
+PARTITION_SECTION_SIZE = 1000
+
+_HEADER_LENGTH = struct.Struct('>I')
+
+
+def write_snapshot(filename, topics, acls, **info) -> None:
+    # Layout: magic, header length, JSON header, then the sections, each
+    # zlib-compressed JSON. The header has the (offset, length) of every
+    # section, so a reader maps the file and decodes only what it uses.
+    #   topics        {names, num_partitions, replication_factor} as columns
+    #   partitions.N  [[partition, leader, replicas, isr, offline_replicas, error_code], ...]
+    #                 per topic, for topics N * PARTITION_SECTION_SIZE onwards
+    #   acls          {strings, principal, host, resource_name (indexes into
+    #                 strings), operation, permission_type, resource_type,
+    #                 pattern_type} as columns
+    topics = list(topics)
+    sections = {}
+    sections['topics'] = dict(
+        names=[topic.name for topic in topics],
+        num_partitions=[topic.num_partitions for topic in topics],
+        replication_factor=[topic.replication_factor for topic in topics],
+        is_internal=[index for index, topic in enumerate(topics) if topic._raw and topic._raw.get('is_internal')],
+    )
+    for start in range(0, len(topics), PARTITION_SECTION_SIZE):
+        sections[f"partitions.{start // PARTITION_SECTION_SIZE}"] = [
+            [[partition['partition'], partition['leader'], partition['replicas'], partition['isr'],
+              partition['offline_replicas'], partition['error_code']]
+             for partition in (topic._raw['partitions'] if topic._raw else ())]
+            for topic in topics[start:start + PARTITION_SECTION_SIZE]
+        ]
+
+    string_ids = {}
+    columns = dict(principal=[], host=[], operation=[], permission_type=[],
+                   resource_type=[], resource_name=[], pattern_type=[])
+    for entry in acls:
+        for field, value in zip(AclEntry._fields, entry):
+            if field in ('principal', 'host', 'resource_name'):
+                value = string_ids.setdefault(value, len(string_ids))
+            columns[field].append(value)
+    sections['acls'] = dict(strings=list(string_ids), **columns)
+
+    payloads = []
+    index = {}
+    offset = 0
+    for name, data in sections.items():
+        payload = zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        index[name] = [offset, len(payload)]
+        payloads.append(payload)
+        offset += len(payload)
+    header = json.dumps(dict(
+        version=SNAPSHOT_VERSION, created_at=time.time(), info=info,
+        num_topics=len(topics), num_acls=len(columns['principal']), sections=index,
+    ), separators=(',', ':')).encode('utf-8')
+
+    replace_file(filename, [SNAPSHOT_MAGIC, _HEADER_LENGTH.pack(len(header)), header, *payloads])
+
+
+class ClusterSnapshot():
+    # Read side of write_snapshot(). Sections are decoded on first use and
+    # kept; the file itself stays mapped until close().
+    def __init__(self, filename) -> None:
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header = self._read_header()
+        except (OSError, ValueError) as e:
+            self._file.close()
+            raise click.ClickException(f"{filename}: not a kafka-admin snapshot: {e}") from e
+        self._sections = {}
+        self._topics = None
+        self._acls = None
+
+    def _read_header(self) -> dict:
+        if self._map[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError('bad magic')
+        start = len(SNAPSHOT_MAGIC)
+        length, = _HEADER_LENGTH.unpack(self._map[start:start + _HEADER_LENGTH.size])
+        start += _HEADER_LENGTH.size
+        header = json.loads(self._map[start:start + length])
+        if header.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported version {header.get('version')}")
+        self._data_start = start + length
+        return header
+
+    def section(self, name):
+        if name not in self._sections:
+            offset, length = self.header['sections'][name]
+            start = self._data_start + offset
+            self._sections[name] = json.loads(zlib.decompress(self._map[start:start + length]))
+        return self._sections[name]
+
+    @property
+    def created_at(self) -> float:
+        return self.header['created_at']
+
+    def topics(self) -> Topics:
+        if self._topics is None:
+            columns = self.section('topics')
+            self._topics = Topics(*[
+                SnapshotTopic(self, index, name, num_partitions, replication_factor)
+                for index, (name, num_partitions, replication_factor) in enumerate(zip(
+                    columns['names'], columns['num_partitions'], columns['replication_factor']))
+            ])
+        return self._topics
+
+    def topic_raw(self, index, name) -> dict:
+        # the describe_topics() dict of one topic, rebuilt from its section
+        partitions = self.section(f"partitions.{index // PARTITION_SECTION_SIZE}")[index % PARTITION_SECTION_SIZE]
+        return dict(
+            error_code=0,
+            topic=name,
+            is_internal=index in self._internal_indexes(),
+            partitions=[dict(partition=partition, leader=leader, replicas=replicas, isr=isr,
+                             offline_replicas=offline_replicas, error_code=error_code)
+                        for partition, leader, replicas, isr, offline_replicas, error_code in partitions],
+        )
+
+    def _internal_indexes(self) -> set:
+        if 'is_internal' not in self._sections:
+            self._sections['is_internal'] = set(self.section('topics')['is_internal'])
+        return self._sections['is_internal']
+
+    def acls(self) -> Acls:
+        if self._acls is None:
+            columns = self.section('acls')
+            strings = [sys.intern(string) for string in columns['strings']]
+            self._acls = Acls(*map(AclEntry._make, zip(
+                map(strings.__getitem__, columns['principal']),
+                map(strings.__getitem__, columns['host']),
+                columns['operation'],
+                columns['permission_type'],
+                columns['resource_type'],
+                map(strings.__getitem__, columns['resource_name']),
+                columns['pattern_type'],
+            )))
+        return self._acls
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class SnapshotTopic(Topic):
+    # A Topic whose partition details (_raw) are decoded from the snapshot
+    # only when something reads them, e.g. a verbose listing.
+    def __init__(self, snapshot, index, name, num_partitions, replication_factor) -> None:
+        self.name = name
+        self.num_partitions = num_partitions
+        self.replication_factor = replication_factor
+        self._snapshot = snapshot
+        self._index = index
+
+    @property
+    def _raw(self) -> dict:
+        return self._snapshot.topic_raw(self._index, self.name)
+
+
+def _read_only(*args, **kwargs):
+    raise click.UsageError("--snapshot is read-only; run without it to change the cluster")
+
+
+class SnapshotTopicStoreAdapter():
+    # KafkaTopicStoreAdapter.list / list_names answered from a snapshot.
+    def __init__(self, snapshot) -> None:
+        self.snapshot = snapshot
+
+    def list(self, topic_filter=None) -> Topics:
+        topics = self.snapshot.topics()
+        if topic_filter:
+            return topic_filter.select(topics)
+        return Topics(*topics)
+
+    def list_names(self, topic_filter=None) -> list:
+        topic_filter = topic_filter or TopicFilter()
+        return [topic.name for topic in self.snapshot.topics() if topic_filter.match(topic.name)]
+
+    add = delete = add_partitions = staticmethod(_read_only)
+
+
+class SnapshotAclStoreAdapter():
+    # KafkaAclStoreAdapter.list answered from a snapshot, with the same
+    # filter semantics as the broker.
+    def __init__(self, snapshot) -> None:
+        self.snapshot = snapshot
+
+    def list(self, principal=None, host=None, operation=ACLOperation.ANY, permission_type=ACLPermissionType.ANY,
+             resource_type=ResourceType.ANY, resource_name=None, pattern_type=ACLResourcePatternType.ANY) -> Acls:
+        acls = self.snapshot.acls()
+        if (principal is None and host is None and resource_name is None
+                and operation == ACLOperation.ANY and permission_type == ACLPermissionType.ANY
+                and resource_type == ResourceType.ANY and pattern_type == ACLResourcePatternType.ANY):
+            return Acls(*acls)
+        if pattern_type == ACLResourcePatternType.MATCH:
+            if resource_type == ResourceType.ANY or resource_name is None:
+                raise Exception("pattern type MATCH needs a resource type and name")
+            candidates = AclIndex(acls).matching(resource_type, resource_name)
+            pattern_type = ACLResourcePatternType.ANY
+            resource_name = None
+        else:
+            candidates = acls
+
+        def matches(entry) -> bool:
+            return ((principal is None or entry.principal == principal)
+                    and (host is None or entry.host == host)
+                    and (operation == ACLOperation.ANY or entry.operation == int(operation))
+                    and (permission_type == ACLPermissionType.ANY or entry.permission_type == int(permission_type))
+                    and (resource_type == ResourceType.ANY or entry.resource_type == int(resource_type))
+                    and (resource_name is None or entry.resource_name == resource_name)
+                    and (pattern_type == ACLResourcePatternType.ANY or entry.pattern_type == int(pattern_type)))
+        return Acls(*[entry for entry in candidates if matches(entry)])
+
+    add = delete = staticmethod(_read_only)
@@ -1,11 +1,19 @@
 from __future__ import annotations
 import pdb
+import re
+from logging import getLogger
 from kafka.admin.acl_resource import ACL, ACLFilter, ACLOperation, ACLPermissionType, ResourcePattern, ResourceType, ACLResourcePatternType, ResourcePatternFilter
 from kafka.admin.client import KafkaAdminClient
 import kafka
-from kafka_admin.pyfixedwidths import FixedWidthFormatter
+from kafka_admin.pyfixedwidths import FixedWidthFormatter, iter_text_records
 from pprint import pprint as pp
 from kafka.admin import NewTopic
+from kafka.protocol.admin import CreatePartitionsRequest, CreateTopicsRequest, DeleteTopicsRequest
+from kafka.protocol.metadata import MetadataRequest
+from kafka_admin.batch import ControllerBatchRunner
+from kafka_admin.diff import diff
+
+logger = getLogger(__name__)
 
 class Topic():
     def __init__(self, name=None, num_partitions=None, replication_factor=None, raw=None):
@@ -33,7 +41,8 @@ class Topics(list):
         super().__init__(args)
 
     def __sub__(self, other) -> Topics:
-        return self.__class__(*[item for item in self if item not in other])
+        other_set = set(other)
+        return self.__class__(*[item for item in self if item not in other_set])
 
     def _dict_to_Topic(self, topic_dict) -> Topic:
         topic = Topic(
@@ -43,14 +52,15 @@ class Topics(list):
         )
         return topic
 
-    def load_from_lines(self, lines) -> Topics:
-        fwf = FixedWidthFormatter()
-        text = ''.join(lines)
-        topic_dicts = fwf.from_text(text, has_header=True).to_dict(write_header=False)
-        for topic_dict in topic_dicts:
-            topic = self._dict_to_Topic(topic_dict)
-            self.append(topic)
+    def iter_from_lines(self, lines, start_lineno=1):
+        for lineno, topic_dict in iter_text_records(lines, start_lineno=start_lineno):
+            try:
+                yield self._dict_to_Topic(topic_dict)
+            except (KeyError, ValueError) as e:
+                raise Exception(f"line {lineno}: Invalid topic definition: {e!r}") from e
 
+    def load_from_lines(self, lines, start_lineno=1) -> Topics:
+        self.extend(self.iter_from_lines(lines, start_lineno))
         return self
 
     def load_from_topic_objects(self, topic_objects) -> Topics:
@@ -73,41 +83,116 @@ class Topics(list):
             self.append(topic)
         return self
 
-    def to_csv(self, verbose=True) -> str:
-        fwf = FixedWidthFormatter()
-        topic_dicts = []
+    def iter_dicts(self, verbose=True, blank_repeated=True):
         for topic in self:
             if verbose:
                 for idx, partition in enumerate(sorted(topic._raw['partitions'], key=lambda x: x['partition'])):
-                    topic_dicts.append(dict(
-                        name=topic.name if idx == 0 else "",
-                        num_partitions=topic.num_partitions if idx == 0 else "",
-                        replication_factor=topic.replication_factor if idx == 0 else "",
+                    repeated = blank_repeated and idx > 0
+                    yield dict(
+                        name="" if repeated else topic.name,
+                        num_partitions="" if repeated else topic.num_partitions,
+                        replication_factor="" if repeated else topic.replication_factor,
                         partition_id=partition['partition'],
                         leader=partition['leader'],
                         # replicas=f"[{ ','.join(list(map(str, partition['replicas']))) }]",
                         # isr=f"[{ ','.join(list(map(str, partition['isr']))) }]",
                         # offline_replicas=f"[{ ','.join(list(map(str, partition['offline_replicas']))) }]",
-                        replicas=str(partition['replicas']),
-                        isr=str(partition['isr']),
-                        offline_replicas=str(partition['offline_replicas']),
+                        replicas=partition['replicas'],
+                        isr=partition['isr'],
+                        offline_replicas=partition['offline_replicas'],
                         error_code=partition['error_code'],
-                    ))
+                    )
             else:
-                topic_dicts.append(dict(
+                yield dict(
                     name=topic.name,
                     num_partitions=topic.num_partitions,
                     replication_factor=topic.replication_factor,
-                ))
+                )
+
+    def to_csv(self, verbose=True) -> str:
+        fwf = FixedWidthFormatter()
+        return fwf.from_dict(list(self.iter_dicts(verbose=verbose))).to_text()
+
+class TopicsPlan():
+    def __init__(self, new_topics, cur_topics) -> None:
+        changes = diff(new_topics, cur_topics, key=lambda x: x.name)
+        self.add = Topics(*changes.added)
+        self.delete = Topics(*changes.deleted)
+        self.add_partitions = Topics()
+        self.reassign = []  # [(cur_topic, new_topic), ...]
+
+        for cur_topic, new_topic in changes.modified:
+            if new_topic.num_partitions < cur_topic.num_partitions:
+                # Kafka can not remove partitions, the topic has to be recreated
+                self.add.append(new_topic)
+                self.delete.append(cur_topic)
+                continue
+            if new_topic.num_partitions > cur_topic.num_partitions:
+                self.add_partitions.append(new_topic)
+            if new_topic.replication_factor != cur_topic.replication_factor:
+                self.reassign.append((cur_topic, new_topic))
+
+    def reassign_to_csv(self) -> str:
+        fwf = FixedWidthFormatter()
+        return fwf.from_dict([dict(
+            name=new_topic.name,
+            cur_replication_factor=cur_topic.replication_factor,
+            new_replication_factor=new_topic.replication_factor,
+        ) for cur_topic, new_topic in self.reassign]).to_text()
+
+
+class TopicFilter():
+    # Selects topics by exact name, name prefix or regex. A topic is
+    # selected when it matches any of them; an empty filter selects all.
+    def __init__(self, names=None, prefixes=None, regex=None) -> None:
+        self.names = set(names or ())
+        self.prefixes = tuple(prefixes or ())
+        self.regex = re.compile(regex) if regex else None
+
+    def __bool__(self) -> bool:
+        return bool(self.names or self.prefixes or self.regex)
+
+    def match(self, name) -> bool:
+        if not self:
+            return True
+        return (name in self.names
+                or name.startswith(self.prefixes)
+                or (self.regex is not None and self.regex.search(name) is not None))
+
+    def needs_listing(self) -> bool:
+        # exact names alone can be described without listing the cluster
+        return bool(self.prefixes or self.regex)
+
+    def select(self, topics) -> Topics:
+        return Topics(*[topic for topic in topics if self.match(topic.name)])
 
-        return fwf.from_dict(topic_dicts).to_text()
 
 class KafkaTopicStoreAdapter():
-    def __init__(self, client) -> None:
+    def __init__(self, client, chunk_size=100, max_in_flight=4, max_retries=3, cache=None,
+                 describe_chunk_size=1000) -> None:
         self.client = client
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.describe_chunk_size = describe_chunk_size
+        self.batch_runner = ControllerBatchRunner(
+            client, chunk_size=chunk_size, max_in_flight=max_in_flight, max_retries=max_retries)
+
+    def _run(self, names, build_request, done_error=None) -> dict:
+        result = self.batch_runner.run(names, build_request, done_error=done_error)
+        if self.cache and result['succeeded']:
+            self.cache.invalidate('topics')
+            self.cache.invalidate('topic_names')
+        return result
 
-    def list(self) -> Topics:
-        topics = self.client.describe_topics(topics=None)
+    def list(self, topic_filter=None) -> Topics:
+        if topic_filter:
+            return Topics().load_from_topic_objects(self._describe(self.list_names(topic_filter)))
+
+        topics = self.cache.get('topics') if self.cache else None
+        if topics is None:
+            topics = self.client.describe_topics(topics=None)
+            if self.cache:
+                self.cache.put('topics', topics)
         return Topics().load_from_topic_objects(topics)
         # [{'error_code': 0,
         #  'is_internal': False,
@@ -118,22 +203,119 @@ class KafkaTopicStoreAdapter():
         #                  'partition': 0,
         #                  'replicas': [1]}],
         #  'topic': 'example_topic1'}]
-        
-    def add(self, topics):
-        new_topics = []
+
+    def list_names(self, topic_filter=None) -> list:
+        topic_filter = topic_filter or TopicFilter()
+        # Metadata v0-v3 create unknown topics when the broker has
+        # auto.create.topics.enable, so exact names are only described
+        # without listing when the request can turn that off.
+        version = self.client._matching_api_version(MetadataRequest)
+        if not topic_filter.needs_listing() and topic_filter and version >= 4:
+            return sorted(topic_filter.names)
+        return [name for name in self._all_names() if topic_filter.match(name)]
+
+    def _all_names(self) -> list:
+        # The Metadata API has no names-only mode: the all-topics response is
+        # decoded, only the names are kept and cached, and the rest dropped.
+        if self.cache:
+            topics = self.cache.get('topics')
+            if topics is not None:
+                return [topic['topic'] for topic in topics]
+            names = self.cache.get('topic_names')
+            if names is not None:
+                return names
+        names = sorted(topic[1] for topic in self.client._get_cluster_metadata(topics=None).topics)
+        if self.cache:
+            self.cache.put('topic_names', names)
+        return names
+
+    def _describe(self, names) -> list:
+        # describe_topics() for the given names only, in chunks of
+        # describe_chunk_size, with up to max_in_flight chunks in flight to
+        # the least loaded brokers.
+        version = min(self.client._matching_api_version(MetadataRequest), 5)
+        pending = [names[index:index + self.describe_chunk_size]
+                   for index in range(0, len(names), self.describe_chunk_size)]
+        pending.reverse()
+        network_client = self.client._client
+        in_flight = []
+        topics = []
+        while pending or in_flight:
+            while pending and len(in_flight) < self.max_in_flight:
+                chunk = pending.pop()
+                if version <= 3:
+                    request = MetadataRequest[version](topics=chunk)
+                else:
+                    request = MetadataRequest[version](topics=chunk, allow_auto_topic_creation=False)
+                in_flight.append(self.client._send_request_to_node(network_client.least_loaded_node(), request))
+
+            network_client.poll(timeout_ms=100)
+
+            for future in [future for future in in_flight if future.is_done]:
+                in_flight.remove(future)
+                if future.failed():
+                    raise future.exception
+                for topic in future.value.to_object()['topics']:
+                    error_type = kafka.errors.for_code(topic['error_code'])
+                    if error_type is kafka.errors.UnknownTopicOrPartitionError:
+                        continue
+                    if error_type is not kafka.errors.NoError:
+                        logger.warning(f"Metadata failed for {topic['topic']}: {error_type.__name__}")
+                        continue
+                    topics.append(topic)
+        topics.sort(key=lambda topic: topic['topic'])
+        return topics
+
+    def add(self, topics, timeout_ms=None) -> dict:
+        new_topics = {}
         for topic in topics:
-            new_topics.append(NewTopic(
+            new_topics[topic.name] = NewTopic(
                 name=topic.name,
                 num_partitions=topic.num_partitions,
                 replication_factor=topic.replication_factor
-            ))
-        return self.client.create_topics(new_topics=new_topics, validate_only=False)
+            )
+
+        version = self.client._matching_api_version(CreateTopicsRequest)
+        timeout_ms = self.client._validate_timeout(timeout_ms)
+
+        def build_request(names):
+            create_topic_requests = [KafkaAdminClient._convert_new_topic_request(new_topics[name]) for name in names]
+            if version == 0:
+                return CreateTopicsRequest[version](create_topic_requests=create_topic_requests, timeout=timeout_ms)
+            return CreateTopicsRequest[version](
+                create_topic_requests=create_topic_requests, timeout=timeout_ms, validate_only=False)
+
+        return self._run(list(new_topics), build_request, done_error=kafka.errors.TopicAlreadyExistsError)
         # CreateTopicsResponse_v3(throttle_time_ms=0, topic_errors=[(topic='example_topic1', error_code=0, error_message=None)])
 
-    def delete(self, topics):
+    def add_partitions(self, topics, timeout_ms=None) -> dict:
+        # topics carry the new total num_partitions
+        total_counts = {topic.name: topic.num_partitions for topic in topics}
+
+        version = self.client._matching_api_version(CreatePartitionsRequest)
+        timeout_ms = self.client._validate_timeout(timeout_ms)
+
+        def build_request(names):
+            return CreatePartitionsRequest[version](
+                topic_partitions=[(name, (total_counts[name], None)) for name in names],
+                timeout=timeout_ms,
+                validate_only=False,
+            )
+
+        return self._run(list(total_counts), build_request)
+        # CreatePartitionsResponse_v1(throttle_time_ms=0, topic_errors=[(topic='example_topic1', error_code=0, error_message=None)])
+
+    def delete(self, topics, timeout_ms=None) -> dict:
         delete_topic_names = []
         for topic in topics:
             delete_topic_names.append(topic.name)
-        return self.client.delete_topics(delete_topic_names)
+
+        version = self.client._matching_api_version(DeleteTopicsRequest)
+        timeout_ms = self.client._validate_timeout(timeout_ms)
+
+        def build_request(names):
+            return DeleteTopicsRequest[version](topics=names, timeout=timeout_ms)
+
+        return self._run(delete_topic_names, build_request, done_error=kafka.errors.UnknownTopicOrPartitionError)
         # DeleteTopicsResponse_v3(throttle_time_ms=0, topic_error_codes=[(topic='example_topic1', error_code=0)])
-        # delete.topic.enable=true
\ No newline at end of file
+        # delete.topic.enable=true
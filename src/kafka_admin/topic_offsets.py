@@ -0,0 +1,102 @@
+from __future__ import annotations
+from collections import defaultdict
+from logging import getLogger
+import kafka
+from kafka.protocol.offset import OffsetRequest, OffsetResetStrategy, UNKNOWN_OFFSET
+from kafka.structs import TopicPartition
+
+logger = getLogger(__name__)
+
+
+class KafkaTopicOffsetsStoreAdapter():
+    def __init__(self, client) -> None:
+        self.client = client
+
+    def list(self, topics) -> list:
+        # Leaders come from the describe_topics response already held in
+        # Topic._raw, so no extra metadata round trip is needed.
+        partition_leaders = {}
+        for topic in topics:
+            for partition in sorted(topic._raw['partitions'], key=lambda x: x['partition']):
+                partition_leaders[TopicPartition(topic.name, partition['partition'])] = partition['leader']
+
+        beginning_offsets, end_offsets = self._list_offsets(
+            partition_leaders, (OffsetResetStrategy.EARLIEST, OffsetResetStrategy.LATEST))
+
+        topic_offset_dicts = []
+        for topic_partition in partition_leaders:
+            start_offset = beginning_offsets.get(topic_partition)
+            end_offset = end_offsets.get(topic_partition)
+            topic_offset_dicts.append(dict(
+                topic=topic_partition.topic,
+                partition=topic_partition.partition,
+                start_offset=start_offset,
+                end_offset=end_offset,
+                messages=end_offset - start_offset if start_offset is not None and end_offset is not None else None,
+            ))
+        return topic_offset_dicts
+
+    def partition_leaders(self, topic_names) -> dict:
+        partition_leaders = {}
+        for topic_object in self.client.describe_topics(topics=sorted(topic_names)):
+            for partition in topic_object['partitions']:
+                partition_leaders[TopicPartition(topic_object['topic'], partition['partition'])] = partition['leader']
+        return partition_leaders
+
+    def beginning_offsets(self, partitions, partition_leaders=None) -> dict:
+        return self._offsets_for(partitions, partition_leaders, OffsetResetStrategy.EARLIEST)
+
+    def end_offsets(self, partitions, partition_leaders=None) -> dict:
+        return self._offsets_for(partitions, partition_leaders, OffsetResetStrategy.LATEST)
+
+    def _offsets_for(self, partitions, partition_leaders, timestamp) -> dict:
+        partitions = set(partitions)
+        if not partitions:
+            return {}
+        if partition_leaders is None:
+            partition_leaders = self.partition_leaders({tp.topic for tp in partitions})
+        partition_leaders = {tp: partition_leaders.get(tp, -1) for tp in partitions}
+        return self._list_offsets(partition_leaders, (timestamp,))[0]
+
+    def _list_offsets(self, partition_leaders, timestamps) -> list:
+        # One ListOffsets request per (leader, timestamp). A request may not
+        # carry the same partition twice, so earliest and latest are separate
+        # requests, but all of them are in flight together.
+        partitions_by_leader = defaultdict(lambda: defaultdict(list))
+        for topic_partition, leader in partition_leaders.items():
+            if leader is None or leader < 0:
+                logger.warning(f"No leader for {topic_partition}, skipping offsets")
+                continue
+            partitions_by_leader[leader][topic_partition.topic].append(topic_partition.partition)
+
+        version = min(self.client._matching_api_version(OffsetRequest), 1)
+        futures = []
+        for timestamp in timestamps:
+            for leader, partitions_by_topic in partitions_by_leader.items():
+                if version == 0:
+                    topics = [(topic, [(partition, timestamp, 1) for partition in partitions])
+                              for topic, partitions in partitions_by_topic.items()]
+                else:
+                    topics = [(topic, [(partition, timestamp) for partition in partitions])
+                              for topic, partitions in partitions_by_topic.items()]
+                futures.append((timestamp, self.client._send_request_to_node(leader, OffsetRequest[version](-1, topics))))
+        self.client._wait_for_futures([future for _, future in futures])
+
+        offsets = {timestamp: {} for timestamp in timestamps}
+        for timestamp, future in futures:
+            for topic, partitions in future.value.topics:
+                for partition_info in partitions:
+                    partition, error_code = partition_info[:2]
+                    topic_partition = TopicPartition(topic, partition)
+                    error_type = kafka.errors.for_code(error_code)
+                    if error_type is not kafka.errors.NoError:
+                        logger.warning(f"ListOffsets failed for {topic_partition}: {error_type.__name__}")
+                        continue
+                    if future.value.API_VERSION == 0:
+                        offset = partition_info[2][0] if partition_info[2] else UNKNOWN_OFFSET
+                    else:
+                        offset = partition_info[3]
+                    if offset != UNKNOWN_OFFSET:
+                        offsets[timestamp][topic_partition] = offset
+        return [offsets[timestamp] for timestamp in timestamps]
+        # OffsetResponse_v1(topics=[(topic='example_topic1', partitions=[(partition=0, error_code=0, timestamp=-1, offset=5)])])
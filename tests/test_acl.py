@@ -0,0 +1,29 @@
+from kafka.admin.acl_resource import ACLOperation, ACLPermissionType, ACLResourcePatternType, ResourceType
+
+from kafka_admin.acl import AclEntry, Acls
+
+
+def acl(principal, resource_name):
+    return AclEntry.make(principal, '*', int(ACLOperation.READ), int(ACLPermissionType.ALLOW),
+                         int(ResourceType.TOPIC), resource_name, int(ACLResourcePatternType.LITERAL))
+
+
+def test_indexes_follow_changes():
+    alice, bob, carol = acl('User:alice', 'orders'), acl('User:bob', 'orders'), acl('User:carol', 'payments')
+    acls = Acls(alice)
+    assert list(acls.by_principal()) == ['User:alice']
+
+    acls.append(bob)
+    assert list(acls.for_resource(ResourceType.TOPIC, 'orders')) == [alice, bob]
+    acls.extend([carol])
+    assert list(acls.for_principal('User:carol')) == [carol]
+    acls[0] = carol
+    assert 'User:alice' not in acls.by_principal()
+    del acls[0]
+    acls.remove(carol)
+    assert list(acls.by_principal()) == ['User:bob']
+    acls += [alice]
+    acls.sort(key=lambda entry: entry.principal)
+    assert list(acls.by_principal()) == ['User:alice', 'User:bob']
+    acls.clear()
+    assert acls.by_resource() == {}
@@ -0,0 +1,141 @@
+from kafka.admin.acl_resource import ACLOperation, ACLPermissionType, ACLResourcePatternType, ResourceType
+
+from kafka_admin.acl import AclEntry
+from kafka_admin.acl_query import AclIndex, parse_query
+
+LITERAL = ACLResourcePatternType.LITERAL
+PREFIXED = ACLResourcePatternType.PREFIXED
+
+
+def acl(principal, operation, resource_name, pattern_type=LITERAL, permission_type=ACLPermissionType.ALLOW,
+        host='*', resource_type=ResourceType.TOPIC):
+    return AclEntry.make(principal, host, int(operation), int(permission_type), int(resource_type),
+                         resource_name, int(pattern_type))
+
+
+def allowed(index, principal, operation, resource_name, host=None):
+    return index.check(principal, operation, ResourceType.TOPIC, resource_name, host=host)[0]
+
+
+def test_matching_literal_prefixed_and_wildcard():
+    literal = acl('User:alice', ACLOperation.READ, 'orders')
+    wildcard = acl('User:alice', ACLOperation.READ, '*')
+    prefix = acl('User:alice', ACLOperation.READ, 'ord', PREFIXED)
+    longer_prefix = acl('User:alice', ACLOperation.READ, 'orders-eu', PREFIXED)
+    other = acl('User:alice', ACLOperation.READ, 'payments')
+    group = acl('User:alice', ACLOperation.READ, 'orders', resource_type=ResourceType.GROUP)
+    index = AclIndex([literal, wildcard, prefix, longer_prefix, other, group])
+
+    assert set(index.matching(ResourceType.TOPIC, 'orders')) == {literal, wildcard, prefix}
+    assert set(index.matching(ResourceType.TOPIC, 'orders-eu-1')) == {wildcard, prefix, longer_prefix}
+    assert set(index.matching(ResourceType.TOPIC, 'payments')) == {wildcard, other}
+    assert index.matching(ResourceType.GROUP, 'orders') == [group]
+    # a prefixed ACL does not match a shorter name, and '*' is only literal
+    assert set(index.matching(ResourceType.TOPIC, 'or')) == {wildcard}
+
+
+def test_allow_by_literal_prefix_and_wildcard():
+    index = AclIndex([
+        acl('User:alice', ACLOperation.READ, 'orders'),
+        acl('User:bob', ACLOperation.READ, 'ord', PREFIXED),
+        acl('User:carol', ACLOperation.READ, '*'),
+    ])
+    assert allowed(index, 'User:alice', ACLOperation.READ, 'orders')
+    assert not allowed(index, 'User:alice', ACLOperation.READ, 'orders-eu')
+    assert allowed(index, 'User:bob', ACLOperation.READ, 'orders-eu')
+    assert not allowed(index, 'User:bob', ACLOperation.READ, 'payments')
+    assert allowed(index, 'User:carol', ACLOperation.READ, 'payments')
+    assert not allowed(index, 'User:alice', ACLOperation.WRITE, 'orders')
+
+
+def test_wildcard_principal_and_all_operation():
+    index = AclIndex([
+        acl('User:*', ACLOperation.READ, 'public'),
+        acl('User:admin', ACLOperation.ALL, '*'),
+    ])
+    assert allowed(index, 'User:anyone', ACLOperation.READ, 'public')
+    assert not allowed(index, 'User:anyone', ACLOperation.WRITE, 'public')
+    assert allowed(index, 'User:admin', ACLOperation.DELETE, 'orders')
+
+
+def test_deny_wins():
+    deny = acl('User:alice', ACLOperation.READ, 'orders-secret', PREFIXED, ACLPermissionType.DENY)
+    index = AclIndex([
+        acl('User:alice', ACLOperation.READ, '*'),
+        deny,
+        acl('User:*', ACLOperation.ALL, 'shared', permission_type=ACLPermissionType.DENY),
+        acl('User:bob', ACLOperation.ALL, 'shared'),
+    ])
+    assert allowed(index, 'User:alice', ACLOperation.READ, 'orders')
+    assert index.check('User:alice', ACLOperation.READ, ResourceType.TOPIC, 'orders-secret-1') == (False, [deny])
+    # DENY ALL covers every operation, and a wildcard principal DENY everyone
+    assert not allowed(index, 'User:bob', ACLOperation.WRITE, 'shared')
+
+
+def test_implied_describe():
+    index = AclIndex([
+        acl('User:alice', ACLOperation.WRITE, 'orders'),
+        acl('User:bob', ACLOperation.ALTER_CONFIGS, 'orders'),
+        acl('User:carol', ACLOperation.CREATE, 'orders'),
+    ])
+    assert allowed(index, 'User:alice', ACLOperation.DESCRIBE, 'orders')
+    assert not allowed(index, 'User:alice', ACLOperation.DESCRIBE_CONFIGS, 'orders')
+    assert allowed(index, 'User:bob', ACLOperation.DESCRIBE_CONFIGS, 'orders')
+    assert not allowed(index, 'User:bob', ACLOperation.DESCRIBE, 'orders')
+    assert not allowed(index, 'User:carol', ACLOperation.DESCRIBE, 'orders')
+
+
+def test_deny_is_not_implied():
+    # a DENY WRITE does not deny DESCRIBE, even though ALLOW WRITE implies it
+    index = AclIndex([
+        acl('User:alice', ACLOperation.DESCRIBE, 'orders'),
+        acl('User:alice', ACLOperation.WRITE, 'orders', permission_type=ACLPermissionType.DENY),
+    ])
+    assert allowed(index, 'User:alice', ACLOperation.DESCRIBE, 'orders')
+    assert not allowed(index, 'User:alice', ACLOperation.WRITE, 'orders')
+
+
+def test_host():
+    index = AclIndex([
+        acl('User:alice', ACLOperation.READ, 'orders', host='10.0.0.1'),
+        acl('User:bob', ACLOperation.READ, 'orders'),
+        acl('User:bob', ACLOperation.READ, 'orders', permission_type=ACLPermissionType.DENY, host='10.0.0.9'),
+    ])
+    assert allowed(index, 'User:alice', ACLOperation.READ, 'orders', host='10.0.0.1')
+    assert not allowed(index, 'User:alice', ACLOperation.READ, 'orders', host='10.0.0.2')
+    assert allowed(index, 'User:bob', ACLOperation.READ, 'orders', host='10.0.0.1')
+    assert not allowed(index, 'User:bob', ACLOperation.READ, 'orders', host='10.0.0.9')
+
+
+def test_without_host_host_specific_entries_apply():
+    # without --host the host column is ignored: a DENY for one host denies,
+    # an ALLOW for one host allows
+    deny = acl('User:bob', ACLOperation.READ, 'orders', permission_type=ACLPermissionType.DENY, host='10.0.0.9')
+    index = AclIndex([
+        acl('User:alice', ACLOperation.READ, 'orders', host='10.0.0.1'),
+        acl('User:bob', ACLOperation.READ, 'orders'),
+        deny,
+    ])
+    assert allowed(index, 'User:alice', ACLOperation.READ, 'orders')
+    assert index.check('User:bob', ACLOperation.READ, ResourceType.TOPIC, 'orders') == (False, [deny])
+
+
+def test_who_can():
+    index = AclIndex([
+        acl('User:alice', ACLOperation.WRITE, 'orders'),
+        acl('User:bob', ACLOperation.WRITE, 'ord', PREFIXED),
+        acl('User:bob', ACLOperation.WRITE, 'orders', permission_type=ACLPermissionType.DENY),
+        acl('User:carol', ACLOperation.READ, 'orders'),
+    ])
+    assert [principal for principal, _ in index.who_can(ACLOperation.WRITE, ResourceType.TOPIC, 'orders')] == \
+        ['User:alice']
+    # bob's DENY is for WRITE only, so his ALLOW WRITE still implies DESCRIBE
+    assert [principal for principal, _ in index.who_can(ACLOperation.DESCRIBE, ResourceType.TOPIC, 'orders')] == \
+        ['User:alice', 'User:bob', 'User:carol']
+
+
+def test_parse_query():
+    assert parse_query(dict(principal='User:alice', operation='write', resource_name='orders')) == \
+        ('User:alice', ACLOperation.WRITE, ResourceType.TOPIC, 'orders', None)
+    assert parse_query(dict(principal='User:alice', resource_type='group', resource_name='app', host='10.0.0.1')) == \
+        ('User:alice', ACLOperation.ALL, ResourceType.GROUP, 'app', '10.0.0.1')
@@ -0,0 +1,73 @@
+from collections import deque
+
+import pytest
+from kafka.future import Future
+
+from kafka_admin.consumer_group import send_pipelined
+
+
+class StubNetworkClient():
+    # KafkaAdminClient._client stand-in: requests to the nodes in `down` never
+    # become ready, the others complete on the next poll()
+    def __init__(self, down=(), disconnected=False) -> None:
+        self.down = set(down)
+        self.disconnected = disconnected
+        self.sent = []
+        self._due = []
+
+    def ready(self, node_id) -> bool:
+        return node_id not in self.down
+
+    def is_disconnected(self, node_id) -> bool:
+        return node_id in self.down and self.disconnected
+
+    def send(self, node_id, item) -> Future:
+        self.sent.append((node_id, item))
+        future = Future()
+        self._due.append((future, item))
+        return future
+
+    def poll(self, timeout_ms=None):
+        for future, item in self._due:
+            if isinstance(item, Exception):
+                future.failure(item)
+            else:
+                future.success(f"response to {item}")
+        self._due = []
+
+
+class StubClient():
+    def __init__(self, network_client, request_timeout_ms=30000) -> None:
+        self._client = network_client
+        self.config = dict(request_timeout_ms=request_timeout_ms)
+
+
+def run(network_client, pending_by_node, request_timeout_ms=30000, max_in_flight=2):
+    client = StubClient(network_client, request_timeout_ms)
+    return list(send_pipelined(client, pending_by_node, network_client.send, max_in_flight))
+
+
+def test_all_nodes_answer():
+    network_client = StubNetworkClient()
+    responses = run(network_client, {1: deque(['a', 'b', 'c']), 2: deque(['d'])})
+    assert sorted(responses) == [(item, f"response to {item}") for item in 'abcd']
+
+
+def test_disconnected_node_is_skipped():
+    network_client = StubNetworkClient(down={1}, disconnected=True)
+    responses = run(network_client, {1: deque(['a', 'b']), 2: deque(['c'])})
+    assert responses == [('c', 'response to c')]
+    assert [node_id for node_id, _ in network_client.sent] == [2]
+
+
+def test_node_not_ready_within_the_request_timeout_is_skipped():
+    # still connecting: only the deadline ends the wait
+    network_client = StubNetworkClient(down={1})
+    responses = run(network_client, {1: deque(['a']), 2: deque(['b', 'c', 'd'])}, request_timeout_ms=300)
+    assert sorted(responses) == [(item, f"response to {item}") for item in 'bcd']
+
+
+def test_failed_request_raises():
+    error = Exception('request failed')
+    with pytest.raises(Exception, match='request failed'):
+        run(StubNetworkClient(), {1: deque([error])})
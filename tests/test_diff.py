@@ -0,0 +1,110 @@
+import difflib
+from collections import namedtuple
+
+import pytest
+
+from kafka_admin.diff import diff, reorder, unified_diff
+
+Item = namedtuple('Item', ['name', 'value'])
+
+
+def by_name(item):
+    return item.name
+
+
+def expected_unified_diff(a, b, n=3):
+    lines = list(difflib.unified_diff(a, b, fromfile='a', tofile='b', n=n, lineterm=''))
+    return "\n".join(lines) + "\n" if lines else ''
+
+
+def test_diff_added_deleted_modified():
+    cur = [Item('a', 1), Item('b', 2), Item('c', 3)]
+    new = [Item('b', 2), Item('c', 30), Item('d', 4)]
+    result = diff(new, cur, key=by_name)
+
+    assert result.added == [Item('d', 4)]
+    assert result.deleted == [Item('a', 1)]
+    assert result.modified == [(Item('c', 3), Item('c', 30))]
+    assert result.unchanged == [Item('b', 2)]
+    assert result
+
+
+def test_diff_without_key_has_no_modified():
+    result = diff(['a', 'b'], ['b', 'c'])
+    assert result.added == ['a']
+    assert result.deleted == ['c']
+    assert result.modified == []
+
+
+def test_diff_of_equal_items_is_false():
+    assert not diff([Item('a', 1)], [Item('a', 1)], key=by_name)
+
+
+def test_reorder_follows_new_order():
+    cur = [Item('c', 3), Item('x', 0), Item('a', 1), Item('b', 2)]
+    new = [Item('a', 10), Item('b', 2), Item('c', 3)]
+    # the current items themselves, in the new order, then the unknown ones
+    assert reorder(new, cur, key=by_name) == [Item('a', 1), Item('b', 2), Item('c', 3), Item('x', 0)]
+
+
+def test_reorder_sorts_the_rest():
+    cur = [Item('z', 0), Item('a', 1), Item('y', 0)]
+    assert reorder([Item('a', 1)], cur, key=by_name, sort_key=by_name) == [Item('a', 1), Item('y', 0), Item('z', 0)]
+
+
+def test_reorder_keeps_duplicates_once():
+    assert reorder(['a', 'a', 'b'], ['b', 'a']) == ['a', 'b']
+
+
+def test_unified_diff_equal():
+    assert unified_diff(['a', 'b'], ['a', 'b']) == ''
+    assert unified_diff([], []) == ''
+
+
+LINES = [f"line{index}" for index in range(20)]
+
+
+@pytest.mark.parametrize('a, b', [
+    # insert
+    (LINES, LINES[:5] + ['new'] + LINES[5:]),
+    (LINES, ['new'] + LINES),
+    (LINES, LINES + ['new1', 'new2']),
+    ([], ['new']),
+    # delete
+    (LINES, LINES[:5] + LINES[6:]),
+    (LINES, LINES[1:]),
+    (LINES, LINES[:-2]),
+    (['old'], []),
+    # replace
+    (LINES, LINES[:5] + ['changed'] + LINES[6:]),
+    (LINES, LINES[:5] + ['x', 'y', 'z'] + LINES[7:]),
+    # runs far apart make separate hunks, close ones are merged
+    (LINES, ['new'] + LINES[:10] + ['changed'] + LINES[11:19]),
+    (LINES, LINES[:3] + ['changed'] + LINES[4:8] + LINES[9:]),
+    # exactly 2 * n unchanged lines between two runs
+    (LINES, LINES[:3] + ['changed'] + LINES[4:10] + ['changed'] + LINES[11:]),
+    (LINES, LINES[:3] + ['changed'] + LINES[4:11] + ['changed'] + LINES[12:]),
+])
+def test_unified_diff_matches_difflib(a, b):
+    assert unified_diff(a, b) == expected_unified_diff(a, b)
+
+
+def test_unified_diff_context():
+    b = LINES[:10] + ['changed'] + LINES[11:]
+    assert unified_diff(LINES, b, n=1) == expected_unified_diff(LINES, b, n=1)
+    assert unified_diff(LINES, b, n=0) == expected_unified_diff(LINES, b, n=0)
+    b = LINES[:10] + ['new'] + LINES[10:12] + LINES[13:]
+    assert unified_diff(LINES, b, n=0) == expected_unified_diff(LINES, b, n=0)
+    assert unified_diff(LINES, b, n=1) == expected_unified_diff(LINES, b, n=1)
+
+
+def test_unified_diff_ignore_all_space():
+    a = ['name , num_partitions', 'orders , 3']
+    b = ['name, num_partitions', 'orders,  3']
+    assert unified_diff(a, b, ignore_all_space=True) == ''
+    assert unified_diff(a, b) != ''
+
+
+def test_unified_diff_file_names():
+    assert unified_diff(['a'], ['b'], fromfile='current', tofile='new').splitlines()[:2] == \
+        ['--- current', '+++ new']
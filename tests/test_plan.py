@@ -0,0 +1,161 @@
+import asyncio
+import os
+import stat
+
+import kafka
+from kafka.admin.acl_resource import ACLOperation, ACLPermissionType, ACLResourcePatternType, ResourceType
+
+from kafka_admin.acl import AclEntry
+from kafka_admin.plan import (
+    ACL_ADD, ACL_DELETE, TOPIC_ADD, TOPIC_ADD_PARTITIONS, TOPIC_DELETE, Plan, PlanExecutor
+)
+from kafka_admin.topic import Topic, Topics
+
+
+def acl(principal, resource_name, pattern_type=ACLResourcePatternType.LITERAL, operation=ACLOperation.READ):
+    return AclEntry.make(principal, '*', int(operation), int(ACLPermissionType.ALLOW),
+                         int(ResourceType.TOPIC), resource_name, int(pattern_type))
+
+
+class StubAsyncSession():
+    # AsyncClusterSession stand-in: records every call in order and fails
+    # the topic names / ACL entries in `fail`
+    def __init__(self, fail=()) -> None:
+        self.fail = set(fail)
+        self.calls = []
+
+    def topic_adapter(self, **kwargs):
+        return StubTopicAdapter(self)
+
+    def acl_adapter(self):
+        return StubAclAdapter(self)
+
+    def _result(self, kind, keys) -> dict:
+        result = dict(succeeded=[], failed=[])
+        for key in keys:
+            self.calls.append((kind, key))
+            if key in self.fail:
+                result['failed'].append((key, kafka.errors.PolicyViolationError))
+            else:
+                result['succeeded'].append(key)
+        return result
+
+
+class StubTopicAdapter():
+    def __init__(self, session) -> None:
+        self.session = session
+
+    async def add(self, topics):
+        return self.session._result(TOPIC_ADD, [topic.name for topic in topics])
+
+    async def delete(self, topics):
+        return self.session._result(TOPIC_DELETE, [topic.name for topic in topics])
+
+    async def add_partitions(self, topics):
+        return self.session._result(TOPIC_ADD_PARTITIONS, [topic.name for topic in topics])
+
+
+class StubAclAdapter():
+    def __init__(self, session) -> None:
+        self.session = session
+
+    async def add(self, acls):
+        return self.session._result(ACL_ADD, list(acls))
+
+    async def delete(self, acls):
+        result = self.session._result(ACL_DELETE, list(acls))
+        failed = dict(result['failed'])
+        return [(entry, [(entry, failed.get(entry, kafka.errors.NoError))], kafka.errors.NoError) for entry in acls]
+
+
+def run(plan, fail=()):
+    session = StubAsyncSession(fail)
+    result = asyncio.run(PlanExecutor(session).run(plan))
+    return session.calls, result
+
+
+def make_plan(new_topics=(), cur_topics=(), new_acls=(), cur_acls=()):
+    return Plan.compute(Topics(*new_topics), Topics(*cur_topics), list(new_acls), list(cur_acls))
+
+
+def test_revoke_runs_before_the_topic_delete():
+    literal = acl('User:alice', 'orders')
+    prefixed = acl('User:bob', 'ord', ACLResourcePatternType.PREFIXED)
+    other = acl('User:carol', 'payments')
+    plan = make_plan(cur_topics=[Topic('orders', 1, 1), Topic('payments', 1, 1)],
+                     new_topics=[Topic('payments', 1, 1)],
+                     cur_acls=[literal, prefixed, other], new_acls=[other])
+
+    actions = plan.actions()
+    assert sorted(actions[(TOPIC_DELETE, 'orders')]) == sorted([(ACL_DELETE, literal), (ACL_DELETE, prefixed)])
+
+    calls, result = run(plan)
+    assert calls.index((ACL_DELETE, literal)) < calls.index((TOPIC_DELETE, 'orders'))
+    assert calls.index((ACL_DELETE, prefixed)) < calls.index((TOPIC_DELETE, 'orders'))
+    assert not result['failed'] and not result['skipped']
+
+
+def test_recreated_topic_is_deleted_before_it_is_added():
+    plan = make_plan(cur_topics=[Topic('orders', 4, 1)], new_topics=[Topic('orders', 2, 1)])
+    assert plan.actions()[(TOPIC_ADD, 'orders')] == [(TOPIC_DELETE, 'orders')]
+
+    calls, result = run(plan)
+    assert calls == [(TOPIC_DELETE, 'orders'), (TOPIC_ADD, 'orders')]
+    assert sorted(result['succeeded']) == sorted(calls)
+
+
+def test_grant_waits_for_its_create():
+    grant = acl('User:alice', 'orders')
+    wildcard = acl('User:bob', '*')
+    unrelated = acl('User:carol', 'payments')
+    plan = make_plan(new_topics=[Topic('orders', 1, 1)], new_acls=[grant, wildcard, unrelated])
+
+    actions = plan.actions()
+    assert actions[(ACL_ADD, grant)] == [(TOPIC_ADD, 'orders')]
+    assert actions[(ACL_ADD, wildcard)] == [(TOPIC_ADD, 'orders')]
+    assert actions[(ACL_ADD, unrelated)] == []
+
+    calls, _ = run(plan)
+    assert calls.index((TOPIC_ADD, 'orders')) < calls.index((ACL_ADD, grant))
+    assert calls.index((TOPIC_ADD, 'orders')) < calls.index((ACL_ADD, wildcard))
+
+
+def test_failed_delete_skips_the_add_and_the_grant():
+    grant = acl('User:alice', 'orders')
+    plan = make_plan(cur_topics=[Topic('orders', 4, 1)], new_topics=[Topic('orders', 2, 1), Topic('audit', 1, 1)],
+                     new_acls=[grant])
+
+    calls, result = run(plan, fail={'orders'})
+    assert calls.count((TOPIC_DELETE, 'orders')) == 1
+    assert (TOPIC_ADD, 'orders') not in calls
+    assert (ACL_ADD, grant) not in calls
+    assert [(kind, key) for kind, key, _ in result['failed']] == [(TOPIC_DELETE, 'orders')]
+    assert sorted(result['skipped'], key=repr) == sorted([(TOPIC_ADD, 'orders'), (ACL_ADD, grant)], key=repr)
+    assert (TOPIC_ADD, 'audit') in result['succeeded']
+
+
+def test_save_load_round_trip(tmp_path):
+    revoke = acl('User:bob', 'ord', ACLResourcePatternType.PREFIXED)
+    grant = acl('User:alice', 'orders', operation=ACLOperation.WRITE)
+    plan = make_plan(cur_topics=[Topic('orders', 4, 3), Topic('old', 1, 1), Topic('grow', 1, 3)],
+                     new_topics=[Topic('orders', 2, 3), Topic('grow', 3, 3), Topic('new', 1, 1)],
+                     cur_acls=[revoke], new_acls=[grant])
+    filename = str(tmp_path / 'plan.bin')
+    plan.save(filename)
+    loaded = Plan.load(filename)
+
+    assert loaded.counts() == plan.counts()
+    assert loaded.created_at == plan.created_at
+    assert {action: sorted(depends, key=repr) for action, depends in loaded.actions().items()} == \
+        {action: sorted(depends, key=repr) for action, depends in plan.actions().items()}
+
+
+def test_save_uses_the_umask_mode(tmp_path):
+    filename = str(tmp_path / 'plan.bin')
+    umask = os.umask(0o022)
+    try:
+        make_plan(new_topics=[Topic('orders', 1, 1)]).save(filename)
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+    assert os.listdir(tmp_path) == ['plan.bin']
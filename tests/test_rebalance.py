@@ -0,0 +1,198 @@
+import random
+from collections import Counter
+
+import pytest
+
+from kafka_admin.rebalance import ReassignmentPlanner, parse_broker
+from kafka_admin.topic import Topic
+
+
+def make_topic(name, assignment):
+    # assignment: [[broker, ...] per partition], the first one leads
+    partitions = [dict(partition=index, leader=replicas[0], replicas=list(replicas), isr=list(replicas),
+                       offline_replicas=[], error_code=0)
+                  for index, replicas in enumerate(assignment)]
+    return Topic(name, len(assignment), len(assignment[0]), raw=dict(topic=name, partitions=partitions))
+
+
+def round_robin(num_topics, num_partitions, brokers, replication_factor):
+    topics = []
+    slot = 0
+    for topic_index in range(num_topics):
+        assignment = []
+        for _ in range(num_partitions):
+            assignment.append([brokers[(slot + offset) % len(brokers)] for offset in range(replication_factor)])
+            slot += 1
+        topics.append(make_topic(f"topic{topic_index}", assignment))
+    return topics
+
+
+def assignment_of(topics):
+    return {(topic.name, partition['partition']): list(partition['replicas'])
+            for topic in topics for partition in topic._raw['partitions']}
+
+
+def changed_slots(planner):
+    return sum(1 for index in range(len(planner.replicas))
+               for before, after in zip(planner.original.get(index, planner.replicas[index]), planner.replicas[index])
+               if before != after)
+
+
+def check_assignment(planner, brokers):
+    for replicas in planner.replicas:
+        assert None not in replicas
+        assert len(set(replicas)) == len(replicas)
+        assert set(replicas) <= set(brokers)
+        if planner.rack_aware:
+            racks = Counter(brokers[broker] for broker in replicas)
+            assert max(racks.values()) <= -(-len(replicas) // planner.num_racks)
+
+
+def excess_over_target(planner, brokers):
+    # replicas that have to move: the ones on brokers that are not targets,
+    # and the ones above a target broker's share
+    off_target = sum(count for broker, count in planner.counts_before.items() if broker not in brokers)
+    over = sum(max(0, planner.counts_before.get(broker, 0) - planner.targets[broker]) for broker in brokers)
+    return off_target + over
+
+
+def test_parse_broker():
+    assert parse_broker('3') == (3, None)
+    assert parse_broker('3:rack-a') == (3, 'rack-a')
+
+
+def test_added_brokers_take_an_even_share():
+    topics = round_robin(6, 4, [0, 1, 2], 2)
+    brokers = {broker: None for broker in range(5)}
+    planner = ReassignmentPlanner(topics, brokers)
+    moved = planner.plan()
+
+    check_assignment(planner, brokers)
+    counts = Counter(broker for replicas in planner.replicas for broker in replicas)
+    assert max(counts.values()) - min(counts[broker] for broker in brokers) <= 1
+    assert moved == excess_over_target(planner, brokers)
+    assert moved == changed_slots(planner)
+
+
+def test_removed_broker_is_emptied():
+    topics = round_robin(5, 4, [0, 1, 2, 3], 3)
+    brokers = {broker: None for broker in range(3)}
+    planner = ReassignmentPlanner(topics, brokers)
+    moved = planner.plan()
+
+    check_assignment(planner, brokers)
+    counts = Counter(broker for replicas in planner.replicas for broker in replicas)
+    assert 3 not in counts
+    assert max(counts.values()) - min(counts.values()) <= 1
+    assert moved == excess_over_target(planner, brokers)
+
+
+def test_balanced_cluster_does_not_move():
+    topics = round_robin(3, 4, [0, 1, 2], 3)
+    planner = ReassignmentPlanner(topics)
+    assert planner.plan() == 0
+    assert planner.reassignment() == dict(version=1, partitions=[])
+
+
+def test_rack_limit():
+    brokers = {0: 'a', 1: 'a', 2: 'b', 3: 'b', 4: 'c', 5: 'c'}
+    # every partition has two replicas in rack a
+    topics = [make_topic('topic0', [[0, 1, 2], [1, 0, 4], [0, 1, 3], [1, 0, 5]])]
+    planner = ReassignmentPlanner(topics, brokers)
+    assert planner.rack_aware
+    moved = planner.plan()
+
+    check_assignment(planner, brokers)
+    assert moved == changed_slots(planner)
+    # the leader stays where it is when a follower can move instead
+    assert [replicas[0] for replicas in planner.replicas] == [0, 1, 0, 1]
+
+
+def rack_spreads(planner, brokers):
+    counts = Counter(broker for replicas in planner.replicas for broker in replicas)
+    by_rack = {}
+    for broker, rack in brokers.items():
+        by_rack.setdefault(rack, []).append(counts[broker])
+    return {rack: max(rack_counts) - min(rack_counts) for rack, rack_counts in by_rack.items()}
+
+
+def test_uneven_racks():
+    # one replica per rack; rack a gets a third broker
+    brokers = {0: 'a', 1: 'b', 2: 'c', 3: 'a', 4: 'b', 5: 'c'}
+    rng = random.Random(0)
+    assignment = [[rng.choice([0, 3]), rng.choice([1, 4]), rng.choice([2, 5])] for _ in range(60)]
+    brokers[6] = 'a'
+    planner = ReassignmentPlanner([make_topic('topic0', assignment)], brokers)
+    moved = planner.plan()
+
+    check_assignment(planner, brokers)
+    counts = Counter(broker for replicas in planner.replicas for broker in replicas)
+    assert [counts[0], counts[3], counts[6]] == [20, 20, 20]
+    assert rack_spreads(planner, brokers) == dict(a=0, b=0, c=0)
+    # every move stays in its rack, and none more than the excess requires
+    assert moved == sum(max(0, planner.counts_before[broker] - planner.targets[broker]) for broker in brokers)
+
+
+def test_imbalance_within_a_rack():
+    brokers = {0: 'a', 1: 'a', 2: 'b', 3: 'b', 4: 'b'}
+    assignment = [[0, 2], [0, 3], [0, 2], [1, 2], [0, 2], [0, 4]]
+    planner = ReassignmentPlanner([make_topic('topic0', assignment)], brokers)
+    # 5/1 in rack a and 4/1/1 in rack b: two moves each
+    assert planner.plan() == 4
+    check_assignment(planner, brokers)
+    assert rack_spreads(planner, brokers) == dict(a=0, b=0)
+
+
+def test_no_broker_fits():
+    topics = [make_topic('topic0', [[0, 1, 2]])]
+    planner = ReassignmentPlanner(topics, {0: None, 1: None})
+    with pytest.raises(Exception):
+        planner.plan()
+
+
+def test_reassignment_and_rollback():
+    topics = round_robin(4, 3, [0, 1, 2], 2)
+    before = assignment_of(topics)
+    planner = ReassignmentPlanner(topics, {broker: None for broker in range(4)})
+    planner.plan()
+
+    reassignment = planner.reassignment()
+    rollback = planner.rollback()
+    assert reassignment['partitions']
+    assert [(entry['topic'], entry['partition']) for entry in reassignment['partitions']] == \
+        [(entry['topic'], entry['partition']) for entry in rollback['partitions']]
+    for entry in rollback['partitions']:
+        assert entry['replicas'] == before[(entry['topic'], entry['partition'])]
+    for entry in reassignment['partitions']:
+        assert entry['replicas'] != before[(entry['topic'], entry['partition'])]
+    # the describe response itself is left as it was
+    assert assignment_of(topics) == before
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_random_clusters(seed):
+    rng = random.Random(seed)
+    current = list(range(rng.randint(3, 6)))
+    replication_factor = rng.randint(1, 3)
+    topics = [make_topic(f"topic{index}", [rng.sample(current, replication_factor)
+                                           for _ in range(rng.randint(1, 8))])
+              for index in range(rng.randint(1, 6))]
+    target = rng.sample(current, rng.randint(replication_factor, len(current))) + \
+        list(range(len(current), len(current) + rng.randint(0, 2)))
+    if rng.random() < 0.5:
+        brokers = {broker: None for broker in target}
+    else:
+        brokers = {broker: 'abc'[index % 3] for index, broker in enumerate(target)}
+    planner = ReassignmentPlanner(topics, brokers)
+    moved = planner.plan()
+
+    check_assignment(planner, brokers)
+    assert moved == changed_slots(planner)
+    if planner.rack_aware:
+        if replication_factor <= planner.num_racks:
+            # one replica per rack: any replica can move to any broker of its rack
+            assert max(rack_spreads(planner, brokers).values()) <= 1
+    else:
+        counts = Counter(broker for replicas in planner.replicas for broker in replicas)
+        assert max(counts.values()) - min(counts.get(broker, 0) for broker in brokers) <= 1
+        assert moved == excess_over_target(planner, brokers)
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from kafka_admin import reconcile
+from kafka_admin.acl import Acls
+from kafka_admin.reconcile import DefinitionWatcher, Reconciler
+from kafka_admin.topic import Topic, Topics
+
+TOPICS = """name  , num_partitions, replication_factor
+orders, 3             , 1
+"""
+ACLS = """principal , resource_type, resource_name, pattern_type, operation, permission_type, host
+User:alice, topic        , orders       , literal     , write    , allow          , *
+"""
+
+
+def write(path, topics, acls, mtime):
+    path.write_text(f"schema_version: 1\n---\n{topics}---\n{acls}")
+    # set the mtime explicitly: two writes can land in the same tick
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_watcher_reparses_changed_sections(tmp_path):
+    path = tmp_path / 'definitions.csv'
+    write(path, TOPICS, ACLS, 1)
+    watcher = DefinitionWatcher(str(path))
+    assert watcher.poll() == {'topics', 'acls'}
+    assert watcher.poll() == set()
+
+    write(path, TOPICS.replace('3 ', '6 '), ACLS, 2)
+    acls = watcher.acls
+    assert watcher.poll() == {'topics'}
+    assert [topic.num_partitions for topic in watcher.topics] == [6]
+    assert watcher.acls is acls
+
+
+def test_watcher_keeps_nothing_from_a_broken_file(tmp_path):
+    path = tmp_path / 'definitions.csv'
+    write(path, TOPICS, ACLS, 1)
+    watcher = DefinitionWatcher(str(path))
+    watcher.poll()
+    topics, acls = watcher.topics, watcher.acls
+
+    # the topics section parses, the acls one does not
+    broken = ACLS.replace('write', 'scribble')
+    write(path, TOPICS.replace('3 ', '6 '), broken, 2)
+    with pytest.raises(Exception):
+        watcher.poll()
+    assert watcher.topics is topics and watcher.acls is acls
+    # and the same file fails again on the next poll instead of looking unchanged
+    with pytest.raises(Exception):
+        watcher.poll()
+
+    write(path, TOPICS.replace('3 ', '6 '), ACLS, 3)
+    assert watcher.poll() == {'topics'}
+    assert [topic.num_partitions for topic in watcher.topics] == [6]
+
+
+class StubSession():
+    # ClusterSession stand-in holding the cluster's topics; list() fails
+    # while `failing` is set
+    metadata_cache = None
+
+    def __init__(self, topics) -> None:
+        self.topics = {topic.name: topic for topic in topics}
+        self.failing = False
+        self.added = []
+
+    def topic_adapter(self):
+        return StubTopicAdapter(self)
+
+    def acl_adapter(self):
+        return StubAclAdapter()
+
+
+class StubTopicAdapter():
+    def __init__(self, session) -> None:
+        self.session = session
+
+    def list(self):
+        if self.session.failing:
+            raise Exception('broker down')
+        return Topics(*self.session.topics.values())
+
+    def add(self, topics):
+        self.session.added.extend(topic.name for topic in topics)
+        self.session.topics.update((topic.name, topic) for topic in topics)
+        return dict(succeeded=[topic.name for topic in topics], failed=[])
+
+    def delete(self, topics):
+        return dict(succeeded=[], failed=[])
+
+    def add_partitions(self, topics):
+        return dict(succeeded=[], failed=[])
+
+
+class StubAclAdapter():
+    def list(self):
+        return Acls().load_from_lines(ACLS.splitlines(keepends=True))
+
+
+def test_reconciler_survives_errors(tmp_path, monkeypatch):
+    path = tmp_path / 'definitions.csv'
+    write(path, TOPICS, ACLS, 1)
+    session = StubSession([Topic('orders', 3, 1)])
+    reconciler = Reconciler(session, str(path), interval=0, drift_interval=0, echo=lambda message: None)
+
+    steps = []
+
+    def sleep(seconds):
+        # one step per interval of the watch loop
+        steps.append(seconds)
+        if len(steps) == 2:
+            # the file breaks, the broker fails one listing, and the topic
+            # is deleted behind the reconciler's back
+            write(path, TOPICS, ACLS.replace('write', 'scribble'), 2)
+            session.failing = True
+            del session.topics['orders']
+        elif len(steps) == 3:
+            session.failing = False
+        elif len(steps) == 4:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(reconcile.time, 'sleep', sleep)
+    with pytest.raises(KeyboardInterrupt):
+        reconciler.run()
+    # the drift check ran against the last good definitions
+    assert session.added == ['orders']
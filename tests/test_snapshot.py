@@ -0,0 +1,89 @@
+import os
+import stat
+
+import pytest
+from kafka.admin.acl_resource import ACLOperation, ACLPermissionType, ACLResourcePatternType, ResourceType
+
+from kafka_admin.acl import AclEntry
+from kafka_admin.output import replace_file
+from kafka_admin.snapshot import ClusterSnapshot, SnapshotAclStoreAdapter, write_snapshot
+from kafka_admin.topic import Topic
+
+LITERAL = ACLResourcePatternType.LITERAL
+PREFIXED = ACLResourcePatternType.PREFIXED
+
+
+def make_topic(name, assignment, is_internal=False):
+    partitions = [dict(partition=index, leader=replicas[0], replicas=list(replicas), isr=list(replicas),
+                       offline_replicas=[], error_code=0)
+                  for index, replicas in enumerate(assignment)]
+    return Topic(name, len(assignment), len(assignment[0]),
+                 raw=dict(error_code=0, topic=name, is_internal=is_internal, partitions=partitions))
+
+
+def acl(principal, resource_name, pattern_type=LITERAL, operation=ACLOperation.READ, host='*'):
+    return AclEntry.make(principal, host, int(operation), int(ACLPermissionType.ALLOW),
+                         int(ResourceType.TOPIC), resource_name, int(pattern_type))
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    topics = [make_topic('orders', [[0, 1], [1, 2], [2, 0]]), make_topic('__consumer_offsets', [[0, 1]], True)]
+    topics[0]._raw['partitions'][1].update(leader=-1, isr=[], offline_replicas=[1, 2])
+    acls = [
+        acl('User:alice', 'orders'),
+        acl('User:alice', 'ord', PREFIXED, ACLOperation.WRITE),
+        acl('User:bob', 'payments', host='10.0.0.1'),
+    ]
+    filename = str(tmp_path / 'cluster.snapshot')
+    write_snapshot(filename, topics, acls, bootstrap_servers='localhost:9092')
+    snapshot = ClusterSnapshot(filename)
+    yield topics, acls, snapshot
+    snapshot.close()
+
+
+def test_round_trip(snapshot):
+    topics, acls, snapshot = snapshot
+    assert snapshot.header['info'] == dict(bootstrap_servers='localhost:9092')
+    assert [(topic.name, topic.num_partitions, topic.replication_factor) for topic in snapshot.topics()] == \
+        [(topic.name, topic.num_partitions, topic.replication_factor) for topic in topics]
+    assert [topic._raw for topic in snapshot.topics()] == [topic._raw for topic in topics]
+    assert list(snapshot.acls()) == acls
+
+
+def test_acl_list_filters(snapshot):
+    _, acls, snapshot = snapshot
+    adapter = SnapshotAclStoreAdapter(snapshot)
+    assert list(adapter.list()) == acls
+    assert list(adapter.list(principal='User:alice')) == acls[:2]
+    assert list(adapter.list(resource_type=ResourceType.TOPIC, resource_name='orders',
+                             pattern_type=ACLResourcePatternType.MATCH)) == acls[:2]
+    assert list(adapter.list(resource_name='ord', pattern_type=PREFIXED)) == [acls[1]]
+    assert list(adapter.list(host='10.0.0.1')) == [acls[2]]
+    assert list(adapter.list(operation=ACLOperation.WRITE, principal='User:bob')) == []
+
+
+def test_file_mode_follows_the_umask(tmp_path):
+    filename = str(tmp_path / 'cluster.snapshot')
+    umask = os.umask(0o022)
+    try:
+        write_snapshot(filename, [], [])
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    filename = str(tmp_path / 'cluster.snapshot')
+    replace_file(filename, [b'old'])
+
+    def chunks():
+        yield b'new'
+        raise OSError('No space left on device')
+
+    with pytest.raises(OSError):
+        replace_file(filename, chunks())
+    # and the temporary file is gone
+    assert os.listdir(tmp_path) == ['cluster.snapshot']
+    with open(filename, 'rb') as f:
+        assert f.read() == b'old'